@@ -1,15 +1,13 @@
-import PyPDF2
+import os
 import matplotlib.pyplot as plt
-import re
+from extractors import extract_text
+from rules import INDICATOR_RULES, REGISTRY
 
 # === Step 1: Extract text from PDF ===
 def extract_text_from_pdf(filename):
-    with open(filename, "rb") as f:
-        reader = PyPDF2.PdfReader(f)
-        text = ""
-        for page in reader.pages:
-            text += page.extract_text() + "\n"
-    return text
+    # Same engine as the Streamlit app; pick a backend with CMAT_PDF_BACKEND
+    # (pymupdf, pypdf2 or layout).
+    return extract_text(filename, backend=os.getenv("CMAT_PDF_BACKEND"))
 
 # === Step 2: Analyze numbers from text ===
 def analyze_text(text):
@@ -27,28 +25,16 @@ def analyze_text(text):
         }
     }
 
-    # Example regex-based parsing (improve depending on your PDF)
-    total_match = re.search(r"Total\s+Public\s+Investment.*?([\d,]+)", text, re.IGNORECASE)
-    if total_match:
-        indicators["Total Public Investment in Climate Initiatives"] = int(total_match.group(1).replace(",", ""))
-
-    pct_match = re.search(r"Climate\s+Adaptation\s*:\s*(\d+)%", text, re.IGNORECASE)
-    if pct_match:
-        indicators["Percentage of National Budget Allocated to Climate Adaptation"] = int(pct_match.group(1))
-
-    yoy_match = re.search(r"Year.?on.?Year.*?(\d+)%", text, re.IGNORECASE)
-    if yoy_match:
-        indicators["Year-on-Year Budget Increase for Climate Adaptation"] = int(yoy_match.group(1))
-
-    private_match = re.search(r"Private\s+Sector\s+Investment.*?([\d,]+)", text, re.IGNORECASE)
-    if private_match:
-        indicators["Private Sector Investment Mobilized"] = int(private_match.group(1).replace(",", ""))
-
-    # Sector breakdown example
-    for sector in indicators["Funding Allocation by Sector"].keys():
-        match = re.search(rf"{sector}.*?(\d+)%", text, re.IGNORECASE)
-        if match:
-            indicators["Funding Allocation by Sector"][sector] = int(match.group(1))
+    # All indicator patterns live in rules.py and run in a single pass
+    found = REGISTRY.extract(text)
+    for rule in INDICATOR_RULES:
+        value = found.get(rule["name"])
+        if value is None:
+            continue
+        if rule.get("group") in indicators:
+            indicators[rule["group"]][rule["indicator"]] = int(value)
+        elif rule["indicator"] in indicators:
+            indicators[rule["indicator"]] = int(value)
 
     return indicators
 
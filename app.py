@@ -1,29 +1,31 @@
 # app.py
 import streamlit as st
 import os, json
-import base64
-from backend import extract_combined_budget_info
+import html
+import time
 from streamlit_autorefresh import st_autorefresh
+from pipeline import comparison_frame, run_uploads_pipeline
+from cube import BudgetCube, ingest_document
+from search_index import index_document, search as search_documents
+from reports import report_section, submit_report
+from assets import asset_url, stylesheet_tag
+from scheduler import SCHEDULER
+from provenance import clip_thumbnail
+from page_cache import bytes_key
+from normalize import VIEWS, VIEW_LABELS, cached_panel, clamped_years, convert, unit_label
+from backend import EXTRACTION_MODE, EXTRACTION_MODES, llm_available, llm_breaker
 from backend import (
     CMAT_INDICATORS,
-    extract_text_from_pdf,
-    extract_numbers_from_text,
     bar_chart,
+    comparison_bar_chart,
     radar_chart,
-    extract_agriculture_budget,
     agriculture_bar_chart,
-    extract_climate_programmes,
-    climate_bar_chart,
-    extract_total_budget,
     climate_multi_year_chart,
     climate_2024_vs_total_chart,
-    ai_extract_budget_info
+    calc_percentages,
+    bar_percent_chart
 )
-
-def get_base64_image(image_path):
-    with open(image_path, "rb") as f:
-        data = f.read()
-    return base64.b64encode(data).decode()
+from thresholds import available_countries, evaluate_compliance
 
 # ---------------- Page Config ----------------
 st.set_page_config(
@@ -33,8 +35,8 @@ st.set_page_config(
     initial_sidebar_state="collapsed",  # hide sidebar since nav is on top
 )
 
-with open("styles.css") as f:
-    st.markdown(f"<style>{f.read()}</style>", unsafe_allow_html=True)
+# The theme is a cached static file; each rerun only sends the <link> tag
+st.markdown(stylesheet_tag("styles.css"), unsafe_allow_html=True)
 
 USER_FILE = "users.json"
 
@@ -65,7 +67,6 @@ if "nav" not in st.session_state:
     st.session_state.nav = "home"
 
 # ---------------- Modern Top Navbar (Reworked) ----------------
-logo_base64 = get_base64_image("images/gv_zambia.png")
 
 # Use a custom div wrapper to target this specific nav bar with CSS
 st.markdown('<div class="nav-bar sticky-nav">', unsafe_allow_html=True)
@@ -76,7 +77,7 @@ cols = st.columns([2, 1, 1, 1, 1, 1])
 # Render the logo in the first column
 with cols[0]:
     st.markdown(
-        f'<img src="data:image/png;base64,{logo_base64}" class="nav-logo-img">',
+        f'<img src="{asset_url("images/gv_zambia.png")}" class="nav-logo-img">',
         unsafe_allow_html=True
     )
 
@@ -223,7 +224,7 @@ elif menu == "ℹ️ About":
             - 📄 Public Awareness Briefs *(2025)*
 
             ### 📥 Downloads
-            *Currently under development – reports will be made available here.*
+            *Annual Budget Oversight Reports can be generated from any uploaded budget on the Upload Doc page.*
         </div>
         """,
         unsafe_allow_html=True
@@ -314,7 +315,7 @@ elif menu == "ℹ️ About":
         st.markdown('<div class="project-card">', unsafe_allow_html=True)
         st.markdown(
             f"""
-            <img src="data:image/png;base64,{get_base64_image(project['img'])}" 
+            <img src="{asset_url(project['img'])}" 
                  class="project-img" alt="{project['title']}"/>
             """,
             unsafe_allow_html=True
@@ -349,17 +350,135 @@ elif menu == "📑 Upload Doc":
         st.stop()
 
     st.header("📑 Upload a Budget or Climate Policy Document")
-    uploaded_file = st.file_uploader("Upload PDF", type=["pdf"])
-    if uploaded_file:
-        text = extract_text_from_pdf(uploaded_file, max_pages=10)
-        st.success("✅ Document uploaded and processed")
-        
+
+    # ---- Search Across All Ingested Documents ----
+    search_query = st.text_input("🔎 Search all budget documents", placeholder='e.g. "PIDACC Zambezi"')
+    if search_query:
+        start = time.perf_counter()
+        hits = search_documents(search_query, limit=20)
+        st.caption(f"{len(hits)} page(s) found in {(time.perf_counter() - start) * 1000:.0f} ms")
+        for hit in hits:
+            st.markdown(
+                f"**{html.escape(hit['document'])}** — page {hit['page']}<br>"
+                f"<span style='font-size:14px;'>{hit['snippet']}</span>",
+                unsafe_allow_html=True
+            )
+
+    extraction_mode = st.selectbox(
+        "🧠 Extraction mode",
+        EXTRACTION_MODES,
+        index=EXTRACTION_MODES.index(EXTRACTION_MODE) if EXTRACTION_MODE in EXTRACTION_MODES else 0,
+        help="hybrid: AI with local fallback · llm: AI only · local: offline rules only"
+    )
+    if extraction_mode != "local" and not llm_available():
+        st.info(f"📴 AI extraction unavailable ({llm_breaker.last_error or 'API unreachable'}); using local rules.")
+
+    queue_stats = SCHEDULER.stats()
+    if queue_stats["waiting"]:
+        st.caption(f"⏳ Extraction queue: {queue_stats['running']} running, {queue_stats['waiting']} waiting")
+
+    uploaded_files = st.file_uploader("Upload PDF(s)", type=["pdf"], accept_multiple_files=True)
+    if uploaded_files:
+        names = [f.name for f in uploaded_files]
+        # Documents are told apart by content hash: two uploads may share a file name
+        keys = [bytes_key(f.getvalue()) for f in uploaded_files]
+        labels = dict(zip(keys, names))
+        # One live status panel per document; all documents run concurrently
+        statuses = {key: st.status(f"⚙️ {labels[key]}: queued…", expanded=False) for key in keys}
+
+        def on_stage(key, stage, secs):
+            statuses[key].update(label=f"⚙️ {labels[key]}: {stage.replace('_', ' ')} done at {secs:.2f}s")
+            statuses[key].write(f"{stage.replace('_', ' ')} done at {secs:.2f}s")
+
+        def on_queue(key, position, waiting):
+            statuses[key].update(label=f"⏳ {labels[key]}: queued — position {position} of {waiting}")
+
+        def on_field(key, indicator, value):
+            # Streamed AI fields show up while the rest of the answer is generated
+            statuses[key].write(f"🤖 {indicator}: {value:,}")
+
+        start = time.perf_counter()
+        results = run_uploads_pipeline(
+            uploaded_files,
+            names=names,
+            max_pages=10,
+            mode=extraction_mode,
+            on_stage=on_stage,
+            on_field=on_field,
+            user=st.session_state.current_user,
+            on_queue=on_queue,
+            keys=keys
+        )
+        wall_time = time.perf_counter() - start
+        for key, result in zip(keys, results):
+            statuses[key].update(label=f"✅ {labels[key]}: processed in {result['timings']['total']:.2f}s", state="complete")
+
+        # Aggregates are materialized once per new document; charts slice the cube
+        cube = st.session_state.setdefault("budget_cube", BudgetCube())
+        for name, result in zip(names, results):
+            # Slices are keyed by file hash; revisions uploaded together stay apart
+            ingest_document(cube, result["document"]["file_hash"], result["document"])
+            index_document(result["document"]["file_hash"], name, result["document"]["pages"])
+        st.success(f"✅ {len(results)} document(s) uploaded and processed")
+
+        # ---- Side-by-Side Comparison ----
+        if len(results) > 1:
+            st.subheader("📊 Document Comparison")
+            slowest = max(result["timings"]["total"] for result in results)
+            st.caption(f"{len(results)} documents processed in {wall_time:.2f}s (slowest single document: {slowest:.2f}s)")
+            comparison = comparison_frame(results, names)
+            st.dataframe(comparison, use_container_width=True)
+            indicator_columns = [c for c in CMAT_INDICATORS["Finance"] + CMAT_INDICATORS["Sectors"] if comparison[c].notna().any()]
+            if indicator_columns:
+                st.plotly_chart(comparison_bar_chart(comparison, indicator_columns, "CMAT Indicators by Document"), use_container_width=True)
+            climate_columns = [c for c in comparison.columns if c.startswith("Climate ")]
+            st.plotly_chart(comparison_bar_chart(comparison, climate_columns, "🌍 Climate Programme Totals by Document"), use_container_width=True)
+            selected = st.selectbox("📄 Show details for", keys, format_func=labels.get)
+        else:
+            selected = keys[0]
+
+        uploaded_file = uploaded_files[keys.index(selected)]
+        result = results[keys.index(selected)]
+        doc = result["document"]
+        text = doc["text"]
+        doc_key = doc["file_hash"]
+
+        reused = len(doc["pages"]) - len(doc["processed_pages"])
+        if reused:
+            st.caption(f"♻️ Reused {reused} cached page(s); processed {len(doc['processed_pages'])} new page(s).")
+        if doc["changed_pages"] is not None:
+            st.subheader("🔄 Changes Since Previous Version")
+            st.write(f"**Changed pages:** {', '.join(map(str, doc['changed_pages'])) or 'none'}")
+            if doc["allocation_diff"] is not None and not doc["allocation_diff"].empty:
+                st.dataframe(doc["allocation_diff"], use_container_width=True)
+            else:
+                st.info("No programme allocations changed.")
+
         with st.expander("📑 Extracted Text Preview"):
             st.text_area("Extracted Text", text[:3000], height=200)
 
+        # ---- Figure Provenance (previews rendered only when picked) ----
+        located = [f for f in doc["provenance"] if f["Page"]]
+        if located:
+            with st.expander("🔍 Where did these figures come from?"):
+                st.dataframe(
+                    [{k: f[k] for k in ("Figure", "Year", "Value", "Page")} for f in located],
+                    use_container_width=True
+                )
+                labels = [f"{f['Figure']}{' ' + str(f['Year']) if f['Year'] else ''}: {f['Value']:,.0f} (p. {f['Page']})" for f in located]
+                picked = st.selectbox("Show source for", ["—"] + labels)
+                if picked != "—":
+                    figure = located[labels.index(picked)]
+                    st.image(
+                        clip_thumbnail(uploaded_file.getvalue(), doc["file_hash"], figure["Page"], figure["bbox"]),
+                        caption=f"Page {figure['Page']}"
+                    )
+
         # ---- AI + Keyword-Based Budget Extraction (via backend) ----
         st.subheader("🤖 AI + Keyword-Enhanced Budget Figures")
-        merged_results = extract_combined_budget_info(text)
+        merged_results = result["merged"]
+        if result["ai_source"] == "local":
+            st.caption("🧮 Structured figures from the local rule set (offline mode).")
 
         if merged_results:
             st.json(merged_results)
@@ -372,31 +491,84 @@ elif menu == "📑 Upload Doc":
 
         # ---- Climate Programmes Analysis ----
         st.subheader("🌍 Climate Programmes (2023 vs 2024)")
-        climate_df = extract_climate_programmes(text)
-        total_budget = extract_total_budget(text)
+        view = st.radio(
+            "Show amounts as",
+            VIEWS,
+            format_func=VIEW_LABELS.get,
+            horizontal=True,
+            key="amount_view",
+            help="Real and USD views use the deflator and exchange-rate tables in data/.",
+        )
+        climate_df = doc["climate_df"]
+        total_budget = doc["indicators"].get("total_budget")
+        clamped = clamped_years([2022, 2023, 2024], view)
+        if clamped:
+            table = "CPI" if view == "real" else "exchange-rate"
+            st.warning(f"⚠️ No {table} data for {', '.join(map(str, clamped))}; the nearest year on record is used.")
 
         if climate_df is not None:
-            st.dataframe(climate_df, use_container_width=True)
+            st.dataframe(cached_panel((doc["file_hash"], "climate"), climate_df, view), use_container_width=True)
 
             if total_budget:
-                st.write(f"**Total 2024 Budget (all programmes):** {total_budget:,.0f} ZMW")
+                st.write(f"**Total 2024 Budget (all programmes):** {convert([total_budget], [2024], view)[0]:,.0f} {unit_label(view)}")
 
-            st.plotly_chart(climate_multi_year_chart(climate_df, total_budget=total_budget), use_container_width=True)
-            st.plotly_chart(climate_2024_vs_total_chart(climate_df, total_budget=total_budget), use_container_width=True)
+            st.plotly_chart(climate_multi_year_chart(climate_df, total_budget=total_budget, cube=cube, document=doc_key, view=view), use_container_width=True)
+            st.plotly_chart(climate_2024_vs_total_chart(climate_df, total_budget=total_budget, view=view), use_container_width=True)
 
         else:
             st.info("No climate programme data detected (codes 07, 17, 18, 41, 61).")
 
+        # ---- Budget Hierarchy ----
+        tree = doc["budget_tree"]
+        if tree.root.children:
+            with st.expander("🏛️ Budget Hierarchy (Head → Vote → Programme)"):
+                st.dataframe(tree.to_frame(), use_container_width=True)
+                checks = tree.validate()
+                if not checks.empty:
+                    mismatches = int((checks["Status"] == "mismatch").sum())
+                    st.write(f"**Printed totals cross-checked:** {len(checks)} · mismatches: {mismatches}")
+                    st.dataframe(checks, use_container_width=True)
+
         # ---- Agriculture Analysis ----
         st.subheader("🌾 Agriculture Budget Analysis")
-        df, totals = extract_agriculture_budget(text)
+        df, totals = doc["agriculture_df"], doc["agriculture_totals"]
         if df is not None:
-            st.dataframe(df, use_container_width=True)
+            st.dataframe(cached_panel((doc["file_hash"], "agriculture"), df, view), use_container_width=True)
             st.write("**Agriculture Totals:**", totals)
-            st.plotly_chart(agriculture_bar_chart(df, totals, year=2024), use_container_width=True)
+            st.plotly_chart(agriculture_bar_chart(df, totals, year=2024, cube=cube, document=doc_key, view=view), use_container_width=True)
         else:
             st.info("No agriculture budget data detected.")
 
+        # ---- Oversight Report (rendered in the background) ----
+        st.subheader("📥 Annual Budget Oversight Report")
+        report_key = f"report_{doc['file_hash']}"
+        report_future = st.session_state.get(report_key)
+        if report_future is None:
+            if st.button("📄 Generate Report"):
+                section = report_section(doc, uploaded_file.name, indicators=merged_results)
+                st.session_state[report_key] = submit_report([section])
+                st.rerun()
+        elif report_future.done():
+            try:
+                report_pdf = report_future.result()
+            except Exception as e:
+                report_pdf = None
+                st.error(f"❌ Report generation failed: {e}")
+                if st.button("🔁 Try again"):
+                    del st.session_state[report_key]
+                    st.rerun()
+            if report_pdf is not None:
+                st.download_button(
+                    "⬇️ Download Report (PDF)",
+                    report_pdf,
+                    file_name=f"{os.path.splitext(uploaded_file.name)[0]}_oversight_report.pdf",
+                    mime="application/pdf"
+                )
+        else:
+            st.info("⏳ Report is being generated in the background…")
+            if st.button("🔄 Check again"):
+                st.rerun()
+
 # ---------------- Survey ----------------
 elif menu == "📝 Survey":
     if not st.session_state.logged_in:
@@ -444,14 +616,25 @@ elif menu == "📝 Survey":
             mitigation = numeric_results.get("Mitigation", 0)
 
             percentages = calc_percentages(total_budget, public, adaptation, mitigation)
+            countries = available_countries()
+            country = st.selectbox(
+                "Benchmark against",
+                countries,
+                index=countries.index("Zambia") if "Zambia" in countries else 0
+            )
             st.plotly_chart(
                 bar_percent_chart(
                     ["Public", "Adaptation", "Mitigation"], 
                     percentages,
-                    "Share of Total Budget (%)"
+                    "Share of Total Budget (%)",
+                    country=country
                 ),
                 use_container_width=True
             )
+            st.dataframe(
+                evaluate_compliance(["Public", "Adaptation", "Mitigation"], percentages, country=country),
+                use_container_width=True
+            )
     else:
         st.info("Please enter numeric values above to see results.")
 
@@ -526,14 +709,14 @@ with col2:
         st.rerun()
 
 with col3:
-    st.markdown("""
+    st.markdown(f"""
         <h4>Contact</h4>
         <p>Email: info@parliament.gov.zm</p>
         <p>📍 Parliament road, Lusaka</p>
         <div class="social-icons">
-            <a href="#"><img src="https://cdn-icons-png.flaticon.com/512/733/733547.png" alt="Facebook" width="20"/></a>
-            <a href="#"><img src="https://cdn-icons-png.flaticon.com/512/733/733579.png" alt="Twitter" width="20"/></a>
-            <a href="#"><img src="https://cdn-icons-png.flaticon.com/512/2111/2111463.png" alt="LinkedIn" width="20"/></a>
+            <a href="#"><img src="{asset_url("images/icons/facebook.svg")}" alt="Facebook" width="20"/></a>
+            <a href="#"><img src="{asset_url("images/icons/twitter.svg")}" alt="Twitter" width="20"/></a>
+            <a href="#"><img src="{asset_url("images/icons/linkedin.svg")}" alt="LinkedIn" width="20"/></a>
         </div>
     """, unsafe_allow_html=True)
 
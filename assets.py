@@ -0,0 +1,41 @@
+import os
+import shutil
+from functools import lru_cache
+
+from page_cache import bytes_key
+
+APP_DIR = os.path.dirname(os.path.abspath(__file__))
+
+# Streamlit serves <app dir>/static at app/static when
+# server.enableStaticServing is on (see .streamlit/config.toml).
+STATIC_DIR = os.path.join(APP_DIR, "static")
+# Point this at a CDN or reverse proxy that serves STATIC_DIR with long-lived
+# Cache-Control headers; the hashed names make that safe.
+ASSET_BASE_URL = os.getenv("CMAT_ASSET_BASE_URL", "app/static").rstrip("/")
+
+
+# ---- Content-Hashed Assets ----
+@lru_cache(maxsize=None)
+def asset_url(path):
+    """
+    Publishes a file from the repo (e.g. "styles.css") into STATIC_DIR under
+    a content-hashed name and returns its URL. The name changes whenever the
+    file does, so browsers can keep cached copies indefinitely. Resolved once
+    per server process.
+    """
+    source = os.path.join(APP_DIR, path)
+    with open(source, "rb") as f:
+        digest = bytes_key(f.read())[:12]
+    stem, ext = os.path.splitext(os.path.basename(path))
+    name = f"{stem}.{digest}{ext}"
+    target = os.path.join(STATIC_DIR, name)
+    if not os.path.exists(target):
+        os.makedirs(STATIC_DIR, exist_ok=True)
+        tmp = f"{target}.{os.getpid()}.tmp"
+        shutil.copyfile(source, tmp)
+        os.replace(tmp, target)
+    return f"{ASSET_BASE_URL}/{name}"
+
+
+def stylesheet_tag(path):
+    return f'<link rel="stylesheet" href="{asset_url(path)}">'
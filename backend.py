@@ -1,13 +1,23 @@
-import fitz  # PyMuPDF
 import pandas as pd
 import plotly.express as px
 import plotly.graph_objects as go
 import re
 from openai import OpenAI
-import os, json
+import os
 from dotenv import load_dotenv
-from openai import OpenAI
 from openai import RateLimitError, AuthenticationError
+from extractors import extract_text
+from rules import REGISTRY, keyword_ruleset
+from page_cache import load_json, save_json, text_key
+from models import LineItem, line_items_frame, to_wide, year_totals
+from retrieval import build_context, retrieve
+from compaction import compact_excerpt, compact_text, fit_chunks, furniture_lines
+from stream_json import IncrementalObjectParser
+from thresholds import evaluate_compliance
+from circuit_breaker import CircuitBreaker
+from budget_tree import build_budget_tree
+from normalize import convert, convert_long, convert_wide, unit_label
+from regex_guard import guard
 
 load_dotenv()
 print("DEBUG: OPENAI_API_KEY_1 loaded?", bool(os.getenv("OPENAI_API_KEY_1")))
@@ -23,50 +33,205 @@ CMAT_INDICATORS = {
 # Initialize OpenAI
 # Load both keys from .env
 API_KEYS = [
-    os.getenv("OPENAI_API_KEY_1"),
-    os.getenv("OPENAI_API_KEY_2")
+    key for key in (os.getenv("OPENAI_API_KEY_1"), os.getenv("OPENAI_API_KEY_2")) if key
 ]
 
+# ---- Extraction Mode ----
+# llm: model only · local: rule registry only (no network) · hybrid: model,
+# falling back to local rules whenever the model is unavailable
+EXTRACTION_MODES = ["hybrid", "llm", "local"]
+EXTRACTION_MODE = os.getenv("CMAT_EXTRACTION_MODE", "hybrid")
+LLM_TIMEOUT = float(os.getenv("CMAT_LLM_TIMEOUT", "20"))
+
+# Once the API is known to be down, skip it instead of waiting for timeouts
+llm_breaker = CircuitBreaker(
+    failure_threshold=int(os.getenv("CMAT_LLM_FAILURES", "2")),
+    cooldown=float(os.getenv("CMAT_LLM_COOLDOWN", "60")),
+)
+
 current_key_index = 0
-client = OpenAI(api_key=API_KEYS[current_key_index])
+client = None
 
-def get_client():
+def get_client(rotate=False):
     """
-    Returns a working OpenAI client. 
+    Returns an OpenAI client, created on first use.
     If quota/auth errors happen, rotate to the next key.
     """
     global client, current_key_index
-    try:
-        return client
-    except (RateLimitError, AuthenticationError):
+    if not API_KEYS:
+        return None
+    if rotate and len(API_KEYS) > 1:
         current_key_index = (current_key_index + 1) % len(API_KEYS)
-        client = OpenAI(api_key=API_KEYS[current_key_index])
+        client = None
         print(f"⚠️ Switched to backup key #{current_key_index+1}")
-        return client
+    if client is None:
+        # Retries are left to the circuit breaker so outages fail fast
+        client = OpenAI(api_key=API_KEYS[current_key_index], timeout=LLM_TIMEOUT, max_retries=0)
+    return client
+
+if not API_KEYS:
+    llm_breaker.trip("No OpenAI API keys configured")
+
+def llm_available():
+    return llm_breaker.state != "open"
 
 # ---- AI Extraction ----
-def ai_extract_budget_info(text: str):
+# Without page texts, compaction starts from the whole text but its ratio is
+# reported against the opening characters that used to be sent
+PROMPT_CHARS = 3000
+
+def prompt_excerpt(text: str, pages=None, doc_hash=None):
+    """
+    The document excerpt for the prompt: the most relevant chunks (or the
+    whole text) with page furniture, dot leaders and numeric-free lines
+    compacted away, cut to the token budget.
+    """
+    if pages:
+        # Rank on the raw text (prose helps retrieval), then compact only the
+        # chunks that are sent; furniture is detected on the full pages.
+        # The budget is filled best chunk first, so each indicator keeps its
+        # chunk wherever it is in the document
+        chunks = retrieve(pages, doc_hash=doc_hash, order="relevance")
+        furniture = furniture_lines(pages)
+        raw = build_context(sorted(chunks, key=lambda chunk: chunk[0]))
+        compacted = [(page, c) for page, c in ((p, compact_text(t, furniture)) for p, t in chunks) if c]
+        compacted = build_context(fit_chunks(compacted, build_context))
+    else:
+        raw = text[:PROMPT_CHARS]
+        compacted = compact_text(text)
+    excerpt, _ = compact_excerpt(raw, compacted)
+    return excerpt
+
+# Schema-constrained output: one nullable number per CMAT indicator, so the
+# streamed answer is a flat object that can be parsed field by field
+AI_FIELDS = CMAT_INDICATORS["Finance"] + CMAT_INDICATORS["Sectors"]
+AI_RESPONSE_FORMAT = {
+    "type": "json_schema",
+    "json_schema": {
+        "name": "budget_indicators",
+        "strict": True,
+        "schema": {
+            "type": "object",
+            "properties": {field: {"type": ["number", "null"]} for field in AI_FIELDS},
+            "required": AI_FIELDS,
+            "additionalProperties": False,
+        },
+    },
+}
+
+def ai_extract_budget_info(text: str, pages=None, doc_hash=None, on_field=None):
     """
     Uses GPT to analyze PDF text and extract structured budget data.
+    When the page texts are given, only the chunks most relevant to the CMAT
+    indicators are sent instead of the opening characters; either way the
+    excerpt is compacted first (see prompt_excerpt).
+    The answer is streamed and parsed as it arrives: `on_field(name, value)`
+    is called for each indicator as soon as its value is complete, and
+    fields received before a cut-off or malformed tail are still returned.
+    Returns {} straight away while the circuit breaker is open.
     """
+    excerpt = prompt_excerpt(text, pages, doc_hash)
     prompt = f"""
     You are a financial data analyst. Extract budget allocations for climate-related programmes
     (Energy, Agriculture, Health, Transport, Water, and total budget).
-    Return results as a clean JSON object with numeric values only.
-    Text: {text[:3000]}
+    Return results as a clean JSON object with numeric values only; use null when a value is not in the text.
+    Text: {excerpt}
     """
+    # Revised uploads usually keep the same opening pages, so reuse the answer
+    cache_key = text_key(prompt)
+    cached = load_json("llm", cache_key)
+    if cached is not None:
+        if on_field:
+            for name, value in cached.items():
+                on_field(name, value)
+        return cached
+
+    if not llm_breaker.allow():
+        return {}
+
+    parser = IncrementalObjectParser()
     try:
-        response = client.chat.completions.create(
+        api = get_client()
+        if api is None:
+            raise RuntimeError("No OpenAI API keys configured")
+        stream = api.chat.completions.create(
             model="gpt-4o-mini",
             messages=[{"role": "system", "content": "You are a financial data analyst."},
                       {"role": "user", "content": prompt}],
-            temperature=0
+            temperature=0,
+            response_format=AI_RESPONSE_FORMAT,
+            stream=True
         )
-        content = response.choices[0].message["content"]
-        return json.loads(content)
-    except Exception as e:
+        for chunk in stream:
+            if not chunk.choices:
+                continue
+            delta = chunk.choices[0].delta.content
+            if delta:
+                for name, value in parser.feed(delta):
+                    if on_field and value is not None:
+                        on_field(name, value)
+    except (RateLimitError, AuthenticationError) as e:
         print("AI extraction failed:", e)
+        llm_breaker.record_failure(str(e))
+        get_client(rotate=True)
         return {}
+    except ValueError as e:
+        # A malformed answer is not an outage; keep what was parsed
+        print("AI extraction failed:", e)
+        llm_breaker.record_success()
+    except Exception as e:
+        # Connection drops, timeouts and server errors; keep any fields that arrived
+        print("AI extraction failed:", e)
+        llm_breaker.record_failure(str(e))
+        if not parser.fields:
+            return {}
+    else:
+        llm_breaker.record_success()
+
+    for name, value in parser.close():
+        if on_field and value is not None:
+            on_field(name, value)
+    result = {k: v for k, v in parser.fields.items() if v is not None}
+    # Only complete answers are cached; a partial one is retried next time
+    if result and parser.complete:
+        save_json("llm", cache_key, result)
+    return result
+
+# ---- Local (Offline) Extraction ----
+# Rule-registry results under the indicator names the model returns
+LOCAL_RULE_LABELS = {
+    "total_budget": "Total Budget",
+    "total_public_investment": "Public",
+    "private_investment": "Private Sector Investment",
+    "sector_energy": "Energy",
+    "sector_agriculture": "Agriculture",
+    "sector_health": "Health",
+    "sector_transport": "Transport",
+    "sector_water": "Water",
+}
+
+def local_extract_budget_info(text: str, pages=None):
+    """
+    Deterministic, CPU-only extraction from the compiled rule registry.
+    """
+    found = REGISTRY.extract(pages if pages else text)
+    return {label: found[name] for name, label in LOCAL_RULE_LABELS.items() if name in found}
+
+def model_extract_budget_info(text: str, pages=None, doc_hash=None, mode=None, on_field=None):
+    """
+    Applies the extraction mode. Returns (results, source) where source is
+    "llm", "local" or "none". `on_field` streams model fields as they arrive.
+    """
+    mode = mode or EXTRACTION_MODE
+    if mode == "local":
+        return local_extract_budget_info(text, pages), "local"
+
+    results = ai_extract_budget_info(text, pages=pages, doc_hash=doc_hash, on_field=on_field)
+    if results:
+        return results, "llm"
+    if mode == "hybrid":
+        return local_extract_budget_info(text, pages), "local"
+    return {}, "none"
 
 # ---- AI + Keyword Combined Extraction ----
 def clean_numeric_value(val):
@@ -90,42 +255,44 @@ def clean_numeric_value(val):
 
     return None
 
-def extract_combined_budget_info(text: str):
+BUDGET_KEYWORDS = [
+    "total public investment in climate initiatives",
+    "percentage of national budget allocated to climate adaptation",
+    "private sector investment mobilized", 
+    "energy", "agriculture", "health", "transport", "water"
+]
+
+# Map keyword keys to clean indicator names
+KEYWORD_LABELS = {
+    "total": "Total Budget",
+    "adaptation": "Adaptation",
+    "public": "Public",
+    "private": "Private Sector Investment",
+    "energy": "Energy",
+    "agriculture": "Agriculture",
+    "health": "Health",
+    "transport": "Transport",
+    "water": "Water"
+}
+
+def keyword_budget_info(text: str):
     """
-    Runs AI + keyword extraction and merges results.
-    AI takes priority; keywords fill missing values.
-    Returns a clean dictionary.
+    Keyword-only half of the combined extraction.
     """
-    ai_results = ai_extract_budget_info(text) or {}
-    keyword_results = extract_numbers_from_text(
-        text,
-        keywords=[
-            "total public investment in climate initiatives",
-            "percentage of national budget allocated to climate adaptation",
-            "private sector investment mobilized", 
-            "energy", "agriculture", "health", "transport", "water"
-        ]
-    )
+    return extract_numbers_from_text(text, keywords=BUDGET_KEYWORDS)
 
+def merge_budget_info(ai_results, keyword_results):
+    """
+    Merges AI and keyword results: AI takes priority; keywords fill missing
+    values. Returns a clean dictionary.
+    """
     # Start with AI results
-    merged = ai_results.copy()
-
-    # Map keyword keys to clean indicator names
-    mapping = {
-        "total": "Total Budget",
-        "adaptation": "Adaptation",
-        "public": "Public",
-        "energy": "Energy",
-        "agriculture": "Agriculture",
-        "health": "Health",
-        "transport": "Transport",
-        "water": "Water"
-    }
+    merged = (ai_results or {}).copy()
 
     for k, v in keyword_results.items():
         clean_key = k.lower().strip()
         mapped_key = None
-        for kw, label in mapping.items():
+        for kw, label in KEYWORD_LABELS.items():
             if kw in clean_key:
                 mapped_key = label
                 break
@@ -133,52 +300,80 @@ def extract_combined_budget_info(text: str):
             merged[mapped_key] = v
 
     # ✅ Clean all values before returning
-    merged = {k: clean_numeric_value(v) for k, v in merged.items() if v is not None}
+    return {k: clean_numeric_value(v) for k, v in merged.items() if v is not None}
 
-    return merged
+def extract_combined_budget_info(text: str, pages=None, doc_hash=None):
+    """
+    Runs AI + keyword extraction and merges results.
+    AI takes priority; keywords fill missing values.
+    Returns a clean dictionary.
+    """
+    ai_results, _ = model_extract_budget_info(text, pages=pages, doc_hash=doc_hash)
+    return merge_budget_info(ai_results, keyword_budget_info(text))
 
 
 # ---- PDF Extraction ----
-def extract_text_from_pdf(uploaded_file, max_pages=None):
-    text = []
-    with fitz.open(stream=uploaded_file.read(), filetype="pdf") as doc:
-        for page_num, page in enumerate(doc):
-            if max_pages and page_num >= max_pages:
-                break
-            text.append(page.get_text("text") or "")
-    return "\n".join(text)
+def extract_text_from_pdf(uploaded_file, max_pages=None, backend=None):
+    """
+    Extracts document text through the shared engine in extractors.py.
+    The default PyMuPDF backend OCRs scanned (image-only) pages.
+    """
+    return extract_text(uploaded_file, backend=backend, max_pages=max_pages)
 
 # ---- Agriculture Budget Extraction ----
-def extract_agriculture_budget(text: str):
+AGRICULTURE_YEARS = [2024, 2023, 2022]
+
+# A programme name is a run of words separated by whitespace, matched only
+# from the start of the run. Words and gaps cannot overlap, so a long run of
+# text is scanned once (the old `[A-Za-z\s\-\(\)]+\s+` form was cubic on it).
+_PROGRAMME_WORD = r"[A-Za-z\-\(\)]++"
+AGRICULTURE_LINE_RE = guard(
+    "agriculture:line",
+    rf"(?<![A-Za-z\s\-\(\)])\s*+(?P<programme>{_PROGRAMME_WORD}(?:\s++{_PROGRAMME_WORD})*+)"
+    r"\s+\d+\s+(?P<budget2024>[\d,]+)\s+(?P<budget2023>[\d,]+)\s+(?P<budget2022>[\d,]+)"
+)
+
+def iter_agriculture_line_items(text: str, start_line=0):
     """
-    Extracts agriculture budget lines from text and returns DataFrame + totals.
+    Streams agriculture budget lines found in the text as LineItems
+    (one per programme per year).
     """
-    rows = []
-    pattern = re.compile(
-        r"(?P<programme>[A-Za-z\s\-\(\)]+)\s+\d+\s+(?P<budget2024>[\d,]+)\s+(?P<budget2023>[\d,]+)\s+(?P<budget2022>[\d,]+)"
-    )
-
-    for match in pattern.finditer(text):
+    line = start_line
+    for match in AGRICULTURE_LINE_RE.finditer(text):
         prog = match.group("programme").strip()
         if "agric" in prog.lower():
-            rows.append({
-                "Programme": prog,
-                "2024": float(match.group("budget2024").replace(",", "")),
-                "2023": float(match.group("budget2023").replace(",", "")),
-                "2022": float(match.group("budget2022").replace(",", "")),
-            })
-
-    df = pd.DataFrame(rows)
-    if df.empty:
+            for year in AGRICULTURE_YEARS:
+                group = f"budget{year}"
+                yield LineItem(
+                    prog, year, float(match.group(group).replace(",", "")), line=line, span=match.span(group)
+                )
+            line += 1
+
+def agriculture_frame(frame):
+    """
+    Builds the agriculture DataFrame + totals from a line-item frame.
+    """
+    if frame is None or frame.empty:
         return None, None
+    return to_wide(frame, AGRICULTURE_YEARS), year_totals(frame, sorted(AGRICULTURE_YEARS))
 
-    totals = df[["2022", "2023", "2024"]].sum().to_dict()
-    return df, totals
+def extract_agriculture_budget(text: str):
+    """
+    Extracts agriculture budget lines from text and returns DataFrame + totals.
+    """
+    return agriculture_frame(line_items_frame(iter_agriculture_line_items(text)))
 
-def agriculture_bar_chart(df, totals, year=2024):
+def agriculture_bar_chart(df, totals, year=2024, cube=None, document=None, view="nominal"):
     """
     Simple bar chart for agriculture programmes in a given year.
+    If a BudgetCube is given, the bars come from its roll-ups.
+    `view` is "nominal", "real" (constant prices) or "usd".
     """
+    if cube is not None:
+        cells = cube.long(("programme",), sector="Agriculture", climate=False, year=year, document=document)
+        df = pd.DataFrame({"Programme": cells["programme"], str(year): cells["amount"]})
+    df = convert_wide(df, view)
+
     fig = px.bar(
         df,
         x="Programme",
@@ -187,8 +382,8 @@ def agriculture_bar_chart(df, totals, year=2024):
         text=str(year),
         template="plotly_white"
     )
-    fig.update_traces(texttemplate="%{text}", textposition="outside")
-    fig.update_layout(margin=dict(t=60, r=20, l=20, b=40))
+    fig.update_traces(texttemplate="%{text:,.0f}", textposition="outside")
+    fig.update_layout(yaxis_title=f"Budget ({unit_label(view)})", margin=dict(t=60, r=20, l=20, b=40))
     return fig
 
 
@@ -200,6 +395,23 @@ def bar_chart(data_dict, title):
     fig.update_layout(margin=dict(t=60, r=20, l=20, b=40))
     return fig
 
+def comparison_bar_chart(frame, columns, title):
+    """
+    Grouped bars per document for the given columns of a comparison frame.
+    """
+    melted = frame.melt(id_vars=["Document"], value_vars=columns, var_name="Indicator", value_name="Value")
+    fig = px.bar(
+        melted.dropna(subset=["Value"]),
+        x="Indicator",
+        y="Value",
+        color="Document",
+        barmode="group",
+        title=title,
+        template="plotly_white"
+    )
+    fig.update_layout(yaxis_tickformat=",", margin=dict(t=60, r=20, l=20, b=40))
+    return fig
+
 def radar_chart(data_dict, title):
     indicators = list(data_dict.keys())
     values = list(data_dict.values())
@@ -222,17 +434,8 @@ def extract_numbers_from_text(text, keywords=None):
     if not keywords:
         keywords = ["total budget", "public", "adaptation", "mitigation"]
 
-    clean_text = text.lower()
-    for key in keywords:
-        pattern = rf"{key}[^0-9]*([\d,\.]+)"
-        match = re.search(pattern, clean_text)
-        if match:
-            num_str = match.group(1).replace(",", "")
-            try:
-                results[key] = float(num_str)
-            except ValueError:
-                results[key] = None
-    return results
+    # One compiled matcher per keyword list, one pass over the text
+    return keyword_ruleset(tuple(keywords)).extract(text)
 
 # ---- Map Extracted Values to Survey Defaults ----
 def prepare_survey_defaults(extracted_numbers):
@@ -256,42 +459,13 @@ def calc_percentages(total_budget: float, public: float, adaptation: float, miti
     vals = [public, adaptation, mitigation]
     return [(v / total_budget) * 100 for v in vals]
 
-# ---- Simple Bar Chart ----
-def bar_chart(data_dict, title):
-    df = pd.DataFrame({"Indicator": list(data_dict.keys()), "Value": list(data_dict.values())})
-    fig = px.bar(df, x="Indicator", y="Value", text="Value", title=title, template="plotly_white")
-    fig.update_traces(texttemplate="%{text}", textposition="outside")
-    fig.update_layout(margin=dict(t=60, r=20, l=20, b=40))
-    return fig
-
-# ---- Radar Chart ----
-def radar_chart(data_dict, title):
-    indicators = list(data_dict.keys())
-    values = list(data_dict.values())
-
-    fig = go.Figure()
-    fig.add_trace(go.Scatterpolar(r=values, theta=indicators, fill="toself", name="Indicators"))
-    fig.update_layout(
-        polar=dict(radialaxis=dict(visible=True)),
-        showlegend=False,
-        title=title,
-        template="plotly_white"
-    )
-    return fig
-
 # ---- Bar Chart with Country Targets ----
-def bar_percent_chart(labels, percentages, title, country="Default"):
-    thresholds = COUNTRY_THRESHOLDS.get(country, DEFAULT_THRESHOLDS)
-
-    df = pd.DataFrame({"Indicator": labels, "Percent": [round(p, 2) for p in percentages]})
+def bar_percent_chart(labels, percentages, title, country="Default", year=None):
+    # Targets come from data/thresholds.json via the threshold engine
+    df = evaluate_compliance(labels, percentages, country=country, year=year)
 
-    colors = []
-    for label, val in zip(df["Indicator"], df["Percent"]):
-        threshold = thresholds.get(label, None)
-        if threshold is not None:
-            colors.append("green" if val >= threshold else "red")
-        else:
-            colors.append("gray")
+    status_colors = {"met": "green", "below": "red", "no target": "gray"}
+    colors = [status_colors[s] for s in df["Status"]]
 
     top = max([0] + percentages)
     max_y = 100 if top <= 100 else min(120, top + 10)
@@ -310,28 +484,43 @@ def bar_percent_chart(labels, percentages, title, country="Default"):
     return fig
 
 
-def extract_climate_programmes(text: str):
-    """
-    Extracts 2023 and 2024 budget allocations for climate-related programmes
-    (07, 17, 18, 41, 61).
-    Handles line breaks and ensures correct year mapping.
-    """
-    rows = []
-    climate_codes = {
-        "07": "Irrigation Development",
-        "17": "Irrigation Development Support Programme",
-        "18": "Farming Systems / SCRALA",
-        "41": "Chiansi Water Development Project",
-        "61": "Programme for Adaptation of Climate Change (PIDACC) Zambezi",
-    }
+CLIMATE_CODES = {
+    "07": "Irrigation Development",
+    "17": "Irrigation Development Support Programme",
+    "18": "Farming Systems / SCRALA",
+    "41": "Chiansi Water Development Project",
+    "61": "Programme for Adaptation of Climate Change (PIDACC) Zambezi",
+}
+# Programme code followed by at least 3 numbers; the gap before the third
+# skips only non-numeric text, so it never rescans what it passed over
+CLIMATE_LINE_RES = {
+    code: guard(f"climate:{code}", rf"\b{code}\b\s+([\d,]+)\s+([\d,]+)[^\d,]*+([\d,]+)")
+    for code in CLIMATE_CODES
+}
+
 
-    # Normalize text: collapse multiple spaces and join broken lines
-    clean_text = re.sub(r"\s+", " ", text)
+CLIMATE_YEARS = [2023, 2024]
 
-    for code, name in climate_codes.items():
-        # Look for the programme code followed by at least 3 numbers on the same logical line
-        pattern = re.compile(rf"\b{code}\b\s+([\d,]+)\s+([\d,]+).*?([\d,]+)")
-        match = pattern.search(clean_text)
+# Sector each climate-tagged programme rolls up to in the budget cube
+CLIMATE_SECTORS = {
+    "07": "Agriculture",
+    "17": "Agriculture",
+    "18": "Agriculture",
+    "41": "Water",
+    "61": "Environment",
+}
+
+
+def iter_climate_line_items(text: str):
+    """
+    Streams 2023 and 2024 allocations for the climate-tagged programme codes
+    found in the text as LineItems (first match per code).
+    """
+    for line, (code, name) in enumerate(CLIMATE_CODES.items()):
+        # Look for the programme code followed by at least 3 numbers on the same logical line.
+        # The pattern takes any whitespace run (line breaks included) between them, so it
+        # runs on the raw text and the spans point into it.
+        match = CLIMATE_LINE_RES[code].search(text)
         if match:
             try:
                 budget2022 = float(match.group(1).replace(",", ""))
@@ -340,34 +529,47 @@ def extract_climate_programmes(text: str):
             except ValueError:
                 continue
 
-            rows.append({
-                "Programme": f"{code} - {name}",
-                "2023": budget2023,
-                "2024": budget2024
-            })
+            programme = f"{code} - {name}"
+            yield LineItem(programme, 2023, budget2023, code=code, line=line, span=match.span(2))
+            yield LineItem(programme, 2024, budget2024, code=code, line=line, span=match.span(3))
 
-    df = pd.DataFrame(rows)
-    return df if not df.empty else None
 
+def climate_frame(frame):
+    """
+    Wide (Programme, 2023, 2024) view of climate line items, or None.
+    """
+    if frame is None or frame.empty:
+        return None
+    return to_wide(frame, CLIMATE_YEARS)
 
-def extract_total_budget(text: str):
+
+def extract_climate_programmes(text: str):
+    """
+    Extracts 2023 and 2024 budget allocations for climate-related programmes
+    (07, 17, 18, 41, 61).
+    Handles line breaks and ensures correct year mapping.
+    """
+    return climate_frame(line_items_frame(iter_climate_line_items(text)))
+
+
+def extract_total_budget(text: str, tree=None):
     """
     Extracts the overall total 2024 budget value.
-    Looks for the biggest number near the word 'Total'.
-    """
-    pattern = re.compile(r"Total.*?([\d,]+)", re.IGNORECASE)
-    matches = pattern.findall(text)
-    if matches:
-        # take the largest number (total is usually the biggest figure)
-        numbers = [float(m.replace(",", "")) for m in matches]
-        return max(numbers)
-    return None
+    Uses the printed grand total (or the roll-up of the parsed heads) from
+    the budget tree; falls back to the biggest number near the word 'Total'.
+    """
+    tree = tree or build_budget_tree(text)
+    total = tree.total_budget(2024)
+    if total:
+        return total
+    # take the largest number (total is usually the biggest figure)
+    return REGISTRY.extract(text).get("total_budget")
 
 
-def climate_bar_chart(df, total_budget=None):
+def climate_bar_chart(df, total_budget=None, tree=None):
     """
     Bar chart for climate programmes (2023 vs 2024 budgets).
-    If total_budget is provided, also show % share.
+    If a budget tree or total_budget is provided, also show % share.
     """
     melted = df.melt(id_vars=["Programme"], value_vars=["2023", "2024"], var_name="Year", value_name="Budget")
 
@@ -385,10 +587,15 @@ def climate_bar_chart(df, total_budget=None):
     fig.update_layout(margin=dict(t=60, r=20, l=20, b=40), yaxis_title="Budget (ZMW)")
 
     # Add % share annotations if total provided
+    if tree is not None and not total_budget:
+        total_budget = tree.total_budget(2024)
     if total_budget:
         annotations = []
         for _, row in df.iterrows():
-            share = (row["2024"] / total_budget) * 100 if total_budget else 0
+            # Programmes found in the tree use its roll-up (sub-programmes included)
+            share = tree.share(row["Programme"].split(" - ")[0], 2024) if tree is not None else None
+            if share is None:
+                share = (row["2024"] / total_budget) * 100
             annotations.append(dict(
                 x=row["Programme"],
                 y=row["2024"],
@@ -401,62 +608,40 @@ def climate_bar_chart(df, total_budget=None):
 
     return fig
 
-def climate_2024_vs_total_chart(df, total_budget=10222074515):
-    """
-    Bar chart for climate programmes (2024 only) vs. total 2024 national budget.
-    """
-    # Build dataframe with climate 2024 figures
-    df_2024 = df[["Programme", "2024"]].copy()
-
-    fig = px.bar(
-        df_2024,
-        x="Programme",
-        y="2024",
-        text="2024",
-        title="🌍 Climate-Tagged Programmes (2024 vs Total Budget)",
-        template="plotly_white"
-    )
-
-    # Add total budget reference line
-    fig.add_hline(
-        y=total_budget,
-        line_dash="dash",
-        line_color="red",
-        annotation_text=f"Total Budget: {total_budget:,.0f} ZMW",
-        annotation_position="top left",
-        annotation_font=dict(color="red", size=12)
-    )
-
-    # Show budget figures on bars
-    fig.update_traces(texttemplate="%{text:,.0f}", textposition="outside")
-
-    # Format y-axis with commas
-    fig.update_layout(
-        yaxis_title="Budget (ZMW)",
-        yaxis_tickformat=",",
-        margin=dict(t=60, r=20, l=20, b=40)
-    )
-
-    return fig
-
-def climate_multi_year_chart(df, total_budget=None):
+def climate_multi_year_chart(df, total_budget=None, cube=None, document=None, view="nominal"):
     """
     Grouped bar chart (2022 vs 2023 vs 2024) for climate programmes
     (codes 07, 17, 18, 41, 61).
     Y-axis = average total of 2022, 2023, 2024 budgets.
+    If a BudgetCube is given, the bars and totals come from its roll-ups
+    (optionally sliced to one document).
+    `view` is "nominal", "real" (constant prices) or "usd"; each year is
+    converted before averaging, so the line compares like with like.
     """
-    # Ensure 2022 is included
-    if "2022" not in df.columns:
-        df["2022"] = 0
-
-    melted = df.melt(
-        id_vars=["Programme"],
-        value_vars=["2022", "2023", "2024"],
-        var_name="Year",
-        value_name="Budget"
-    )
+    years = ["2022", "2023", "2024"]
+    if cube is not None:
+        cells = convert_long(cube.long(("programme", "year"), climate=True, document=document), view)
+        melted = pd.DataFrame({
+            "Programme": cells["programme"],
+            "Year": cells["year"].astype(str),
+            "Budget": cells["amount"],
+        })
+        year_values = [cube.value(year=int(y), climate=True, document=document) for y in years]
+        avg_total = convert(year_values, [int(y) for y in years], view).mean()
+    else:
+        df = convert_wide(df, view)
+        # Ensure 2022 is included
+        if "2022" not in df.columns:
+            df["2022"] = 0
+
+        melted = df.melt(
+            id_vars=["Programme"],
+            value_vars=years,
+            var_name="Year",
+            value_name="Budget"
+        )
 
-    avg_total = melted.groupby("Year")["Budget"].sum().mean()
+        avg_total = melted.groupby("Year")["Budget"].sum().mean()
 
     fig = px.bar(
         melted,
@@ -476,25 +661,26 @@ def climate_multi_year_chart(df, total_budget=None):
         y=avg_total,
         line_dash="dot",
         line_color="blue",
-        annotation_text=f"Avg 2022–2024 Total: {avg_total:,.0f} ZMW",
+        annotation_text=f"Avg 2022–2024 Total: {avg_total:,.0f} {unit_label(view)}",
         annotation_position="top left",
         annotation_font=dict(color="blue", size=12)
     )
 
     fig.update_layout(
-        yaxis_title="Budget (ZMW)",
+        yaxis_title=f"Budget ({unit_label(view)})",
         yaxis_tickformat=",",
         margin=dict(t=60, r=20, l=20, b=40)
     )
     return fig
 
 
-def climate_2024_vs_total_chart(df, total_budget=10222074515):
+def climate_2024_vs_total_chart(df, total_budget=10222074515, view="nominal"):
     """
     Bar chart for climate programmes (2024 only) vs. total 2024 national budget.
-    Handles NoneType total_budget safely.
+    Handles NoneType total_budget safely. Bars and the total line are both
+    converted to `view`.
     """
-    df_2024 = df[["Programme", "2024"]].copy()
+    df_2024 = convert_wide(df[["Programme", "2024"]], view)
 
     fig = px.bar(
         df_2024,
@@ -508,13 +694,14 @@ def climate_2024_vs_total_chart(df, total_budget=10222074515):
     # Ensure total_budget is a number
     if total_budget is None:
         total_budget = 0
+    total_budget = float(convert([total_budget], [2024], view)[0])
 
     # Add total budget reference line
     fig.add_hline(
         y=total_budget,
         line_dash="dash",
         line_color="red",
-        annotation_text=f"Total Budget: {total_budget:,.0f} ZMW" if total_budget else "Total Budget: N/A",
+        annotation_text=f"Total Budget: {total_budget:,.0f} {unit_label(view)}" if total_budget else "Total Budget: N/A",
         annotation_position="top left",
         annotation_font=dict(color="red", size=12)
     )
@@ -524,7 +711,7 @@ def climate_2024_vs_total_chart(df, total_budget=10222074515):
 
     # Format y-axis with commas
     fig.update_layout(
-        yaxis_title="Budget (ZMW)",
+        yaxis_title=f"Budget ({unit_label(view)})",
         yaxis_tickformat=",",
         margin=dict(t=60, r=20, l=20, b=40)
     )
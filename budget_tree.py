@@ -0,0 +1,288 @@
+import re
+from dataclasses import dataclass, field
+
+import pandas as pd
+
+from regex_guard import IGNORECASE, guard
+
+LEVELS = ("root", "head", "vote", "programme", "subprogramme")
+TREE_YEARS = [2022, 2023, 2024]  # amount columns, right-aligned
+TOLERANCE = 0.005  # relative difference still counted as a match
+
+_AMOUNT = r"\d{1,3}(?:,\d{3})+(?:\.\d+)?|\d{4,}(?:\.\d+)?"
+_AMOUNTS = rf"(?P<amounts>(?:{_AMOUNT})(?:\s+(?:{_AMOUNT})){{0,{len(TREE_YEARS) - 1}}})"
+
+HEAD_RE = guard("tree:head", r"^\s*HEAD\s*(?:No\.?)?\s*:?\s*(?P<code>\d{1,3})\b\s*[-–:.]?\s*(?P<name>.*?)\s*$", IGNORECASE)
+VOTE_RE = guard("tree:vote", r"^\s*VOTE\s*(?:No\.?)?\s*:?\s*(?P<code>\d{1,3})\b\s*[-–:.]?\s*(?P<name>.*?)\s*$", IGNORECASE)
+# The label is every non-digit before the amounts (trailing blank included),
+# taken in one go once the first "total" is found; a lazy label followed by
+# \s+ was quadratic on long lines
+TOTAL_RE = guard(
+    "tree:total", rf"^\s*+(?P<label>(?>[A-Za-z\- ]*?\btotal\b)\D*+)(?<=\s){_AMOUNTS}\s*$", IGNORECASE
+)
+LINE_RE = guard(
+    "tree:line", rf"^\s*(?P<code>\d{{2,4}}(?:[.\-/]\d{{1,3}})?)\s+(?:(?P<name>\D.*?)\s+)?{_AMOUNTS}\s*$"
+)
+_YEAR_RE = re.compile(r"(?:19|20)\d\d")
+
+
+# ---- Nodes ----
+@dataclass(slots=True, eq=False)
+class BudgetNode:
+    level: str
+    code: str
+    name: str = ""
+    parent: "BudgetNode | None" = None
+    children: dict = field(default_factory=dict)
+    own: dict = field(default_factory=dict)       # year -> amount on this line (leaves only)
+    totals: dict = field(default_factory=dict)    # year -> subtree sum, kept up to date
+    reported: dict = field(default_factory=dict)  # year -> "Total" figure printed in the document
+
+    @property
+    def path(self):
+        node, parts = self, []
+        while node.parent is not None:
+            parts.append(node.code)
+            node = node.parent
+        return tuple(reversed(parts))
+
+
+# ---- Budget Tree ----
+class BudgetTree:
+    """
+    Head → vote → programme → sub-programme hierarchy with subtree sums.
+
+    Amounts live on the leaves; every change walks up the (at most four)
+    ancestors with the difference, so totals are always current and a
+    share of the budget is a dictionary lookup.
+    """
+
+    def __init__(self):
+        self.root = BudgetNode("root", "")
+        self.by_code = {}  # programme / sub-programme code -> first node with it
+
+    # ---- Updates ----
+    def _propagate(self, node, year, delta):
+        while node is not None:
+            node.totals[year] = node.totals.get(year, 0.0) + delta
+            node = node.parent
+
+    def add(self, level, code, name="", parent=None):
+        """
+        Returns the child `code` of `parent` (the root by default), creating
+        it if needed. A leaf that gains children keeps its own amounts only as
+        reported figures, so they are not counted twice.
+        """
+        parent = parent or self.root
+        node = parent.children.get(code)
+        if node is None:
+            if not parent.children and parent.own:
+                for year, amount in parent.own.items():
+                    parent.reported.setdefault(year, amount)
+                    self._propagate(parent, year, -amount)
+                parent.own.clear()
+            node = BudgetNode(level, code, name, parent)
+            parent.children[code] = node
+            if level in ("programme", "subprogramme"):
+                self.by_code.setdefault(code, node)
+        elif name and not node.name:
+            node.name = name
+        return node
+
+    def set_amount(self, node, year, amount):
+        """
+        Sets a line's amount for one year. On a node that has children the
+        figure is recorded as its reported total instead.
+        """
+        if node.children:
+            node.reported[year] = amount
+            return
+        delta = amount - node.own.get(year, 0.0)
+        node.own[year] = amount
+        self._propagate(node, year, delta)
+
+    def remove(self, node):
+        for year, amount in node.totals.items():
+            self._propagate(node.parent, year, -amount)
+        del node.parent.children[node.code]
+        for n in self.iter_nodes(node):
+            if self.by_code.get(n.code) is n:
+                del self.by_code[n.code]
+
+    # ---- Lookups ----
+    def find(self, code):
+        return self.by_code.get(code)
+
+    def total(self, year, node=None):
+        return (node or self.root).totals.get(year, 0.0)
+
+    def total_budget(self, year=TREE_YEARS[-1]):
+        """
+        The printed grand total if there is one; otherwise the roll-up of
+        the parsed heads. None when the text has no budget structure.
+        """
+        if year in self.root.reported:
+            return self.root.reported[year]
+        if any(child.level == "head" for child in self.root.children.values()):
+            return self.root.totals.get(year)
+        return None
+
+    def share(self, node_or_code, year=TREE_YEARS[-1]):
+        """
+        Percentage of the total budget for a node (or programme code).
+        """
+        node = self.find(node_or_code) if isinstance(node_or_code, str) else node_or_code
+        total = self.total_budget(year)
+        if node is None or not total:
+            return None
+        return node.totals.get(year, 0.0) / total * 100
+
+    def iter_nodes(self, node=None):
+        stack = [node or self.root]
+        while stack:
+            node = stack.pop()
+            yield node
+            stack.extend(reversed(list(node.children.values())))
+
+    # ---- Validation ----
+    def validate(self, tolerance=TOLERANCE):
+        """
+        Cross-checks every printed "Total" against the computed roll-up of
+        the lines under it. Returns one row per (node, year).
+        """
+        rows = []
+        for node in self.iter_nodes():
+            if not node.children:
+                continue
+            for year, reported in sorted(node.reported.items()):
+                computed = node.totals.get(year, 0.0)
+                difference = reported - computed
+                ok = abs(difference) <= tolerance * max(abs(reported), 1.0)
+                rows.append({
+                    "Level": node.level,
+                    "Code": "/".join(node.path) or "—",
+                    "Name": node.name,
+                    "Year": str(year),
+                    "Reported": reported,
+                    "Computed": computed,
+                    "Difference": difference,
+                    "Status": "ok" if ok else "mismatch",
+                })
+        return pd.DataFrame(rows, columns=["Level", "Code", "Name", "Year", "Reported", "Computed", "Difference", "Status"])
+
+    def to_frame(self, years=TREE_YEARS):
+        """
+        One row per node (depth-first) with its subtree totals per year.
+        """
+        rows = []
+        for node in self.iter_nodes():
+            if node is self.root:
+                continue
+            row = {"Level": node.level, "Code": node.code, "Name": node.name}
+            row.update({str(y): node.totals.get(y, 0.0) for y in years})
+            rows.append(row)
+        return pd.DataFrame(rows, columns=["Level", "Code", "Name"] + [str(y) for y in years])
+
+
+# ---- Parsing ----
+def _amounts(match):
+    return [float(v.replace(",", "")) for v in match.group("amounts").split()]
+
+
+def _by_year(amounts, years):
+    # Amount columns are right-aligned: a short row is missing the early years
+    return dict(zip(years[-len(amounts):], amounts))
+
+
+_GRAND_TOTALS = {"grand total", "total budget", "total national budget", "national budget total"}
+_BARE_TOTALS = {"total", "totals", "subtotal", "sub total", "sub-total"}
+
+
+def _total_scope(label, head, vote, programme, last_leaf, root):
+    """
+    The group a "Total" row closes, or None if the row is some other
+    figure that merely starts with "Total".
+    """
+    label = " ".join(re.sub(r"[^a-z\- ]", " ", label.lower()).split())
+    if label in _GRAND_TOTALS:
+        return root
+    if label in _BARE_TOTALS:
+        # Closes the group the last line item belongs to
+        return last_leaf.parent if last_leaf is not None else None
+    if label in ("head total", "total head", "total for head"):
+        return head
+    if label in ("vote total", "total vote", "total for vote"):
+        return vote
+    if label in ("programme total", "total programme", "total for programme"):
+        return programme
+    return None
+
+
+def parse_tree_lines(text):
+    """
+    The lines of the text that shape the tree, as JSON-friendly events:
+    ["head", code, name], ["vote", code, name], ["total", label, amounts]
+    and ["line", code, name, amounts]. Pages parse independently, so the
+    events can be cached per page and replayed for the whole document.
+    """
+    events = []
+    for line in text.splitlines():
+        m = HEAD_RE.match(line)
+        if m:
+            events.append(["head", m.group("code"), m.group("name")])
+            continue
+        m = VOTE_RE.match(line)
+        if m:
+            events.append(["vote", m.group("code"), m.group("name")])
+            continue
+        m = TOTAL_RE.match(line)
+        if m:
+            events.append(["total", m.group("label"), _amounts(m)])
+            continue
+        m = LINE_RE.match(line)
+        if not m or _YEAR_RE.fullmatch(m.group("code")):
+            continue
+        events.append(["line", m.group("code"), (m.group("name") or "").strip(), _amounts(m)])
+    return events
+
+
+def tree_from_events(events, years=TREE_YEARS):
+    """
+    Builds the hierarchy from parsed line events in one pass. Head and vote
+    headings open groups; coded lines with amounts become programmes (or
+    sub-programmes for codes like 4101-01); "Total" rows are recorded as
+    reported figures on the group they close.
+    """
+    tree = BudgetTree()
+    head = vote = programme = last_leaf = None
+
+    for kind, *fields in events:
+        if kind == "head":
+            head = tree.add("head", *fields)
+            vote = programme = None
+        elif kind == "vote":
+            vote = tree.add("vote", *fields, parent=head)
+            programme = None
+        elif kind == "total":
+            label, amounts = fields
+            scope = _total_scope(label, head, vote, programme, last_leaf, tree.root)
+            if scope is not None:
+                scope.reported.update(_by_year(amounts, years))
+        else:
+            code, name, amounts = fields
+            if re.search(r"[.\-/]", code) and programme is not None:
+                node = tree.add("subprogramme", code, name, parent=programme)
+            else:
+                node = programme = tree.add("programme", code, name, parent=vote or head)
+            for year, amount in _by_year(amounts, years).items():
+                tree.set_amount(node, year, amount)
+            last_leaf = node
+
+    return tree
+
+
+def build_budget_tree(text, years=TREE_YEARS):
+    """
+    Builds the hierarchy from the text in one pass over its lines.
+    """
+    return tree_from_events(parse_tree_lines(text), years)
@@ -0,0 +1,66 @@
+import threading
+import time
+
+
+class CircuitBreaker:
+    """
+    Skips calls to a dependency that is known to be down.
+
+    closed    -> calls go through; `failure_threshold` consecutive failures open it
+    open      -> calls are refused immediately for `cooldown` seconds
+    half-open -> one trial call is let through; success closes, failure re-opens
+    """
+
+    def __init__(self, failure_threshold=2, cooldown=60.0):
+        self.failure_threshold = failure_threshold
+        self.cooldown = cooldown
+        self.failures = 0
+        self.opened_at = None
+        self.trial_in_flight = False
+        self.last_error = None
+        self._lock = threading.Lock()
+
+    @property
+    def state(self):
+        if self.opened_at is None:
+            return "closed"
+        if time.monotonic() - self.opened_at >= self.cooldown:
+            return "half-open"
+        return "open"
+
+    def allow(self):
+        """
+        True if a call may be attempted now.
+        """
+        with self._lock:
+            state = self.state
+            if state == "closed":
+                return True
+            if state == "half-open" and not self.trial_in_flight:
+                self.trial_in_flight = True
+                return True
+            return False
+
+    def record_success(self):
+        with self._lock:
+            self.failures = 0
+            self.opened_at = None
+            self.trial_in_flight = False
+            self.last_error = None
+
+    def record_failure(self, error=None):
+        with self._lock:
+            self.failures += 1
+            self.last_error = error
+            if self.trial_in_flight or self.failures >= self.failure_threshold:
+                self.opened_at = time.monotonic()
+            self.trial_in_flight = False
+
+    def trip(self, error=None):
+        """
+        Opens the breaker straight away (e.g. no API keys configured).
+        """
+        with self._lock:
+            self.failures = max(self.failures, self.failure_threshold)
+            self.opened_at = time.monotonic()
+            self.last_error = error
@@ -0,0 +1,176 @@
+import logging
+import os
+import re
+import sys
+from collections import Counter
+from functools import lru_cache
+
+from regex_guard import guard
+
+# Token budget for the document excerpt in an extraction prompt. A retrieved
+# chunk (500 characters) is up to ~130 tokens, so the default holds one for
+# each of the nine indicator queries
+PROMPT_TOKEN_BUDGET = int(os.getenv("CMAT_PROMPT_TOKENS", "1200"))
+TOKENIZER_ENCODING = os.getenv("CMAT_TOKENIZER", "o200k_base")  # gpt-4o family
+# A line on at least this share of pages (and on 2+ pages) is page furniture
+FURNITURE_SHARE = 0.5
+HEADING_WORDS = 8  # numeric-free lines this short are kept as row headings
+
+# Page text is untrusted, so these run under regex_guard's time budget.
+# Whitespace before a leader is only taken from the start of a run, and
+# possessively: an unanchored \s* retried every position of a long blank
+# run and was quadratic.
+_DOT_LEADER_RE = guard("compaction:dot leader", r"(?:(?<!\s)\s++)?(?:(?:\.\s?){3,}|…+|_{3,})\s*+")
+_COLUMN_GAP_RE = guard("compaction:column gap", r"\s{2,}+|\t++")
+_NUMERIC_CELL_RE = guard("compaction:numeric cell", r"^[\s(]*+-?[\d,]+(?:\.\d+)?%?[)\s]*+$|^-$")
+_DIGIT_RE = re.compile(r"\d")
+_PAGE_NUMBER_RE = re.compile(r"(?<![\d,.])\d{1,3}(?![\d,.])")
+
+logger = logging.getLogger(__name__)
+
+
+# ---- Token Counting ----
+@lru_cache(maxsize=1)
+def _encoder():
+    """
+    The local tiktoken encoder, or None when tiktoken (or its encoding
+    file) is not available offline.
+    """
+    try:
+        import tiktoken
+        return tiktoken.get_encoding(TOKENIZER_ENCODING)
+    except Exception:
+        return None
+
+
+def count_tokens(text):
+    encoder = _encoder()
+    if encoder is None:
+        return (len(text) + 3) // 4  # ~4 characters per token for English text
+    return len(encoder.encode(text, disallowed_special=()))
+
+
+# ---- Page Furniture ----
+def _line_key(line):
+    # Page numbers differ per page; compare the rest of the line
+    return _PAGE_NUMBER_RE.sub("#", " ".join(line.split())).lower()
+
+
+def furniture_lines(pages, min_share=FURNITURE_SHARE):
+    """
+    Normalized lines repeated across pages: running headers and footers,
+    "Page N of M", and column titles printed above every table.
+    """
+    if len(pages) < 2:
+        return frozenset()
+    counts = Counter()
+    for page in pages:
+        counts.update({_line_key(line) for line in page.splitlines() if line.strip()})
+    threshold = max(2, min_share * len(pages))
+    return frozenset(key for key, n in counts.items() if n >= threshold)
+
+
+# ---- Compaction ----
+def compact_text(text, furniture=frozenset()):
+    """
+    Strips page furniture and dot leaders, joins table cells that were
+    extracted one per line into "label | value | value" rows, and drops
+    numeric-free lines except short headings directly above a figure.
+    """
+    rows = []
+    for line in text.splitlines():
+        line = line.strip()
+        if not line or _line_key(line) in furniture:
+            continue
+        line = _COLUMN_GAP_RE.sub(" | ", _DOT_LEADER_RE.sub(" | ", line)).strip(" |")
+        if rows and _NUMERIC_CELL_RE.match(line):
+            rows[-1] = f"{rows[-1]} | {line}"
+        elif line:
+            rows.append(line)
+
+    kept = []
+    for i, row in enumerate(rows):
+        if _DIGIT_RE.search(row):
+            kept.append(row)
+        elif len(row.split()) <= HEADING_WORDS and i + 1 < len(rows) and _DIGIT_RE.search(rows[i + 1]):
+            kept.append(row)
+    return "\n".join(kept)
+
+
+def fit_token_budget(text, budget=PROMPT_TOKEN_BUDGET):
+    """
+    Cuts the text at a line boundary so it fits the token budget.
+    """
+    if count_tokens(text) <= budget:
+        return text
+    lines = text.splitlines()
+    lo, hi = 0, len(lines)
+    while lo < hi:
+        mid = (lo + hi + 1) // 2
+        if count_tokens("\n".join(lines[:mid])) <= budget:
+            lo = mid
+        else:
+            hi = mid - 1
+    return "\n".join(lines[:lo])
+
+
+def fit_chunks(chunks, render, budget=PROMPT_TOKEN_BUDGET):
+    """
+    Keeps (page, text) chunks, most relevant first, while `render(chunks)`
+    still fits the token budget; a chunk that does not fit is skipped, so a
+    shorter one after it can still go in. The kept chunks come back in page
+    order. If not even the best chunk fits, it is cut to the budget.
+    """
+    kept = []
+    for chunk in chunks:
+        if count_tokens(render(kept + [chunk])) <= budget:
+            kept.append(chunk)
+    if not kept and chunks:
+        page, text = chunks[0]
+        header = count_tokens(render([(page, "")]))
+        kept = [(page, fit_token_budget(text, max(budget - header, 0)))]
+    return sorted(kept, key=lambda chunk: chunk[0])
+
+
+def compaction_stats(raw, compacted):
+    raw_tokens, compact_tokens = count_tokens(raw), count_tokens(compacted)
+    return {
+        "raw_chars": len(raw),
+        "compact_chars": len(compacted),
+        "raw_tokens": raw_tokens,
+        "compact_tokens": compact_tokens,
+        "ratio": raw_tokens / compact_tokens if compact_tokens else float("inf"),
+    }
+
+
+def compact_excerpt(raw, compacted, budget=PROMPT_TOKEN_BUDGET):
+    """
+    Fits the compacted excerpt to the budget and logs (at debug level) the
+    compaction ratio against the raw excerpt it replaces. Returns
+    (excerpt, stats).
+    """
+    excerpt = fit_token_budget(compacted, budget)
+    stats = compaction_stats(raw, excerpt)
+    logger.debug(
+        "Prompt compaction: %d -> %d tokens (%.1fx)", stats["raw_tokens"], stats["compact_tokens"], stats["ratio"]
+    )
+    return excerpt, stats
+
+
+if __name__ == "__main__":
+    from extractors import extract_pages
+
+    if len(sys.argv) < 2:
+        print("Usage: python compaction.py <pdf> [...]")
+        sys.exit(1)
+
+    for path in sys.argv[1:]:
+        pages = extract_pages(path)
+        raw = "\n".join(pages)
+        furniture = furniture_lines(pages)
+        compacted = "\n".join(compact_text(page, furniture) for page in pages)
+        stats = compaction_stats(raw, compacted)
+        print(
+            f"{os.path.basename(path)}: {stats['raw_tokens']:,} -> {stats['compact_tokens']:,} tokens "
+            f"({stats['ratio']:.1f}x), {len(furniture)} furniture line(s)"
+        )
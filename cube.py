@@ -0,0 +1,186 @@
+from collections import defaultdict
+from itertools import product
+
+import pandas as pd
+
+from backend import CLIMATE_SECTORS
+
+DIMENSIONS = ("document", "sector", "vote", "programme", "year", "climate")
+
+# Every subset of dimensions gets its own roll-up: a mask marks the
+# dimensions kept in the key; the others are stored as None ("all").
+_MASKS = list(product((True, False), repeat=len(DIMENSIONS)))
+
+
+# ---- Budget Cube ----
+class BudgetCube:
+    """
+    Pre-aggregated sector × vote × programme × year × climate-tag cube, with
+    the source document as an extra dimension so one upload can be sliced
+    on its own or compared with others.
+
+    Each ingested record updates all 64 roll-ups at once, so any slice or
+    drill-down is a dictionary lookup instead of a melt/groupby per rerun.
+    Documents are tracked by key, so re-ingesting a revised document swaps
+    its contribution out incrementally.
+    """
+
+    def __init__(self):
+        self.cells = defaultdict(float)
+        self.members = {dim: set() for dim in DIMENSIONS}
+        self.documents = {}  # doc key -> (version tag, records)
+        self.version = 0
+        self._memo = {}
+
+    # ---- Updates ----
+    def _apply(self, record, sign):
+        values, amount = record[:-1], record[-1] * sign
+        for mask in _MASKS:
+            key = tuple(v if keep else None for v, keep in zip(values, mask))
+            total = self.cells[key] + amount
+            if sign < 0 and abs(total) < 1e-9:
+                del self.cells[key]
+            else:
+                self.cells[key] = total
+        if sign > 0:
+            for dim, value in zip(DIMENSIONS, values):
+                self.members[dim].add(value)
+
+    def add_document(self, doc_key, records, tag=None):
+        """
+        Adds (or replaces) one document's records: tuples of
+        (document, sector, vote, programme, year, climate, amount).
+        Returns False if the same `tag` (e.g. file hash) is already loaded
+        under this key.
+        """
+        if doc_key in self.documents:
+            if tag is not None and self.documents[doc_key][0] == tag:
+                return False
+            self.remove_document(doc_key)
+        records = list(records)
+        for record in records:
+            self._apply(record, 1)
+        self.documents[doc_key] = (tag, records)
+        self._changed()
+        return True
+
+    def remove_document(self, doc_key):
+        _, records = self.documents.pop(doc_key, (None, []))
+        for record in records:
+            self._apply(record, -1)
+        self._changed()
+
+    def _changed(self):
+        self.version += 1
+        self._memo.clear()
+
+    # ---- Lookups ----
+    def _key(self, filters):
+        unknown = set(filters) - set(DIMENSIONS)
+        if unknown:
+            raise ValueError(f"Unknown cube dimension(s): {', '.join(sorted(unknown))}")
+        return tuple(filters.get(dim) for dim in DIMENSIONS)
+
+    def value(self, **filters):
+        """
+        Total for a slice, e.g. cube.value(year=2024, climate=True).
+        """
+        return self.cells.get(self._key(filters), 0.0)
+
+    def breakdown(self, dim, **filters):
+        """
+        Drill-down: {member of `dim`: total} within the slice.
+        """
+        result = {}
+        for member in self.members[dim]:
+            key = self._key({**filters, dim: member})
+            if key in self.cells:
+                result[member] = self.cells[key]
+        return dict(sorted(result.items(), key=lambda kv: str(kv[0])))
+
+    def long(self, dims, **filters):
+        """
+        Long DataFrame of totals by the given dimensions within the slice.
+        Memoized until the cube changes, so reruns reuse the same frame.
+        """
+        memo_key = (tuple(dims), tuple(sorted(filters.items(), key=lambda kv: kv[0])))
+        if memo_key in self._memo:
+            return self._memo[memo_key]
+
+        fixed = self._key(filters)
+        positions = [DIMENSIONS.index(d) for d in dims]
+        rows = []
+        for key, amount in self.cells.items():
+            # Keep cells whose free dimensions are exactly `dims` and whose
+            # fixed dimensions match the filters
+            if any(
+                (key[i] is None) if i in positions else (key[i] != fixed[i])
+                for i in range(len(DIMENSIONS))
+            ):
+                continue
+            rows.append([key[i] for i in positions] + [amount])
+        frame = pd.DataFrame(rows, columns=list(dims) + ["amount"])
+        if not frame.empty:
+            frame = frame.sort_values(list(dims)).reset_index(drop=True)
+        self._memo[memo_key] = frame
+        return frame
+
+
+# ---- Ingestion ----
+def _vote_label(node):
+    while node is not None and node.level != "vote":
+        node = node.parent
+    return f"Vote {node.code}" if node is not None else ""
+
+
+def vote_lookup(tree):
+    """
+    Returns a function (code, programme) -> the vote a line item falls
+    under in the document's budget tree, found by programme code, else by
+    programme name. When the tree has a single vote every line falls under
+    it; "" when the vote is unknown.
+    """
+    if tree is None:
+        return lambda code, programme: ""
+    nodes = list(tree.iter_nodes())
+    votes = [node for node in nodes if node.level == "vote"]
+    only = _vote_label(votes[0]) if len(votes) == 1 else ""
+    by_name = {
+        node.name.lower(): node for node in reversed(nodes)
+        if node.level in ("programme", "subprogramme") and node.name
+    }
+
+    def lookup(code, programme):
+        node = (tree.find(code) if code else None) or by_name.get(programme.lower())
+        return _vote_label(node) or only
+
+    return lookup
+
+
+def document_records(doc_key, doc):
+    """
+    Turns a process_document() result into cube records. Climate programmes
+    take their sector from CLIMATE_SECTORS; agriculture lines are untagged.
+    Votes come from the document's budget tree (see vote_lookup).
+    """
+    records = []
+    vote = vote_lookup(doc.get("budget_tree"))
+    climate = doc.get("climate_items")
+    if climate is not None and not climate.empty:
+        for code, programme, year, amount in climate[["code", "programme", "year", "amount"]].itertuples(index=False):
+            sector = CLIMATE_SECTORS.get(code, "Other")
+            records.append((doc_key, sector, vote(code, programme), programme, int(year), True, float(amount)))
+    agriculture = doc.get("agriculture_items")
+    if agriculture is not None and not agriculture.empty:
+        rows = agriculture[["code", "programme", "year", "amount"]].itertuples(index=False)
+        for code, programme, year, amount in rows:
+            records.append((doc_key, "Agriculture", vote(code, programme), programme, int(year), False, float(amount)))
+    return records
+
+
+def ingest_document(cube, doc_key, doc):
+    """
+    Adds a processed document to the cube unless this exact file is already
+    loaded; a new version under the same key replaces the old one.
+    """
+    return cube.add_document(doc_key, document_records(doc_key, doc), tag=doc.get("file_hash"))
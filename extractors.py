@@ -0,0 +1,223 @@
+import io
+import os
+import re
+import sys
+import time
+from collections import Counter
+
+import fitz  # PyMuPDF
+import pandas as pd
+
+from ocr import ocr_scanned_pages
+
+DEFAULT_BACKEND = os.getenv("CMAT_PDF_BACKEND", "pymupdf")
+
+
+# ---- Source Handling ----
+def read_pdf_bytes(source):
+    """
+    Accepts raw bytes, a file path, or a file-like object (e.g. a Streamlit
+    UploadedFile) and returns the PDF bytes.
+    """
+    if isinstance(source, (bytes, bytearray)):
+        return bytes(source)
+    if isinstance(source, (str, os.PathLike)):
+        with open(source, "rb") as f:
+            return f.read()
+    if hasattr(source, "getvalue"):
+        return source.getvalue()
+    return source.read()
+
+
+# ---- Backends ----
+# Every backend takes (pdf_bytes, max_pages) and returns one string per page.
+def _pymupdf_pages(data, max_pages=None, ocr=True):
+    pages = []
+    with fitz.open(stream=data, filetype="pdf") as doc:
+        for page_num, page in enumerate(doc):
+            if max_pages and page_num >= max_pages:
+                break
+            pages.append(page.get_text("text") or "")
+        if ocr:
+            pages = ocr_scanned_pages(doc, pages)
+    return pages
+
+
+def _pypdf2_pages(data, max_pages=None):
+    import PyPDF2
+
+    reader = PyPDF2.PdfReader(io.BytesIO(data))
+    pages = []
+    for page_num, page in enumerate(reader.pages):
+        if max_pages and page_num >= max_pages:
+            break
+        pages.append(page.extract_text() or "")
+    return pages
+
+
+def _layout_page_text(page, column_gap=12.0, line_tolerance=3.0):
+    """
+    Rebuilds table rows from word boxes: words on the same baseline are joined
+    left-to-right, and wide horizontal gaps become column separators.
+    """
+    words = page.get_text("words")  # x0, y0, x1, y1, word, block, line, word_no
+    words.sort(key=lambda w: (round(w[3] / line_tolerance), w[0]))
+
+    lines, current, last_y, last_x1 = [], [], None, None
+    for x0, _, x1, y1, word, *_ in words:
+        if last_y is not None and abs(y1 - last_y) > line_tolerance:
+            lines.append("".join(current))
+            current, last_x1 = [], None
+        if last_x1 is not None:
+            current.append("  " if x0 - last_x1 > column_gap else " ")
+        current.append(word)
+        last_y, last_x1 = y1, x1
+    if current:
+        lines.append("".join(current))
+    return "\n".join(lines)
+
+
+def _layout_pages(data, max_pages=None):
+    pages = []
+    with fitz.open(stream=data, filetype="pdf") as doc:
+        for page_num, page in enumerate(doc):
+            if max_pages and page_num >= max_pages:
+                break
+            pages.append(_layout_page_text(page))
+    return pages
+
+
+BACKENDS = {
+    "pymupdf": _pymupdf_pages,
+    "pypdf2": _pypdf2_pages,
+    "layout": _layout_pages,
+}
+
+
+def register_backend(name, func):
+    """
+    Adds an extraction backend. `func(pdf_bytes, max_pages=None)` must return
+    a list with one text string per page.
+    """
+    BACKENDS[name] = func
+
+
+# ---- Public API ----
+def extract_pages(source, backend=None, max_pages=None):
+    """
+    Returns the text of each page using the named backend.
+    """
+    backend = backend or DEFAULT_BACKEND
+    if backend not in BACKENDS:
+        raise ValueError(f"Unknown PDF backend '{backend}'. Available: {', '.join(BACKENDS)}")
+    return BACKENDS[backend](read_pdf_bytes(source), max_pages=max_pages)
+
+
+def extract_text(source, backend=None, max_pages=None):
+    """
+    Returns the whole document text, pages separated by newlines.
+    """
+    return "\n".join(extract_pages(source, backend=backend, max_pages=max_pages))
+
+
+# ---- Comparison Harness ----
+_TOKEN_RE = re.compile(r"\w+")
+_NUMBER_RE = re.compile(r"\d[\d,]*(?:\.\d+)?")
+
+
+def _overlap(a: Counter, b: Counter):
+    if not a and not b:
+        return 1.0
+    return sum((a & b).values()) / max(sum(a.values()), sum(b.values()))
+
+
+def agreement(text, reference):
+    """
+    Multiset overlap of words and of numbers between two extractions (0–1).
+    Numbers are scored separately because they are what the extractors need.
+    """
+    words = _overlap(Counter(_TOKEN_RE.findall(text.lower())), Counter(_TOKEN_RE.findall(reference.lower())))
+    numbers = _overlap(
+        Counter(n.replace(",", "") for n in _NUMBER_RE.findall(text)),
+        Counter(n.replace(",", "") for n in _NUMBER_RE.findall(reference)),
+    )
+    return words, numbers
+
+
+def compare_backends(paths, backends=None, reference=None, max_pages=None):
+    """
+    Runs every backend over every PDF and reports throughput and agreement
+    with the reference backend. The document type is the PDF's parent folder
+    name, so a corpus laid out as corpus/<type>/*.pdf is grouped by type.
+    """
+    backends = list(backends or BACKENDS)
+    reference = reference or DEFAULT_BACKEND
+    rows = []
+    for path in paths:
+        data = read_pdf_bytes(path)
+        outputs = {}
+        for name in backends:
+            start = time.perf_counter()
+            try:
+                pages = BACKENDS[name](data, max_pages=max_pages)
+                error = None
+            except Exception as e:
+                pages, error = [], str(e)
+            elapsed = time.perf_counter() - start
+            outputs[name] = "\n".join(pages)
+            rows.append({
+                "Document": os.path.basename(path),
+                "Type": os.path.basename(os.path.dirname(os.path.abspath(path))),
+                "Backend": name,
+                "Pages": len(pages),
+                "Seconds": elapsed,
+                "Pages/sec": len(pages) / elapsed if elapsed > 0 else 0.0,
+                "Error": error,
+            })
+        ref_text = outputs.get(reference)
+        if ref_text is None:
+            ref_text = "\n".join(BACKENDS[reference](data, max_pages=max_pages))
+        for row in rows[-len(backends):]:
+            row["Word Agreement"], row["Number Agreement"] = agreement(outputs[row["Backend"]], ref_text)
+
+    return pd.DataFrame(rows)
+
+
+def pick_backends(report, min_agreement=0.95):
+    """
+    For each document type, picks the fastest backend whose mean number
+    agreement with the reference is at least `min_agreement`.
+    """
+    summary = (
+        report[report["Error"].isna()]
+        .groupby(["Type", "Backend"])
+        .agg(pages_per_sec=("Pages/sec", "mean"), number_agreement=("Number Agreement", "mean"))
+        .reset_index()
+    )
+    picks = {}
+    for doc_type, group in summary.groupby("Type"):
+        accurate = group[group["number_agreement"] >= min_agreement]
+        if accurate.empty:
+            accurate = group.nlargest(1, "number_agreement")
+        picks[doc_type] = accurate.sort_values("pages_per_sec", ascending=False).iloc[0]["Backend"]
+    return picks
+
+
+if __name__ == "__main__":
+    if len(sys.argv) < 2:
+        print("Usage: python extractors.py <pdf or folder> [...]")
+        sys.exit(1)
+
+    pdfs = []
+    for arg in sys.argv[1:]:
+        if os.path.isdir(arg):
+            for root, _, files in os.walk(arg):
+                pdfs += [os.path.join(root, f) for f in sorted(files) if f.lower().endswith(".pdf")]
+        else:
+            pdfs.append(arg)
+
+    report = compare_backends(pdfs)
+    print(report.to_string(index=False))
+    print("\nFastest accurate backend per document type:")
+    for doc_type, name in pick_backends(report).items():
+        print(f"  {doc_type}: {name}")
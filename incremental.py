@@ -0,0 +1,260 @@
+import hashlib
+import os
+import re
+
+import fitz  # PyMuPDF
+import pandas as pd
+
+from backend import agriculture_frame, climate_frame, iter_agriculture_line_items, iter_climate_line_items
+from budget_tree import parse_tree_lines, tree_from_events
+from extractors import read_pdf_bytes
+from ocr import ocr_scanned_pages
+from page_cache import bytes_key, load_json, save_json
+from provenance import PageWords, locate_figures
+from models import LineItem, line_items_frame
+from rules import REGISTRY
+
+YEARS = [2022, 2023, 2024]
+DIFF_COLUMNS = ["Section", "Programme", "Year", "Previous", "Revised", "Change"]
+
+# Bump when page-level extractors change so stale cached outputs are ignored.
+EXTRACTOR_VERSION = 3
+PAGE_NAMESPACE = f"pages-v{EXTRACTOR_VERSION}"
+DOC_NAMESPACE = f"lineage-v{EXTRACTOR_VERSION}"
+# Versions of one document kept for revision diffs
+MAX_VERSIONS = 10
+
+
+# ---- Page Fingerprints ----
+def page_fingerprint(doc, page):
+    """
+    Hashes a page's drawing instructions and embedded images. Unchanged pages
+    in a revised PDF hash the same even when other pages moved around them.
+    """
+    h = hashlib.sha256()
+    h.update(f"{page.rect.width:.1f}x{page.rect.height:.1f}".encode())
+    h.update(page.read_contents() or b"")
+    for img in page.get_images(full=False):
+        h.update(doc.xref_stream_raw(img[0]) or b"")
+    return h.hexdigest()
+
+
+def document_key(name):
+    """
+    Revisions are matched to earlier uploads by file name, ignoring case,
+    extension and words like 'revised'/'supplementary'/'v2'.
+    """
+    stem = os.path.splitext(os.path.basename(name or "document"))[0].lower()
+    # '_' is a word character, so separators go first or \b never fires
+    stem = re.sub(r"[_.\-]+", " ", stem)
+    stem = re.sub(r"\b(revised|revision|supplementary|final|draft|v\d+)\b", " ", stem)
+    return re.sub(r"[^a-z0-9]+", "-", stem).strip("-") or "document"
+
+
+# ---- Per-Page Extraction ----
+def analyze_page(text, words=()):
+    """
+    Runs every page-level extractor once. The result is JSON-serializable so
+    it can be cached by page fingerprint; line items are stored as tuples.
+    With the page's `words` (page.get_text("words"); none for OCR'd pages),
+    each figure also gets the box of the word its match came from (parallel
+    lists under "boxes"). Plain data in and out, so it can run in a worker
+    process.
+    """
+    rule_hits = REGISTRY.scan_spans(text)
+    climate = list(iter_climate_line_items(text))
+    agriculture = list(iter_agriculture_line_items(text))
+    words = PageWords(text, words)
+    return {
+        "text": text,
+        "rules": {name: [value for value, _ in found] for name, found in rule_hits.items()},
+        "climate": [item.as_tuple() for item in climate],
+        "agriculture": [item.as_tuple() for item in agriculture],
+        "tree": parse_tree_lines(text),
+        "boxes": {
+            "rules": {name: [words.at(span) for _, span in found] for name, found in rule_hits.items()},
+            "climate": [words.at(item.span) for item in climate],
+            "agriculture": [words.at(item.span) for item in agriculture],
+            "numbers": words.numbers(),
+        },
+    }
+
+
+def merge_pages(page_results):
+    """
+    Combines per-page extractor outputs into document-level results. Line
+    items come back as (LineItem, page, bbox) triples and rule hits with
+    their boxes as {name: [(page, value, bbox)]}, for provenance.
+    """
+    rule_hits, rule_boxes, climate, agriculture = {}, {}, [], []
+    first_page = {}  # programme -> page it was first found on
+    line_offset = 0
+    for page_no, result in enumerate(page_results, start=1):
+        boxes = result["boxes"]
+        for name, values in result["rules"].items():
+            rule_hits.setdefault(name, []).extend((page_no, v) for v in values)
+            rule_boxes.setdefault(name, []).extend((page_no, v, b) for v, b in zip(values, boxes["rules"][name]))
+        for values, bbox in zip(result["climate"], boxes["climate"]):
+            item = LineItem.from_tuple(values)
+            # First occurrence of a programme wins, as in the full-text scan
+            if first_page.setdefault(item.programme, page_no) == page_no:
+                climate.append((item, page_no, bbox))
+        page_lines = 0
+        for values, bbox in zip(result["agriculture"], boxes["agriculture"]):
+            item = LineItem.from_tuple(values)
+            page_lines = max(page_lines, item.line + 1)
+            item.line += line_offset
+            agriculture.append((item, page_no, bbox))
+        line_offset += page_lines
+    return rule_hits, rule_boxes, climate, agriculture
+
+
+# ---- Allocation Diff ----
+def allocation_rows(climate_items, agriculture_items, tree):
+    """
+    Every programme allocation of a version as [section, programme, year,
+    amount] rows: climate and agriculture line items, and the programmes
+    and sub-programmes of the budget tree. An agriculture programme listed
+    on several rows is numbered ("Crops (2)"), so its rows stay apart.
+    """
+    rows = [["Climate", item.programme, item.year, item.amount] for item in climate_items]
+    row_lines = {}  # programme -> its source rows, in order
+    for item in agriculture_items:
+        lines = row_lines.setdefault(item.programme, [])
+        if item.line not in lines:
+            lines.append(item.line)
+        n = lines.index(item.line) + 1
+        rows.append(["Agriculture", item.programme if n == 1 else f"{item.programme} ({n})", item.year, item.amount])
+    for node in tree.iter_nodes():
+        if node.level in ("programme", "subprogramme"):
+            label = " ".join(filter(None, ["/".join(node.path), node.name]))
+            rows.extend(["Budget tree", label, year, amount] for year, amount in sorted(node.totals.items()))
+    return rows
+
+
+def diff_allocations(previous_rows, revised_rows):
+    """
+    Returns a DataFrame of programme allocations that differ between two
+    versions (including programmes added or removed), one row per year.
+    Rows come from allocation_rows.
+    """
+    before = {(s, p, y): a for s, p, y, a in previous_rows or []}
+    after = {(s, p, y): a for s, p, y, a in revised_rows or []}
+    changes = []
+    for key in dict.fromkeys(list(before) + list(after)):
+        old, new = before.get(key), after.get(key)
+        if old == new:
+            continue
+        section, programme, year = key
+        changes.append({
+            "Section": section,
+            "Programme": programme,
+            "Year": str(year),
+            "Previous": old,
+            "Revised": new,
+            "Change": (new or 0) - (old or 0),
+        })
+    return pd.DataFrame(changes, columns=DIFF_COLUMNS)
+
+
+# ---- Incremental Document Processing ----
+def process_document(source, name=None, max_pages=None, on_pages=None, map_pages=map):
+    """
+    Extracts a PDF page by page, re-processing only pages whose fingerprint
+    has not been seen before and merging the rest from the page cache. If an
+    earlier version of the same document was processed, also returns which
+    pages changed and a diff of the programme allocations.
+
+    Versions are keyed by file hash within the document's lineage, so two
+    revisions uploaded together each keep a stable comparison.
+
+    `on_pages(texts)` is called with the page texts (cached or OCR'd) as
+    soon as they are known, before the extractors run on new pages.
+    `map_pages` runs analyze_page over the new pages (e.g. a process pool's
+    map, to run the pure-Python extractors in parallel).
+    """
+    data = read_pdf_bytes(source)
+    doc_key = document_key(name or getattr(source, "name", None))
+
+    with fitz.open(stream=data, filetype="pdf") as doc:
+        count = min(doc.page_count, max_pages) if max_pages else doc.page_count
+        hashes = [page_fingerprint(doc, doc[i]) for i in range(count)]
+        results = [load_json(PAGE_NAMESPACE, h) for h in hashes]
+
+        misses = [i for i, r in enumerate(results) if r is None]
+        texts = []
+        if misses:
+            texts = [doc[i].get_text("text") or "" for i in misses]
+            texts = ocr_scanned_pages(doc, texts, indices=misses)
+        if on_pages:
+            fresh = dict(zip(misses, texts))
+            on_pages([fresh[i] if r is None else r["text"] for i, r in enumerate(results)])
+        words = [doc[i].get_text("words") for i in misses]
+        for i, result in zip(misses, map_pages(analyze_page, texts, words)):
+            results[i] = result
+            save_json(PAGE_NAMESPACE, hashes[i], result)
+
+    rule_hits, rule_boxes, climate, agriculture = merge_pages(results)
+    climate_items = [item for item, _, _ in climate]
+    agri_items = [item for item, _, _ in agriculture]
+    # Head/vote/programme roll-up, replayed from the cached line events of each page
+    tree = tree_from_events([event for r in results for event in r["tree"]])
+    allocations = allocation_rows(climate_items, agri_items, tree)
+
+    file_hash = bytes_key(data)
+    changed_pages, diff_rows = None, None
+    lineage = load_json(DOC_NAMESPACE, doc_key) or {"versions": []}
+    versions = lineage["versions"]
+    known = [v["file_hash"] for v in versions]
+    if file_hash in known:
+        # Seen before (a rerun, or re-uploaded alongside another version):
+        # compare with the version uploaded before it, not the latest one
+        current = versions[known.index(file_hash)]
+        changed_pages = current.get("changed_pages")
+        diff_rows = current.get("allocation_diff")
+    else:
+        if versions:
+            previous = versions[-1]
+            seen = set(previous["page_hashes"])
+            changed_pages = [i + 1 for i, h in enumerate(hashes) if h not in seen]
+            diff_rows = diff_allocations(previous["allocations"], allocations).to_dict("records")
+        versions.append({
+            "name": name,
+            "file_hash": file_hash,
+            "page_hashes": hashes,
+            "allocations": allocations,
+            "changed_pages": changed_pages,
+            "allocation_diff": diff_rows,
+        })
+        lineage["versions"] = versions[-MAX_VERSIONS:]
+        save_json(DOC_NAMESPACE, doc_key, lineage)
+    allocation_diff = pd.DataFrame(diff_rows, columns=DIFF_COLUMNS) if diff_rows is not None else None
+
+    climate_items_frame = line_items_frame(climate_items)
+    agri_items_frame = line_items_frame(agri_items)
+    agri_df, agri_totals = agriculture_frame(agri_items_frame)
+    text = "\n".join(r["text"] for r in results)
+    indicators = REGISTRY.resolve(rule_hits)
+    # The tree's grand total beats the "largest number after Total" rule
+    if tree.total_budget(YEARS[-1]):
+        indicators["total_budget"] = tree.total_budget(YEARS[-1])
+    return {
+        "file_hash": file_hash,
+        "pages": [r["text"] for r in results],
+        "text": text,
+        "indicators": indicators,
+        "budget_tree": tree,
+        "provenance": locate_figures(
+            indicators, rule_boxes, climate, agriculture,
+            {page_no: r["boxes"]["numbers"] for page_no, r in enumerate(results, start=1)},
+        ),
+        "rule_hits": rule_hits,
+        "climate_items": climate_items_frame,
+        "agriculture_items": agri_items_frame,
+        "climate_df": climate_frame(climate_items_frame),
+        "agriculture_df": agri_df,
+        "agriculture_totals": agri_totals,
+        "processed_pages": [i + 1 for i in misses],
+        "changed_pages": changed_pages,
+        "allocation_diff": allocation_diff,
+    }
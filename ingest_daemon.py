@@ -0,0 +1,260 @@
+"""
+Watch-folder ingestion daemon for budget documents.
+
+Watches a drop directory and pushes every new PDF through the same pipeline
+an upload uses, so page caches, LLM answers and the search index are warm
+before anyone opens the dashboard.
+
+    python ingest_daemon.py --inbox inbox --workers 2
+
+- inotify (via watchdog) when available, directory polling otherwise
+- a file is only picked up once its size and mtime have been stable for
+  --debounce seconds, so half-copied PDFs are never read
+- files are fingerprinted by content hash; a file already in the journal
+  is skipped even if renamed or copied again
+- at most --max-pending documents are queued on the worker pool; the rest
+  wait in the folder until a slot frees up (backpressure)
+- every state change is appended to a JSONL journal, so a restart resumes
+  where it left off
+"""
+import argparse
+import json
+import os
+import threading
+import time
+from concurrent.futures import ProcessPoolExecutor
+
+from page_cache import CACHE_DIR, bytes_key
+
+INBOX_DIR = os.getenv("CMAT_INBOX", "inbox")
+JOURNAL_PATH = os.getenv("CMAT_INGEST_JOURNAL", os.path.join(CACHE_DIR, "ingest_journal.jsonl"))
+INGEST_WORKERS = int(os.getenv("CMAT_INGEST_WORKERS", "2"))
+# Same page limit as the Upload page, so its cached results line up
+INGEST_MAX_PAGES = int(os.getenv("CMAT_INGEST_MAX_PAGES", "10")) or None
+DEBOUNCE_SECONDS = 2.0
+POLL_SECONDS = 1.0
+
+
+# ---- Worker ----
+def ingest_file(path, max_pages=INGEST_MAX_PAGES, mode=None):
+    """
+    Runs one PDF through the upload pipeline and adds it to the search index.
+    Executed in a worker process; returns a small picklable summary.
+    """
+    from pipeline import run_upload_pipeline
+    from search_index import index_document
+
+    name = os.path.basename(path)
+    with open(path, "rb") as f:
+        data = f.read()
+    result = run_upload_pipeline(data, name=name, max_pages=max_pages, mode=mode, user="ingest-daemon")
+    doc = result["document"]
+    index_document(doc["file_hash"], name, doc["pages"])
+    return {
+        "pages": len(doc["pages"]),
+        "total_budget": doc["indicators"].get("total_budget"),
+        "ai_source": result["ai_source"],
+        "seconds": round(result["timings"]["total"], 3),
+    }
+
+
+# ---- Journal ----
+class Journal:
+    """
+    Append-only JSONL log of ingestion events, replayed on start-up.
+    """
+
+    def __init__(self, path=JOURNAL_PATH):
+        self.path = path
+        self.status = {}  # content hash -> last status
+        self._lock = threading.Lock()
+        if os.path.exists(path):
+            with open(path, encoding="utf-8") as f:
+                for line in f:
+                    try:
+                        entry = json.loads(line)
+                    except ValueError:
+                        continue  # torn last line after a crash
+                    self.status[entry["hash"]] = entry["status"]
+
+    def done(self, file_hash):
+        return self.status.get(file_hash) == "done"
+
+    def record(self, file_hash, path, status, **extra):
+        entry = {"time": time.time(), "hash": file_hash, "path": path, "status": status, **extra}
+        with self._lock:
+            self.status[file_hash] = status
+            os.makedirs(os.path.dirname(self.path) or ".", exist_ok=True)
+            with open(self.path, "a", encoding="utf-8") as f:
+                f.write(json.dumps(entry) + "\n")
+
+
+# ---- Watching ----
+def start_watcher(inbox, notify):
+    """
+    Calls notify(path) on file events via watchdog (inotify on Linux).
+    Returns the observer, or None when watchdog is not installed, in which
+    case the daemon falls back to polling the folder.
+    """
+    try:
+        from watchdog.events import FileSystemEventHandler
+        from watchdog.observers import Observer
+    except ImportError:
+        return None
+
+    class Handler(FileSystemEventHandler):
+        def on_any_event(self, event):
+            if not event.is_directory:
+                notify(getattr(event, "dest_path", "") or event.src_path)
+
+    observer = Observer()
+    observer.schedule(Handler(), inbox, recursive=False)
+    observer.start()
+    return observer
+
+
+def list_pdfs(inbox):
+    with os.scandir(inbox) as entries:
+        return [e.path for e in entries if e.is_file() and e.name.lower().endswith(".pdf")]
+
+
+# ---- Daemon ----
+class IngestDaemon:
+    def __init__(self, inbox=INBOX_DIR, workers=INGEST_WORKERS, max_pending=None,
+                 debounce=DEBOUNCE_SECONDS, poll=POLL_SECONDS, journal=None, mode=None):
+        self.inbox = inbox
+        self.workers = workers
+        self.max_pending = max_pending or workers * 2
+        self.debounce = debounce
+        self.poll = poll
+        self.mode = mode
+        self.journal = journal or Journal()
+        self.candidates = {}  # path -> (size, mtime, stable since)
+        self.settled = {}     # path -> (size, mtime) already fingerprinted
+        self.in_flight = {}   # future -> (path, hash)
+        self._events = set()
+        self._events_lock = threading.Lock()
+
+    def notify(self, path):
+        if path.lower().endswith(".pdf"):
+            with self._events_lock:
+                self._events.add(path)
+
+    def _changed_paths(self, polling):
+        if polling:
+            return list_pdfs(self.inbox)
+        with self._events_lock:
+            paths, self._events = self._events, set()
+        return paths
+
+    def _update_candidates(self, paths, now):
+        for path in paths:
+            try:
+                stat = os.stat(path)
+            except FileNotFoundError:
+                self.candidates.pop(path, None)
+                continue
+            signature = (stat.st_size, stat.st_mtime)
+            if self.settled.get(path) == signature:
+                continue
+            previous = self.candidates.get(path)
+            if previous is None or previous[:2] != signature:
+                self.candidates[path] = (*signature, now)
+
+    def _ready_paths(self, now):
+        """
+        Candidates whose size and mtime have not moved for `debounce` seconds.
+        """
+        ready = []
+        for path, (size, mtime, since) in list(self.candidates.items()):
+            if now - since < self.debounce:
+                continue
+            try:
+                stat = os.stat(path)
+            except FileNotFoundError:
+                del self.candidates[path]
+                continue
+            if (stat.st_size, stat.st_mtime) != (size, mtime):
+                self.candidates[path] = (stat.st_size, stat.st_mtime, now)
+                continue
+            ready.append(path)
+        return ready
+
+    def _submit(self, pool, path):
+        with open(path, "rb") as f:
+            file_hash = bytes_key(f.read())
+        del self.candidates[path]
+        stat = os.stat(path)
+        self.settled[path] = (stat.st_size, stat.st_mtime)
+        if self.journal.done(file_hash) or file_hash in {h for _, h in self.in_flight.values()}:
+            return
+        self.journal.record(file_hash, path, "queued")
+        future = pool.submit(ingest_file, path, INGEST_MAX_PAGES, self.mode)
+        self.in_flight[future] = (path, file_hash)
+        print(f"queued   {os.path.basename(path)}")
+
+    def _collect(self):
+        for future in [f for f in self.in_flight if f.done()]:
+            path, file_hash = self.in_flight.pop(future)
+            try:
+                summary = future.result()
+            except Exception as e:
+                self.journal.record(file_hash, path, "failed", error=str(e))
+                print(f"failed   {os.path.basename(path)}: {e}")
+            else:
+                self.journal.record(file_hash, path, "done", **summary)
+                print(f"ingested {os.path.basename(path)} ({summary['pages']} pages, {summary['seconds']:.2f}s)")
+
+    def run(self, once=False):
+        """
+        Runs until interrupted. With once=True, ingests what is currently in
+        the folder and returns when the queue has drained.
+        """
+        os.makedirs(self.inbox, exist_ok=True)
+        observer = None if once else start_watcher(self.inbox, self.notify)
+        polling = observer is None
+        print(f"Watching {os.path.abspath(self.inbox)} ({'polling' if polling else 'inotify'}), "
+              f"{self.workers} worker(s), up to {self.max_pending} queued")
+
+        # Files dropped while the daemon was down
+        self._update_candidates(list_pdfs(self.inbox), time.monotonic())
+        try:
+            with ProcessPoolExecutor(max_workers=self.workers) as pool:
+                while True:
+                    now = time.monotonic()
+                    self._update_candidates(self._changed_paths(polling), now)
+                    for path in self._ready_paths(now):
+                        if len(self.in_flight) >= self.max_pending:
+                            break  # backpressure: leave it in the folder for now
+                        self._submit(pool, path)
+                    self._collect()
+                    if once and not self.candidates and not self.in_flight:
+                        return
+                    time.sleep(self.poll if polling else min(self.poll, 0.5))
+        except KeyboardInterrupt:
+            print("Stopping; queued documents will be resumed on the next start.")
+        finally:
+            if observer is not None:
+                observer.stop()
+                observer.join()
+
+
+if __name__ == "__main__":
+    parser = argparse.ArgumentParser(description="Ingest budget PDFs dropped into a folder.")
+    parser.add_argument("--inbox", default=INBOX_DIR, help="folder to watch")
+    parser.add_argument("--workers", type=int, default=INGEST_WORKERS, help="worker processes")
+    parser.add_argument("--max-pending", type=int, default=None, help="queued documents before backpressure (default 2x workers)")
+    parser.add_argument("--debounce", type=float, default=DEBOUNCE_SECONDS, help="seconds a file must stay unchanged")
+    parser.add_argument("--poll", type=float, default=POLL_SECONDS, help="polling interval when inotify is unavailable")
+    parser.add_argument("--mode", choices=["hybrid", "llm", "local"], default=None, help="structured extraction mode")
+    parser.add_argument("--once", action="store_true", help="ingest the current files and exit")
+    args = parser.parse_args()
+
+    IngestDaemon(
+        inbox=args.inbox,
+        workers=args.workers,
+        max_pending=args.max_pending,
+        debounce=args.debounce,
+        poll=args.poll,
+        mode=args.mode,
+    ).run(once=args.once)
@@ -0,0 +1,307 @@
+"""
+Load test for the CMAT Streamlit app.
+
+Drives app.py headlessly with Streamlit's AppTest, replaying scripted user
+sessions (login, upload, survey, slideshow idle) at a configurable
+concurrency. Each simulated user runs in its own process, so sessions run
+in parallel and CPU time (including the pipeline workers of its uploads)
+and peak memory can be reported per session. Sessions share the on-disk
+page and model caches; the upload scheduler and pipeline executor are per
+process, so admission queueing between users is not exercised.
+
+    python loadtest.py --users 40 --concurrency 8 --mix login=1,upload=1,survey=2,slideshow=4
+
+AppTest cannot drive st.file_uploader, so the upload session navigates to the
+Upload page and then runs what an upload rerun runs (run_uploads_pipeline
+on --docs copies of a sample PDF), timed as one rerun.
+"""
+import argparse
+import json
+import multiprocessing as mp
+import os
+import random
+import resource
+import tempfile
+import time
+from concurrent.futures import ProcessPoolExecutor, as_completed
+
+import numpy as np
+
+APP_DIR = os.path.dirname(os.path.abspath(__file__))
+APP_FILE = os.path.join(APP_DIR, "app.py")
+DEFAULT_MIX = "login=1,upload=1,survey=2,slideshow=4"
+
+
+# ---- Session Scripts ----
+class Session:
+    """
+    Wraps one AppTest instance and times every rerun it triggers.
+    """
+
+    def __init__(self, timeout, think, user):
+        from streamlit.testing.v1 import AppTest
+
+        self.at = AppTest.from_file(APP_FILE, default_timeout=timeout)
+        self.think = think
+        self.user = user
+        self.latencies = []
+        self.errors = []
+
+    def timed(self, label, action):
+        start = time.perf_counter()
+        action()
+        self.latencies.append((label, time.perf_counter() - start))
+        for exc in self.at.exception:
+            self.errors.append(f"{label}: {exc.message}")
+        if self.think:
+            time.sleep(random.uniform(0.5, 1.5) * self.think)
+
+    def nav(self, key):
+        self.timed(f"nav_{key}", lambda: self.at.button(key=f"nav_{key}").click().run())
+
+    def login(self, username, password):
+        self.nav("login")
+        inputs = {t.label: t for t in self.at.text_input}
+        inputs["Username"].input(username)
+        inputs["Password"].input(password)
+        button = next(b for b in self.at.button if b.label == "Login")
+        self.timed("login", lambda: button.click().run())
+
+
+def run_login(s, opts):
+    s.timed("open", s.at.run)
+    s.login(opts["username"], opts["password"])
+    s.nav("home")
+
+
+def run_upload(s, opts):
+    from pipeline import run_uploads_pipeline
+
+    s.timed("open", s.at.run)
+    s.login(opts["username"], opts["password"])
+    s.nav("upload")
+
+    stem = os.path.splitext(os.path.basename(opts["pdf"]))[0]
+    names = [f"{stem} {i + 1}.pdf" for i in range(opts["docs"])]
+
+    def upload_rerun():
+        # Same call and arguments as the Upload page
+        run_uploads_pipeline(
+            [opts["pdf_bytes"]] * len(names),
+            names=names,
+            max_pages=10,
+            mode=None if opts["with_llm"] else "local",
+            user=s.user,
+        )
+        s.at.run()
+
+    s.timed("upload", upload_rerun)
+
+
+def run_survey(s, opts):
+    s.timed("open", s.at.run)
+    s.login(opts["username"], opts["password"])
+    s.nav("survey")
+    for field in list(s.at.number_input):
+        s.timed("survey_input", lambda f=field: f.set_value(random.choice([1000.0, 25000.0, 1e6])).run())
+
+
+def run_slideshow(s, opts):
+    s.timed("open", s.at.run)
+    s.nav("about")
+    # Each autorefresh tick is a full rerun of the script
+    for _ in range(opts["idle_ticks"]):
+        s.timed("autorefresh", s.at.run)
+
+
+SESSIONS = {
+    "login": run_login,
+    "upload": run_upload,
+    "survey": run_survey,
+    "slideshow": run_slideshow,
+}
+
+
+# ---- Worker ----
+def _cpu_seconds(who):
+    usage = resource.getrusage(who)
+    return usage.ru_utime + usage.ru_stime
+
+
+def _peak_rss_mb(who=resource.RUSAGE_SELF):
+    # ru_maxrss is KiB on Linux
+    return resource.getrusage(who).ru_maxrss / 1024
+
+
+def run_session(number, kind, opts):
+    """
+    Runs one session in a fresh worker process and returns its measurements.
+    CPU time covers every thread of the process plus pipeline worker
+    processes, which are stopped (and so accounted) before measuring.
+    """
+    from pipeline import shutdown_executor
+
+    os.chdir(APP_DIR)  # app.py opens styles.css/users.json relative to cwd
+    cpu_start = _cpu_seconds(resource.RUSAGE_SELF) + _cpu_seconds(resource.RUSAGE_CHILDREN)
+    wall_start = time.perf_counter()
+    session = Session(opts["timeout"], opts["think"], user=f"load-{number}")
+    try:
+        SESSIONS[kind](session, opts)
+    except Exception as e:
+        session.errors.append(f"{kind}: {e!r}")
+    finally:
+        shutdown_executor()
+    cpu = _cpu_seconds(resource.RUSAGE_SELF) + _cpu_seconds(resource.RUSAGE_CHILDREN) - cpu_start
+    return {
+        "kind": kind,
+        "latencies": session.latencies,
+        "errors": session.errors,
+        "cpu_seconds": cpu,
+        "wall_seconds": time.perf_counter() - wall_start,
+        # The session process, plus the largest pipeline worker it started
+        "peak_rss_mb": _peak_rss_mb() + _peak_rss_mb(resource.RUSAGE_CHILDREN),
+    }
+
+
+# ---- Reporting ----
+def percentiles(values):
+    if not values:
+        return {"n": 0}
+    arr = np.asarray(values) * 1000
+    p50, p90, p95, p99 = np.percentile(arr, [50, 90, 95, 99])
+    return {"n": len(arr), "p50_ms": p50, "p90_ms": p90, "p95_ms": p95, "p99_ms": p99, "max_ms": arr.max()}
+
+
+def summarize(results, wall_seconds, concurrency):
+    by_kind = {}
+    for r in results:
+        by_kind.setdefault(r["kind"], []).append(r)
+
+    summary = {
+        "sessions": len(results),
+        "concurrency": concurrency,
+        "wall_seconds": wall_seconds,
+        "reruns_per_second": sum(len(r["latencies"]) for r in results) / wall_seconds if wall_seconds else 0,
+        "overall": percentiles([lat for r in results for _, lat in r["latencies"]]),
+        "kinds": {},
+        "steps": {},
+        "errors": [e for r in results for e in r["errors"]],
+    }
+    for kind, runs in by_kind.items():
+        summary["kinds"][kind] = {
+            **percentiles([lat for r in runs for _, lat in r["latencies"]]),
+            "cpu_s_per_session": float(np.mean([r["cpu_seconds"] for r in runs])),
+            "peak_rss_mb_mean": float(np.mean([r["peak_rss_mb"] for r in runs])),
+            "peak_rss_mb_max": float(np.max([r["peak_rss_mb"] for r in runs])),
+        }
+    steps = {}
+    for r in results:
+        for label, lat in r["latencies"]:
+            steps.setdefault(label, []).append(lat)
+    summary["steps"] = {label: percentiles(lats) for label, lats in steps.items()}
+    return summary
+
+
+def print_summary(summary):
+    print(f"\nSessions: {summary['sessions']}  Concurrency: {summary['concurrency']}  "
+          f"Wall: {summary['wall_seconds']:.1f}s  Reruns/s: {summary['reruns_per_second']:.1f}")
+
+    def row(name, p, extra=""):
+        if not p.get("n"):
+            print(f"  {name:<14} (no reruns)")
+            return
+        print(f"  {name:<14} n={p['n']:<5} p50={p['p50_ms']:8.1f}ms p90={p['p90_ms']:8.1f}ms "
+              f"p95={p['p95_ms']:8.1f}ms p99={p['p99_ms']:8.1f}ms max={p['max_ms']:8.1f}ms{extra}")
+
+    print("\nRerun latency by session type:")
+    row("all", summary["overall"])
+    for kind, p in summary["kinds"].items():
+        row(kind, p, f"  cpu={p['cpu_s_per_session']:.2f}s/session rss={p['peak_rss_mb_mean']:.0f}MB "
+                     f"(max {p['peak_rss_mb_max']:.0f}MB)")
+
+    print("\nRerun latency by step:")
+    for label, p in summary["steps"].items():
+        row(label, p)
+
+    if summary["errors"]:
+        print(f"\n{len(summary['errors'])} error(s); first few:")
+        for e in summary["errors"][:5]:
+            print("  -", e)
+
+
+# ---- Main ----
+def parse_mix(spec):
+    mix = {}
+    for part in spec.split(","):
+        kind, _, weight = part.partition("=")
+        kind = kind.strip()
+        if kind not in SESSIONS:
+            raise SystemExit(f"Unknown session type '{kind}'. Choose from: {', '.join(SESSIONS)}")
+        mix[kind] = float(weight or 1)
+    return mix
+
+
+def sample_pdf():
+    from make_budget_pdf import create_pdf
+
+    path = os.path.join(tempfile.mkdtemp(prefix="cmat-load-"), "budget.pdf")
+    create_pdf(path)
+    return path
+
+
+def main():
+    parser = argparse.ArgumentParser(description="Simulate concurrent CMAT users.")
+    parser.add_argument("--users", type=int, default=20, help="total sessions to run")
+    parser.add_argument("--concurrency", type=int, default=4, help="sessions running at once")
+    parser.add_argument("--mix", default=DEFAULT_MIX, help="session weights, e.g. login=1,survey=2")
+    parser.add_argument("--think", type=float, default=0.0, help="mean think time between actions (s)")
+    parser.add_argument("--idle-ticks", type=int, default=6, help="autorefresh reruns per slideshow session")
+    parser.add_argument("--pdf", help="PDF for upload sessions (default: generated sample)")
+    parser.add_argument("--docs", type=int, default=1, help="documents per upload (more than one = comparison)")
+    parser.add_argument("--with-llm", action="store_true", help="include the OpenAI call in upload sessions")
+    parser.add_argument("--username", default="admin")
+    parser.add_argument("--password", default="admin")
+    parser.add_argument("--timeout", type=float, default=120, help="per-rerun timeout (s)")
+    parser.add_argument("--seed", type=int, default=0)
+    parser.add_argument("--json", help="write the summary to this file")
+    args = parser.parse_args()
+
+    mix = parse_mix(args.mix)
+    rng = random.Random(args.seed)
+    kinds = rng.choices(list(mix), weights=list(mix.values()), k=args.users)
+
+    pdf = args.pdf or sample_pdf()
+    with open(pdf, "rb") as f:
+        pdf_bytes = f.read()
+    opts = {
+        "username": args.username,
+        "password": args.password,
+        "pdf": pdf,
+        "pdf_bytes": pdf_bytes,
+        "docs": max(args.docs, 1),
+        "with_llm": args.with_llm,
+        "idle_ticks": args.idle_ticks,
+        "think": args.think,
+        "timeout": args.timeout,
+    }
+
+    # A fresh process per session keeps CPU and peak RSS attributable to it
+    ctx = mp.get_context("spawn")
+    results = []
+    start = time.perf_counter()
+    with ProcessPoolExecutor(max_workers=args.concurrency, mp_context=ctx, max_tasks_per_child=1) as pool:
+        futures = [pool.submit(run_session, n, kind, opts) for n, kind in enumerate(kinds)]
+        for done, future in enumerate(as_completed(futures), start=1):
+            results.append(future.result())
+            print(f"\r{done}/{len(futures)} sessions finished", end="", flush=True)
+    wall = time.perf_counter() - start
+
+    summary = summarize(results, wall, args.concurrency)
+    print_summary(summary)
+    if args.json:
+        with open(args.json, "w") as f:
+            json.dump(summary, f, indent=2, default=float)
+
+
+if __name__ == "__main__":
+    main()
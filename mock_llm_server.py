@@ -0,0 +1,103 @@
+"""
+Local stand-in for the OpenAI chat completions endpoint, for testing the
+streamed extraction without network access or API keys.
+
+    python mock_llm_server.py --port 8765 --delay 0.02
+    OPENAI_BASE_URL=http://localhost:8765/v1 OPENAI_API_KEY_1=mock streamlit run app.py
+
+Streaming requests get the canned answer as server-sent events, a few
+characters per chunk; --truncate N cuts the stream after N characters to
+exercise partial-result recovery.
+"""
+import argparse
+import json
+import time
+from http.server import BaseHTTPRequestHandler, ThreadingHTTPServer
+
+CANNED_ANSWER = {
+    "Total Budget": 120000000,
+    "Public": 100000000,
+    "Adaptation": 12,
+    "Mitigation": None,
+    "Energy": 25,
+    "Agriculture": 30,
+    "Health": 20,
+    "Transport": 15,
+    "Water": 10,
+}
+
+
+def make_handler(answer, delay, chunk_chars, truncate):
+    content = json.dumps(answer)
+    if truncate:
+        content = content[:truncate]
+
+    class Handler(BaseHTTPRequestHandler):
+        def log_message(self, *args):
+            pass
+
+        def _chunk(self, delta, finish_reason=None):
+            return {
+                "id": "chatcmpl-mock",
+                "object": "chat.completion.chunk",
+                "created": int(time.time()),
+                "model": "mock",
+                "choices": [{"index": 0, "delta": delta, "finish_reason": finish_reason}],
+            }
+
+        def do_POST(self):
+            if not self.path.endswith("/chat/completions"):
+                self.send_error(404)
+                return
+            body = json.loads(self.rfile.read(int(self.headers.get("Content-Length", 0))) or b"{}")
+
+            if not body.get("stream"):
+                payload = json.dumps({
+                    "id": "chatcmpl-mock",
+                    "object": "chat.completion",
+                    "created": int(time.time()),
+                    "model": "mock",
+                    "choices": [{
+                        "index": 0,
+                        "message": {"role": "assistant", "content": content},
+                        "finish_reason": "stop",
+                    }],
+                }).encode()
+                self.send_response(200)
+                self.send_header("Content-Type", "application/json")
+                self.send_header("Content-Length", str(len(payload)))
+                self.end_headers()
+                self.wfile.write(payload)
+                return
+
+            self.send_response(200)
+            self.send_header("Content-Type", "text/event-stream")
+            self.send_header("Cache-Control", "no-cache")
+            self.end_headers()
+            events = [self._chunk({"role": "assistant", "content": ""})]
+            events += [self._chunk({"content": content[i:i + chunk_chars]}) for i in range(0, len(content), chunk_chars)]
+            events.append(self._chunk({}, "length" if truncate else "stop"))
+            for event in events:
+                self.wfile.write(f"data: {json.dumps(event)}\n\n".encode())
+                self.wfile.flush()
+                time.sleep(delay)
+            self.wfile.write(b"data: [DONE]\n\n")
+            self.wfile.flush()
+
+    return Handler
+
+
+def serve(port=8765, delay=0.02, chunk_chars=4, truncate=None, answer=CANNED_ANSWER):
+    server = ThreadingHTTPServer(("127.0.0.1", port), make_handler(answer, delay, chunk_chars, truncate))
+    print(f"Mock LLM server on http://127.0.0.1:{port}/v1")
+    server.serve_forever()
+
+
+if __name__ == "__main__":
+    parser = argparse.ArgumentParser(description="Mock OpenAI streaming server.")
+    parser.add_argument("--port", type=int, default=8765)
+    parser.add_argument("--delay", type=float, default=0.02, help="seconds between chunks")
+    parser.add_argument("--chunk-chars", type=int, default=4, help="characters per streamed chunk")
+    parser.add_argument("--truncate", type=int, default=None, help="cut the answer after N characters")
+    args = parser.parse_args()
+    serve(args.port, args.delay, args.chunk_chars, args.truncate)
@@ -0,0 +1,88 @@
+from dataclasses import dataclass
+
+import numpy as np
+import pandas as pd
+
+# Column dtypes for the long line-item frame. Programme names and codes repeat
+# across years and documents, so they are stored as categoricals (integer
+# codes + one copy of each string); the year is a small integer dimension.
+FRAME_DTYPES = {
+    "line": "int32",
+    "code": "category",
+    "programme": "category",
+    "year": "int16",
+    "amount": "float64",
+}
+
+
+# ---- Line Items ----
+@dataclass(slots=True)
+class LineItem:
+    """
+    One budget figure: a programme's allocation for one year. `line` is the
+    ordinal of the source row, so repeated programme names stay distinct.
+    `span` is where the amount sits in the text it was read from; it is not
+    part of the tuple form.
+    """
+    programme: str
+    year: int
+    amount: float
+    code: str = ""
+    line: int = 0
+    span: tuple | None = None
+
+    def as_tuple(self):
+        return (self.line, self.code, self.programme, self.year, self.amount)
+
+    @classmethod
+    def from_tuple(cls, values):
+        line, code, programme, year, amount = values
+        return cls(programme=programme, year=year, amount=amount, code=code, line=line)
+
+
+def line_items_frame(items):
+    """
+    Builds the compact long-format frame (line, code, programme, year, amount)
+    from an iterable of LineItems, without going through per-row dicts.
+    Column dtypes follow FRAME_DTYPES.
+    """
+    items = list(items)
+    columns = {
+        "line": (i.line for i in items),
+        "code": (i.code for i in items),
+        "programme": (i.programme for i in items),
+        "year": (i.year for i in items),
+        "amount": (i.amount for i in items),
+    }
+    frame = {}
+    for col, dtype in FRAME_DTYPES.items():
+        if dtype == "category":
+            frame[col] = pd.Categorical(list(columns[col]))
+        else:
+            frame[col] = np.fromiter(columns[col], dtype=dtype, count=len(items))
+    return pd.DataFrame(frame)
+
+
+# ---- Wide Views ----
+def to_wide(frame, years):
+    """
+    Pivots the long frame into the one-row-per-programme layout the charts
+    and tables use, with one "YYYY" string column per requested year.
+    """
+    columns = ["Programme"] + [str(y) for y in years]
+    if frame is None or frame.empty:
+        return pd.DataFrame(columns=columns)
+    wide = frame.pivot_table(
+        index=["line", "programme"], columns="year", values="amount", aggfunc="first", observed=True
+    )
+    wide = wide.reindex(columns=list(years)).reset_index()
+    wide.columns = ["line", "Programme"] + [str(y) for y in years]
+    return wide.sort_values("line").drop(columns="line").reset_index(drop=True)[columns]
+
+
+def year_totals(frame, years):
+    """
+    Sum per year, as the {"YYYY": total} dict the app displays.
+    """
+    totals = frame.groupby("year", observed=True)["amount"].sum()
+    return {str(y): float(totals.get(y, 0.0)) for y in years}
@@ -0,0 +1,149 @@
+import os
+from collections import OrderedDict
+from functools import lru_cache
+
+import numpy as np
+import pandas as pd
+
+DATA_DIR = os.path.join(os.path.dirname(os.path.abspath(__file__)), "data")
+CPI_FILE = os.getenv("CMAT_CPI_FILE", os.path.join(DATA_DIR, "cpi_zambia.csv"))
+FX_FILE = os.getenv("CMAT_FX_FILE", os.path.join(DATA_DIR, "fx_zmw_usd.csv"))
+BASE_YEAR = int(os.getenv("CMAT_BASE_YEAR", "2024"))
+
+VIEWS = ["nominal", "real", "usd"]
+VIEW_LABELS = {
+    "nominal": "Nominal ZMW",
+    "real": f"Real ZMW ({BASE_YEAR} prices)",
+    "usd": "USD (current)",
+}
+PANEL_CACHE_SIZE = 256
+
+
+# ---- Tables ----
+class YearTable:
+    """
+    A yearly series stored as a dense NumPy array indexed by year - first
+    year, so looking up any vector of years is a single fancy-indexing step.
+    Years outside the table use the nearest year on record.
+    """
+
+    def __init__(self, years, values):
+        years = np.asarray(years, dtype=np.int32)
+        self.first = int(years.min())
+        self.values = np.full(int(years.max()) - self.first + 1, np.nan)
+        self.values[years - self.first] = values
+        # Fill interior gaps so every index in range is usable
+        series = pd.Series(self.values).interpolate(limit_area="inside")
+        self.values = series.to_numpy()
+
+    @property
+    def last(self):
+        return self.first + len(self.values) - 1
+
+    def covers(self, year):
+        return self.first <= int(year) <= self.last
+
+    def lookup(self, years):
+        idx = np.clip(np.asarray(years, dtype=np.int64) - self.first, 0, len(self.values) - 1)
+        return self.values[idx]
+
+
+@lru_cache(maxsize=None)
+def load_table(path, column):
+    frame = pd.read_csv(path, comment="#")
+    return YearTable(frame["year"].to_numpy(), frame[column].to_numpy(dtype=float))
+
+
+def cpi_table():
+    return load_table(CPI_FILE, "cpi")
+
+
+def fx_table():
+    return load_table(FX_FILE, "zmw_per_usd")
+
+
+# ---- Conversion ----
+def factors(years, view="nominal", base_year=BASE_YEAR):
+    """
+    Multipliers that turn nominal ZMW for each year into the chosen view.
+    """
+    years = np.asarray(years)
+    if view == "nominal":
+        return np.ones(len(years))
+    if view == "real":
+        cpi = cpi_table()
+        return cpi.lookup([base_year])[0] / cpi.lookup(years)
+    if view == "usd":
+        return 1.0 / fx_table().lookup(years)
+    raise ValueError(f"Unknown view: {view}")
+
+
+def convert(amounts, years, view="nominal", base_year=BASE_YEAR):
+    """
+    Converts a whole column of nominal amounts in one vectorized step.
+    """
+    return np.asarray(amounts, dtype=float) * factors(years, view, base_year)
+
+
+def convert_long(frame, view="nominal", base_year=BASE_YEAR, amount="amount", year="year"):
+    """
+    Long frame (one row per amount) with the amount column converted.
+    """
+    if view == "nominal" or frame is None or frame.empty:
+        return frame
+    out = frame.copy()
+    out[amount] = convert(out[amount].to_numpy(), out[year].astype(int).to_numpy(), view, base_year)
+    return out
+
+
+def convert_wide(frame, view="nominal", base_year=BASE_YEAR):
+    """
+    Wide frame with one column per year ("2022", "2023", ...): all year
+    columns are scaled at once by a row vector of factors.
+    """
+    if view == "nominal" or frame is None or frame.empty:
+        return frame
+    year_columns = [c for c in frame.columns if str(c).isdigit()]
+    out = frame.copy()
+    values = out[year_columns].to_numpy(dtype=float)
+    out[year_columns] = values * factors([int(c) for c in year_columns], view, base_year)[None, :]
+    return out
+
+
+# ---- Cached Panels ----
+_panels = OrderedDict()
+
+
+def cached_panel(key, frame, view="nominal", base_year=BASE_YEAR, wide=True):
+    """
+    Converted copy of a frame, memoized per (key, view, base year) so
+    switching views back and forth does no work after the first time.
+    `key` must change whenever the frame does (e.g. file hash + table name).
+    """
+    if view == "nominal":
+        return frame
+    cache_key = (key, view, base_year)
+    if cache_key in _panels:
+        _panels.move_to_end(cache_key)
+        return _panels[cache_key]
+    panel = convert_wide(frame, view, base_year) if wide else convert_long(frame, view, base_year)
+    _panels[cache_key] = panel
+    if len(_panels) > PANEL_CACHE_SIZE:
+        _panels.popitem(last=False)
+    return panel
+
+
+def clamped_years(years, view="nominal", base_year=BASE_YEAR):
+    """
+    Years (including the base year for real terms) outside the view's CPI or
+    FX table, which are converted with the nearest year on record.
+    """
+    if view == "nominal":
+        return []
+    table = cpi_table() if view == "real" else fx_table()
+    years = set(int(y) for y in years) | ({base_year} if view == "real" else set())
+    return sorted(y for y in years if not table.covers(y))
+
+
+def unit_label(view="nominal", base_year=BASE_YEAR):
+    return {"nominal": "ZMW", "real": f"{base_year} ZMW", "usd": "USD"}[view]
@@ -0,0 +1,148 @@
+import hashlib
+import io
+import os
+import shutil
+from concurrent.futures import ProcessPoolExecutor
+
+import fitz  # PyMuPDF
+
+# ---- OCR Settings ----
+OCR_DPI = int(os.getenv("CMAT_OCR_DPI", "300"))
+OCR_LANG = os.getenv("CMAT_OCR_LANG", "eng")
+OCR_WORKERS = int(os.getenv("CMAT_OCR_WORKERS", "0")) or os.cpu_count() or 1
+CACHE_DIR = os.getenv("CMAT_CACHE_DIR", ".cmat_cache")
+OCR_CACHE_DIR = os.path.join(CACHE_DIR, "ocr")
+
+# A digital page carries far more than this many characters per square inch;
+# scanned pages carry none (or a few stray glyphs from a stamp or page number).
+MIN_CHARS_PER_SQ_INCH = 0.5
+
+
+def ocr_available():
+    """
+    True when pytesseract and the tesseract binary are both installed.
+    """
+    try:
+        import pytesseract  # noqa: F401
+    except ImportError:
+        return False
+    return shutil.which("tesseract") is not None
+
+
+# ---- Scanned Page Detection ----
+def is_scanned_page(page, text=None):
+    """
+    Cheap text-density check: a page with (almost) no extractable text that
+    still carries at least one image is treated as a scanned page.
+    """
+    if text is None:
+        text = page.get_text("text") or ""
+    area_sq_inch = (page.rect.width / 72) * (page.rect.height / 72)
+    density = len(text.strip()) / area_sq_inch if area_sq_inch else 0
+    if density >= MIN_CHARS_PER_SQ_INCH:
+        return False
+    return bool(page.get_images(full=False))
+
+
+def page_hash(doc, page):
+    """
+    Hashes the raw image streams on a page (plus its size), so the OCR cache
+    hits without having to rasterize the page first.
+    """
+    h = hashlib.sha256()
+    h.update(f"{page.rect.width:.1f}x{page.rect.height:.1f}@{OCR_DPI}:{OCR_LANG}".encode())
+    for img in page.get_images(full=False):
+        h.update(doc.xref_stream_raw(img[0]) or b"")
+    return h.hexdigest()
+
+
+# ---- OCR Cache ----
+def _cache_path(key):
+    return os.path.join(OCR_CACHE_DIR, f"{key}.txt")
+
+
+def load_cached_ocr(key):
+    path = _cache_path(key)
+    if os.path.exists(path):
+        with open(path, encoding="utf-8") as f:
+            return f.read()
+    return None
+
+
+def save_cached_ocr(key, text):
+    os.makedirs(OCR_CACHE_DIR, exist_ok=True)
+    with open(_cache_path(key), "w", encoding="utf-8") as f:
+        f.write(text)
+
+
+# ---- Rasterize + OCR ----
+def rasterize_page(page, dpi=OCR_DPI):
+    """
+    Renders a page to grayscale PNG bytes at the OCR resolution.
+    """
+    pix = page.get_pixmap(dpi=dpi, colorspace=fitz.csGRAY)
+    return pix.tobytes("png")
+
+
+def _ocr_png(png_bytes, lang=OCR_LANG):
+    # Top-level so it can be pickled into the process pool.
+    import pytesseract
+    from PIL import Image
+
+    with Image.open(io.BytesIO(png_bytes)) as img:
+        return pytesseract.image_to_string(img, lang=lang)
+
+
+def ocr_scanned_pages(doc, texts, indices=None):
+    """
+    Given a PyMuPDF document and the fast-path text for its first len(texts)
+    pages (or for the page numbers in `indices`), OCRs only the pages that
+    look scanned and returns the updated list.
+    Cached pages are reused; the rest are OCR'd in a process pool.
+    """
+    texts = list(texts)
+    indices = list(indices) if indices is not None else list(range(len(texts)))
+    pending = {}  # position in texts -> (cache key, png bytes)
+
+    for i, text in enumerate(texts):
+        page = doc[indices[i]]
+        if not is_scanned_page(page, text):
+            continue
+        key = page_hash(doc, page)
+        cached = load_cached_ocr(key)
+        if cached is not None:
+            texts[i] = cached
+        else:
+            pending[i] = (key, None)
+
+    if not pending:
+        return texts
+
+    if not ocr_available():
+        print(f"⚠️ {len(pending)} scanned page(s) skipped: tesseract is not installed.")
+        return texts
+
+    for i in pending:
+        pending[i] = (pending[i][0], rasterize_page(doc[indices[i]]))
+
+    results = {}
+    if len(pending) == 1:
+        i, (_, png) = next(iter(pending.items()))
+        try:
+            results[i] = _ocr_png(png)
+        except Exception as e:
+            print(f"OCR failed on page {indices[i] + 1}:", e)
+    else:
+        workers = min(OCR_WORKERS, len(pending))
+        with ProcessPoolExecutor(max_workers=workers) as pool:
+            futures = {i: pool.submit(_ocr_png, png) for i, (_, png) in pending.items()}
+            for i, f in futures.items():
+                try:
+                    results[i] = f.result()
+                except Exception as e:
+                    print(f"OCR failed on page {indices[i] + 1}:", e)
+
+    for i, text in results.items():
+        save_cached_ocr(pending[i][0], text)
+        texts[i] = text
+    return texts
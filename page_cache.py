@@ -0,0 +1,64 @@
+import hashlib
+import json
+import os
+import threading
+
+CACHE_DIR = os.getenv("CMAT_CACHE_DIR", ".cmat_cache")
+
+
+# ---- Keys ----
+def text_key(text: str):
+    return hashlib.sha256(text.encode("utf-8")).hexdigest()
+
+
+def bytes_key(data: bytes):
+    return hashlib.sha256(data).hexdigest()
+
+
+# ---- JSON Store ----
+def cache_path(namespace, key, ext="json"):
+    return os.path.join(CACHE_DIR, namespace, f"{key}.{ext}")
+
+
+def load_json(namespace, key):
+    """
+    Returns the cached object, or None on a miss (or an unreadable entry).
+    """
+    path = cache_path(namespace, key)
+    if not os.path.exists(path):
+        return None
+    try:
+        with open(path, encoding="utf-8") as f:
+            return json.load(f)
+    except (OSError, ValueError):
+        return None
+
+
+def save_json(namespace, key, obj):
+    """
+    Writes atomically so a concurrent reader never sees a half-written entry.
+    """
+    path = cache_path(namespace, key)
+    os.makedirs(os.path.dirname(path), exist_ok=True)
+    tmp = f"{path}.{os.getpid()}.{threading.get_ident()}.tmp"
+    with open(tmp, "w", encoding="utf-8") as f:
+        json.dump(obj, f)
+    os.replace(tmp, path)
+
+
+# ---- Binary Store ----
+def load_bytes(namespace, key, ext="bin"):
+    path = cache_path(namespace, key, ext)
+    if not os.path.exists(path):
+        return None
+    with open(path, "rb") as f:
+        return f.read()
+
+
+def save_bytes(namespace, key, data, ext="bin"):
+    path = cache_path(namespace, key, ext)
+    os.makedirs(os.path.dirname(path), exist_ok=True)
+    tmp = f"{path}.{os.getpid()}.{threading.get_ident()}.tmp"
+    with open(tmp, "wb") as f:
+        f.write(data)
+    os.replace(tmp, path)
@@ -0,0 +1,226 @@
+import asyncio
+import os
+import time
+from concurrent.futures import ProcessPoolExecutor, ThreadPoolExecutor
+
+import pandas as pd
+
+from backend import CMAT_INDICATORS, keyword_budget_info, merge_budget_info, model_extract_budget_info
+from extractors import read_pdf_bytes
+from incremental import YEARS, process_document
+from models import year_totals
+from page_cache import bytes_key
+from scheduler import SCHEDULER
+
+# Where the CPU-bound work of an upload runs. The page extractors and keyword
+# scan are pure Python and hold the GIL, so only "process" runs them in
+# parallel across uploads (and pages); "thread" keeps everything in this
+# process, which suits a single-CPU host. Either way the LLM request
+# overlaps parsing.
+PIPELINE_EXECUTOR = os.getenv("CMAT_PIPELINE_EXECUTOR", "process")
+PIPELINE_WORKERS = int(os.getenv("CMAT_PIPELINE_WORKERS", "0")) or os.cpu_count() or 1
+QUEUE_POLL_SECONDS = 0.25
+
+_executor = None
+
+
+def get_executor():
+    global _executor
+    if _executor is None:
+        if PIPELINE_EXECUTOR == "process":
+            _executor = ProcessPoolExecutor(max_workers=PIPELINE_WORKERS)
+        else:
+            _executor = ThreadPoolExecutor(max_workers=PIPELINE_WORKERS, thread_name_prefix="cmat-pipeline")
+    return _executor
+
+
+def shutdown_executor():
+    """
+    Stops the pipeline workers (if started) and waits for them to exit.
+    """
+    global _executor
+    if _executor is not None:
+        _executor.shutdown(wait=True)
+        _executor = None
+
+
+# ---- Async Orchestration ----
+async def process_upload_async(source, name=None, max_pages=None, on_stage=None, mode=None, on_field=None,
+                               user=None, on_queue=None, batch=None):
+    """
+    Runs an upload end to end with I/O and compute overlapped:
+      - the LLM request starts as soon as process_document has the page
+        texts (from the page cache, or read/OCR'd once), and retrieval
+        picks the relevant chunks for the prompt,
+      - the regex/table extractors run in the executor at the same time,
+      - results are collected as each stage finishes.
+    `on_stage(stage, seconds)` is called as stages complete; `mode` picks
+    the structured extraction (llm / local / hybrid, see backend).
+    `on_field(indicator, value)` is called as streamed LLM fields arrive.
+    The job first waits for a slot from the shared scheduler (per `user`;
+    jobs sharing a `batch` key count once against the user's limit);
+    `on_queue(position, waiting)` reports its place while it waits.
+    All callbacks run on the calling thread, so they may update the UI.
+    """
+    data = read_pdf_bytes(source)
+    job = SCHEDULER.job(data, user=user, max_pages=max_pages, batch=batch)
+    try:
+        last = None
+        while not SCHEDULER.try_admit(job):
+            place = SCHEDULER.position(job)
+            if on_queue and place != last:
+                on_queue(*place)
+            last = place
+            await asyncio.sleep(QUEUE_POLL_SECONDS)
+        return await _run_upload(data, name, max_pages, on_stage, mode, on_field)
+    finally:
+        SCHEDULER.release(job)
+
+
+async def _run_upload(data, name, max_pages, on_stage, mode, on_field):
+    loop = asyncio.get_running_loop()
+    executor = get_executor()
+    timings = {}
+    start = time.perf_counter()
+
+    # Streamed fields arrive on the worker thread; hand them to the loop's thread
+    field_callback = None
+    if on_field:
+        field_callback = lambda key, value: loop.call_soon_threadsafe(on_field, key, value)
+
+    def finished(stage):
+        timings[stage] = time.perf_counter() - start
+        if on_stage:
+            on_stage(stage, timings[stage])
+
+    # Page texts come from process_document, so no page is read or OCR'd
+    # twice. It runs on a thread so it can hand them over before parsing.
+    pages_ready = loop.create_future()
+
+    def set_pages(pages):
+        if not pages_ready.done():
+            pages_ready.set_result(pages)
+
+    on_pages = lambda pages: loop.call_soon_threadsafe(set_pages, pages)
+
+    async def llm():
+        pages = await pages_ready
+        finished("page_text")
+        # The OpenAI call is network-bound, so a plain thread is enough
+        result = await asyncio.to_thread(model_extract_budget_info, "", pages, bytes_key(data), mode, field_callback)
+        finished("llm")
+        return result
+
+    async def parse():
+        try:
+            if isinstance(executor, ProcessPoolExecutor):
+                # Reading, OCR and merging stay on a thread; the per-page
+                # extractors fan out to the worker processes
+                doc = await asyncio.to_thread(process_document, data, name, max_pages, on_pages, executor.map)
+            else:
+                doc = await loop.run_in_executor(executor, process_document, data, name, max_pages, on_pages)
+        except BaseException as e:
+            if not pages_ready.done():
+                pages_ready.set_exception(e)
+            raise
+        set_pages(doc["pages"])
+        finished("parse")
+        keywords = await loop.run_in_executor(executor, keyword_budget_info, doc["text"])
+        finished("keywords")
+        return doc, keywords
+
+    (ai_results, ai_source), (doc, keyword_results) = await asyncio.gather(llm(), parse())
+    merged = merge_budget_info(ai_results, keyword_results)
+    finished("total")
+
+    return {
+        "document": doc,
+        "ai_results": ai_results,
+        "ai_source": ai_source,
+        "keyword_results": keyword_results,
+        "merged": merged,
+        "timings": timings,
+    }
+
+
+def run_upload_pipeline(source, name=None, max_pages=None, on_stage=None, mode=None, on_field=None,
+                        user=None, on_queue=None):
+    """
+    Synchronous entry point for the Streamlit script.
+    """
+    return asyncio.run(process_upload_async(
+        source, name=name, max_pages=max_pages, on_stage=on_stage, mode=mode, on_field=on_field,
+        user=user, on_queue=on_queue
+    ))
+
+
+# ---- Multi-Document Uploads ----
+async def process_uploads_async(sources, names=None, max_pages=None, on_stage=None, mode=None, on_field=None,
+                                user=None, on_queue=None, keys=None):
+    """
+    Runs several uploads at once on the shared executor, so the total wall
+    time approaches that of the slowest document rather than the sum.
+    `on_stage(key, stage, seconds)` reports progress per document and
+    `on_field(key, indicator, value)` streams its LLM fields and
+    `on_queue(key, position, waiting)` its place in the scheduler queue.
+    `keys` identify the documents in those callbacks (default: their names;
+    pass file hashes when two uploads may share a name).
+    Returns the results in input order.
+    """
+    names = names or [getattr(source, "name", f"Document {i + 1}") for i, source in enumerate(sources)]
+    keys = keys or names
+    batch = object()  # the documents take one of the user's scheduler slots together
+
+    def progress(key):
+        if on_stage is None:
+            return None
+        return lambda stage, seconds: on_stage(key, stage, seconds)
+
+    def fields(key):
+        if on_field is None:
+            return None
+        return lambda indicator, value: on_field(key, indicator, value)
+
+    def queue(key):
+        if on_queue is None:
+            return None
+        return lambda position, waiting: on_queue(key, position, waiting)
+
+    return await asyncio.gather(*(
+        process_upload_async(
+            source, name=name, max_pages=max_pages, on_stage=progress(key), mode=mode, on_field=fields(key),
+            user=user, on_queue=queue(key), batch=batch
+        )
+        for source, name, key in zip(sources, names, keys)
+    ))
+
+
+def run_uploads_pipeline(sources, names=None, max_pages=None, on_stage=None, mode=None, on_field=None,
+                         user=None, on_queue=None, keys=None):
+    """
+    Synchronous entry point for multi-file uploads.
+    """
+    return asyncio.run(process_uploads_async(
+        sources, names=names, max_pages=max_pages, on_stage=on_stage, mode=mode, on_field=on_field,
+        user=user, on_queue=on_queue, keys=keys
+    ))
+
+
+def comparison_frame(results, names):
+    """
+    One row per document: the merged CMAT indicators plus the climate and
+    agriculture programme totals per year, for side-by-side comparison.
+    """
+    indicators = CMAT_INDICATORS["Finance"] + CMAT_INDICATORS["Sectors"]
+    rows = []
+    for name, result in zip(names, results):
+        doc = result["document"]
+        row = {"Document": name}
+        row.update({label: result["merged"].get(label) for label in indicators})
+        climate = year_totals(doc["climate_items"], YEARS)
+        agriculture = year_totals(doc["agriculture_items"], YEARS)
+        row.update({f"Climate {year}": climate[str(year)] for year in YEARS})
+        row.update({f"Agriculture {year}": agriculture[str(year)] for year in YEARS})
+        row["Seconds"] = round(result["timings"]["total"], 2)
+        rows.append(row)
+    return pd.DataFrame(rows)
@@ -0,0 +1,167 @@
+import os
+import re
+from bisect import bisect_right
+
+import fitz  # PyMuPDF
+
+from page_cache import load_bytes, save_bytes
+from rules import rules_by_name
+
+THUMB_NAMESPACE = "thumbs"
+THUMB_ZOOM = float(os.getenv("CMAT_THUMB_ZOOM", "1.0"))  # 1.0 = 72 dpi
+CLIP_MARGIN = 24  # points above and below the figure kept in the preview
+# Punctuation around a printed number ("(1,000)", "12.", "2024:") that is
+# not part of it
+WORD_PUNCTUATION = "()[]{}:;,.'\"“”"
+_WORD_RE = re.compile(r"\S+")
+
+
+# ---- Locating Figures ----
+def number_forms(value):
+    """
+    The ways an extracted number is likely printed, most specific first.
+    """
+    forms = []
+    if float(value).is_integer():
+        forms += [f"{value:,.0f}", f"{value:.0f}"]
+    else:
+        forms += [f"{value:,.2f}", f"{value:.2f}", f"{value:g}"]
+    forms = [f"{form}%" for form in forms] + forms
+    return list(dict.fromkeys(forms))
+
+
+def _token(word):
+    return word.strip(WORD_PUNCTUATION)
+
+
+def _box(word):
+    return [round(c, 1) for c in word[:4]]
+
+
+class PageWords:
+    """
+    The words of one page with their boxes, extracted once and shared by
+    every figure found on it. The page text and the word list split on the
+    same whitespace, so the n-th word of the text is the n-th word box.
+    """
+
+    def __init__(self, text, words=()):
+        self.text = text
+        self.words = words  # page.get_text("words"): x0, y0, x1, y1, word, ...
+        self.starts = [m.start() for m in _WORD_RE.finditer(text)]
+
+    def at(self, span):
+        """
+        Bounding box [x0, y0, x1, y1] of the word holding text[start:end],
+        or None. Where the text and the word boxes disagree (e.g. a block
+        drawn out of reading order), the nearest word printing the same
+        figure is used.
+        """
+        start, end = span
+        figure = self.text[start:end]
+        idx = bisect_right(self.starts, start) - 1
+        if 0 <= idx < len(self.words) and figure in self.words[idx][4]:
+            return _box(self.words[idx])
+        hits = [i for i, w in enumerate(self.words) if _token(w[4]).rstrip("%") == figure]
+        if not hits:
+            return None
+        return _box(self.words[min(hits, key=lambda i: abs(i - idx))])
+
+    def numbers(self):
+        """
+        {printed number: [bbox, ...]} for every word holding a digit, for
+        figures that are not tied to a span (e.g. the budget tree total).
+        """
+        index = {}
+        for w in self.words:
+            token = _token(w[4])
+            if any(c.isdigit() for c in token):
+                index.setdefault(token, []).append(_box(w))
+        return index
+
+
+def find_value(numbers, value):
+    """
+    First bbox in a page's number index where the value is printed, or
+    None. Only whole words count, so 12 does not match inside 2012 or
+    120,000.
+    """
+    for form in number_forms(value):
+        if numbers.get(form):
+            return numbers[form][0]
+    return None
+
+
+def figure_label(name):
+    """
+    Display label for an indicator rule name, e.g. 'total_public_investment'
+    -> 'Total Public Investment in Climate Initiatives'.
+    """
+    rule = rules_by_name().get(name)
+    if rule is None:
+        return name
+    if rule.get("group"):
+        return f"{rule['group']}: {rule['indicator']}"
+    return rule["indicator"]
+
+
+def locate_figures(indicators, rule_boxes, climate, agriculture, numbers):
+    """
+    Page number and bounding box for every extracted value, as a list of
+    dicts (Figure, Year, Value, Page, bbox). Everything comes from the
+    per-page results: `rule_boxes` is {rule name: [(page, value, bbox)]}
+    from the rule hits, `climate` / `agriculture` are (LineItem, page,
+    bbox) triples, and `numbers` maps each page to its number index for
+    indicators no rule hit produced.
+    """
+    located = []
+    for name, value in indicators.items():
+        page, bbox = next(((p, b) for p, v, b in rule_boxes.get(name, []) if v == value), (None, None))
+        if page is None:
+            for page_no, index in numbers.items():
+                bbox = find_value(index, value)
+                if bbox:
+                    page = page_no
+                    break
+        located.append({"Figure": figure_label(name), "Year": None, "Value": value, "Page": page, "bbox": bbox})
+    for item, page, bbox in climate + agriculture:
+        located.append({
+            "Figure": item.programme, "Year": int(item.year), "Value": float(item.amount), "Page": page, "bbox": bbox,
+        })
+    return located
+
+
+# ---- Thumbnails ----
+def clip_thumbnail(data, doc_hash, page_no, bbox=None, zoom=THUMB_ZOOM):
+    """
+    PNG of the page band around `bbox` (full width, so the row label shows),
+    rendered at low DPI. The whole page is rendered when no bbox is known.
+    Cached by (doc hash, page, zoom, region), so a repeat view is a file read.
+    """
+    region = "page" if bbox is None else "-".join(f"{c:.0f}" for c in bbox)
+    key = f"{doc_hash}-p{page_no}-z{zoom:g}-{region}"
+    png = load_bytes(THUMB_NAMESPACE, key, "png")
+    if png is not None:
+        return png
+
+    with fitz.open(stream=data, filetype="pdf") as doc:
+        page = doc[page_no - 1]
+        clip = page.rect
+        if bbox is not None:
+            clip = fitz.Rect(page.rect.x0, bbox[1] - CLIP_MARGIN, page.rect.x1, bbox[3] + CLIP_MARGIN) & page.rect
+        pix = page.get_pixmap(matrix=fitz.Matrix(zoom, zoom), clip=clip)
+        if bbox is not None:
+            # Outline the figure itself on the rendered band
+            x0, y0 = (bbox[0] - clip.x0) * zoom, (bbox[1] - clip.y0) * zoom
+            x1, y1 = (bbox[2] - clip.x0) * zoom, (bbox[3] - clip.y0) * zoom
+            outline = fitz.IRect(int(x0) - 2, int(y0) - 2, int(x1) + 2, int(y1) + 2) & pix.irect
+            for x in range(outline.x0, outline.x1):
+                pix.set_pixel(x, outline.y0, (220, 0, 0))
+                pix.set_pixel(x, outline.y1 - 1, (220, 0, 0))
+            for y in range(outline.y0, outline.y1):
+                pix.set_pixel(outline.x0, y, (220, 0, 0))
+                pix.set_pixel(outline.x1 - 1, y, (220, 0, 0))
+        png = pix.tobytes("png")
+
+    save_bytes(THUMB_NAMESPACE, key, png, "png")
+    return png
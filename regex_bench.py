@@ -0,0 +1,206 @@
+"""
+Worst-case corpus and fuzz check for the extraction patterns.
+
+Times every extraction entry point (indicator rules, keyword rules,
+agriculture and climate line items, budget tree, prompt compaction) on inputs built to make
+regular expressions backtrack: long whitespace and word runs, digit runs
+after a label, labels repeated on one very long line, and so on. Each case
+runs at growing sizes so super-linear growth shows up as a ratio well above
+the size ratio. Pattern costs from regex_guard are printed at the end.
+
+    python regex_bench.py --sizes 10000,100000 --fuzz 2000 --budget 2
+
+--fuzz also checks that the rewritten patterns still match exactly what the
+old ones did on random budget-like text (short lines, so the old patterns
+finish).
+"""
+import argparse
+import random
+import re
+import sys
+import time
+
+import pandas as pd
+
+from backend import (
+    AGRICULTURE_LINE_RE,
+    CLIMATE_CODES,
+    CLIMATE_LINE_RES,
+    extract_numbers_from_text,
+    iter_agriculture_line_items,
+    iter_climate_line_items,
+)
+from budget_tree import TOTAL_RE, build_budget_tree
+from compaction import _COLUMN_GAP_RE, _DOT_LEADER_RE, _NUMERIC_CELL_RE, compact_text
+from regex_guard import HAS_TIMEOUTS, PATTERN_TIMEOUT, pattern_costs, reset_costs
+from rules import REGISTRY, keyword_ruleset
+
+BUDGET_TEXT = """HEAD 89 - Ministry of Agriculture
+VOTE 89 Agriculture
+07 Irrigation Development 1,000,000 2,000,000 3,000,000
+Agricultural Support Programme 01 4,500,000 4,000,000 3,500,000
+Total Public Investment in Climate Initiatives: 100,000,000
+Percentage of National Budget Allocated to Climate Adaptation: 12%
+Energy: 25% Agriculture: 30% Health: 20% Transport: 15% Water: 10%
+Total 8,500,000 7,000,000 6,500,000
+"""
+
+FUZZ_TOKENS = [
+    "Total", "total", "TOTAL", "Energy", "Agriculture", "Agricultural Support", "Water", "Budget",
+    "07", "17", "41", "61", "01", "1,000", "25", "2024", "12.5", "1.5.3", "%", ",", ".", "-", "(", ")",
+    ":", "HEAD", "VOTE", "Vote", "x", " ", " ", " ", "  ", "\t", "\n", "…", "_", ". . .",
+]
+
+
+# ---- Worst-Case Corpus ----
+def _repeat(unit, size):
+    return (unit * (size // len(unit) + 1))[:size]
+
+
+CASES = {
+    "whitespace run": lambda n: " " * n,
+    "space-tab run": lambda n: _repeat(" \t", n),
+    "dot leaders": lambda n: _repeat("Programme . . . . 1,000  ", n),
+    "word run": lambda n: _repeat("Agriculture support programme ", n),
+    "brackets and hyphens": lambda n: _repeat("(Agri-culture) - ", n),
+    "digit run after label": lambda n: "Energy " + "1" * n,
+    "labels on one line": lambda n: _repeat("Energy Total Agriculture ", n),
+    "total words": lambda n: _repeat("total ", n) + " 1,000",
+    "code then no digits": lambda n: "07 1 1 " + _repeat("irrigation ", n),
+    "budget on one line": lambda n: _repeat(BUDGET_TEXT.replace("\n", " "), n),
+    "budget text": lambda n: _repeat(BUDGET_TEXT, n),
+    "fuzz": lambda n: fuzz_text(random.Random(n), n),
+}
+
+ENTRY_POINTS = {
+    "rules": lambda text: REGISTRY.scan(text),
+    "keywords": lambda text: extract_numbers_from_text(text, ["budget", "allocation"]),
+    "agriculture": lambda text: list(iter_agriculture_line_items(text)),
+    "climate": lambda text: list(iter_climate_line_items(text)),
+    "budget tree": lambda text: build_budget_tree(text),
+    "compaction": lambda text: compact_text(text),
+}
+
+
+def fuzz_text(rng, size):
+    parts, length = [], 0
+    while length < size:
+        token = rng.choice(FUZZ_TOKENS)
+        parts.append(token)
+        length += len(token)
+    return "".join(parts)[:size]
+
+
+def run_corpus(sizes, budget):
+    rows = []
+    for case, build in CASES.items():
+        for size in sizes:
+            text = build(size)
+            for entry, run in ENTRY_POINTS.items():
+                start = time.perf_counter()
+                run(text)
+                rows.append({"Case": case, "Entry": entry, "Chars": size, "Seconds": time.perf_counter() - start})
+        print(f"  {case}")
+    frame = pd.DataFrame(rows)
+    # Growth between consecutive sizes; ~size ratio means linear
+    frame["Growth"] = frame.groupby(["Case", "Entry"])["Seconds"].transform(lambda s: s / s.shift())
+    frame["Over Budget"] = frame["Seconds"] > budget
+    return frame
+
+
+# ---- Fuzz Check Against the Old Patterns ----
+OLD_AGRICULTURE = re.compile(
+    r"(?P<programme>[A-Za-z\s\-\(\)]+)\s+\d+\s+(?P<budget2024>[\d,]+)\s+(?P<budget2023>[\d,]+)\s+(?P<budget2022>[\d,]+)"
+)
+OLD_CLIMATE = {code: re.compile(rf"\b{code}\b\s+([\d,]+)\s+([\d,]+).*?([\d,]+)") for code in CLIMATE_CODES}
+OLD_TOTAL = re.compile(
+    r"^\s*(?P<label>[A-Za-z\- ]*\btotal\b[^\d]*?)\s+(?P<amounts>(?:\d{1,3}(?:,\d{3})+(?:\.\d+)?|\d{4,}(?:\.\d+)?)"
+    r"(?:\s+(?:\d{1,3}(?:,\d{3})+(?:\.\d+)?|\d{4,}(?:\.\d+)?)){0,2})\s*$",
+    re.I,
+)
+OLD_PERCENT = re.compile(r"Energy.*?(?P<value>\d+(?:\.\d+)?(?=\s*%))", re.I)
+OLD_DOT_LEADER = re.compile(r"(?:\s*(?:\.\s?){3,}|\s*…+|\s*_{3,})\s*")
+OLD_COLUMN_GAP = re.compile(r"\s{2,}|\t+")
+OLD_NUMERIC_CELL = re.compile(r"^[\s(]*-?[\d,]+(?:\.\d+)?%?[)\s]*$|^-$")
+OLD_KEYWORD = re.compile(r"Budget[^0-9]*(?P<value>\d[\d,]*(?:\.\d+)?)", re.I)
+
+
+def _agriculture(matches):
+    return [(m.group("programme").strip(), *m.group("budget2024", "budget2023", "budget2022")) for m in matches]
+
+
+def _total(match):
+    return match and (" ".join(match.group("label").split()), match.group("amounts"))
+
+
+def fuzz_check(count, seed=0):
+    """
+    Compares old and new pattern results on `count` random texts. Returns
+    the (check, text) pairs that differ.
+    """
+    rng = random.Random(seed)
+    energy = REGISTRY.full["sector_energy"]
+    keyword = keyword_ruleset(("Budget",)).full["Budget"]
+    mismatches = []
+    for _ in range(count):
+        text = fuzz_text(rng, rng.randint(20, 160))
+        if _agriculture(OLD_AGRICULTURE.finditer(text)) != _agriculture(AGRICULTURE_LINE_RE.finditer(text)):
+            mismatches.append(("agriculture", text))
+        clean = re.sub(r"\s+", " ", text)
+        for code, old in OLD_CLIMATE.items():
+            before, after = old.search(clean), CLIMATE_LINE_RES[code].search(clean)
+            if (before and before.groups()) != (after and after.groups()):
+                mismatches.append((f"climate {code}", text))
+        for name, old, new in (("dot leader", OLD_DOT_LEADER, _DOT_LEADER_RE),
+                               ("column gap", OLD_COLUMN_GAP, _COLUMN_GAP_RE)):
+            if old.sub(" | ", text) != new.sub(" | ", text):
+                mismatches.append((name, text))
+        # Shorter than GAP_CHARS, so the bounded keyword gap finds the same figure
+        before, after = OLD_KEYWORD.search(text), keyword.search(text)
+        if (before and before.group("value")) != (after and after.group("value")):
+            mismatches.append(("keyword rule", text))
+        for line in text.splitlines():
+            if bool(OLD_NUMERIC_CELL.match(line)) != bool(_NUMERIC_CELL_RE.match(line)):
+                mismatches.append(("numeric cell", line))
+            if _total(OLD_TOTAL.match(line)) != _total(TOTAL_RE.match(line)):
+                mismatches.append(("total row", line))
+            before, after = OLD_PERCENT.search(line), energy.search(line)
+            if (before and before.group("value")) != (after and after.group("value")):
+                mismatches.append(("percent rule", line))
+    return mismatches
+
+
+def main():
+    parser = argparse.ArgumentParser(description="Benchmark extraction patterns on worst-case inputs.")
+    parser.add_argument("--sizes", default="10000,100000", help="input sizes in characters")
+    parser.add_argument("--fuzz", type=int, default=1000, help="random texts to compare old and new patterns on")
+    parser.add_argument("--seed", type=int, default=0)
+    parser.add_argument("--budget", type=float, default=2.0, help="seconds an entry point may take on one input")
+    args = parser.parse_args()
+
+    print(f"Engine: {'regex, ' + str(PATTERN_TIMEOUT) + 's per call' if HAS_TIMEOUTS else 're (no timeouts)'}")
+    failed = False
+
+    if args.fuzz:
+        mismatches = fuzz_check(args.fuzz, args.seed)
+        print(f"Fuzz: {args.fuzz} texts, {len(mismatches)} mismatch(es)")
+        for check, text in mismatches[:10]:
+            print(f"  {check}: {text!r}")
+        failed |= bool(mismatches)
+
+    reset_costs()
+    print("Corpus:")
+    report = run_corpus([int(s) for s in args.sizes.split(",")], args.budget)
+    print(report.to_string(index=False, float_format=lambda v: f"{v:.4f}"))
+    print("\nPattern cost:")
+    print(pattern_costs().to_string(index=False))
+
+    over = report[report["Over Budget"]]
+    if not over.empty:
+        print(f"\n{len(over)} run(s) over the {args.budget:g}s budget")
+        failed = True
+    sys.exit(1 if failed else 0)
+
+
+if __name__ == "__main__":
+    main()
@@ -0,0 +1,126 @@
+import os
+import threading
+import time
+
+import pandas as pd
+
+try:
+    import regex as _engine  # supports per-call timeouts
+    HAS_TIMEOUTS = True
+except ImportError:  # fall back to re: same patterns, no time limit
+    import re as _engine
+    HAS_TIMEOUTS = False
+
+# Wall-clock budget for one call of a guarded pattern (for finditer, the
+# whole scan). A call that runs over is abandoned and counted as a timeout.
+PATTERN_TIMEOUT = float(os.getenv("CMAT_REGEX_TIMEOUT", "1.0"))
+
+IGNORECASE = _engine.IGNORECASE
+MULTILINE = _engine.MULTILINE
+
+# name -> GuardedPattern, for cost reporting
+PATTERNS = {}
+_lock = threading.Lock()
+
+
+# ---- Guarded Patterns ----
+class GuardedPattern:
+    """
+    A compiled pattern whose every call runs under a time budget and is
+    counted in its cost stats. On timeout, search/match return None,
+    findall returns [], sub returns the text unchanged and finditer stops
+    after the matches found so far.
+    """
+
+    def __init__(self, name, pattern, flags=0, timeout=None):
+        self.name = name
+        self.pattern = _engine.compile(pattern, flags)
+        self.timeout = timeout or PATTERN_TIMEOUT
+        self._kwargs = {"timeout": self.timeout} if HAS_TIMEOUTS else {}
+        self.reset_stats()
+
+    def reset_stats(self):
+        self.calls = 0
+        self.seconds = 0.0
+        self.max_seconds = 0.0
+        self.timeouts = 0
+
+    def _record(self, text, elapsed, timed_out=False):
+        with _lock:
+            self.calls += 1
+            self.seconds += elapsed
+            self.max_seconds = max(self.max_seconds, elapsed)
+            if timed_out:
+                self.timeouts += 1
+        if timed_out:
+            print(f"⚠️ Pattern '{self.name}' gave up after {elapsed:.2f}s on {len(text):,} characters")
+
+    def _call(self, method, text, *args, default=None):
+        start = time.perf_counter()
+        try:
+            result = method(*args, **self._kwargs)
+        except TimeoutError:
+            self._record(text, time.perf_counter() - start, timed_out=True)
+            return default
+        self._record(text, time.perf_counter() - start)
+        return result
+
+    def match(self, text, pos=0):
+        return self._call(self.pattern.match, text, text, pos)
+
+    def search(self, text, pos=0):
+        return self._call(self.pattern.search, text, text, pos)
+
+    def fullmatch(self, text):
+        return self._call(self.pattern.fullmatch, text, text)
+
+    def findall(self, text):
+        return self._call(self.pattern.findall, text, text, default=[])
+
+    def sub(self, repl, text):
+        return self._call(self.pattern.sub, text, repl, text, default=text)
+
+    def finditer(self, text):
+        start = time.perf_counter()
+        try:
+            yield from self.pattern.finditer(text, **self._kwargs)
+        except TimeoutError:
+            self._record(text, time.perf_counter() - start, timed_out=True)
+            return
+        self._record(text, time.perf_counter() - start)
+
+
+def guard(name, pattern, flags=0, timeout=None):
+    """
+    Compiles a pattern under a time budget and registers it by name for
+    cost reporting. Re-guarding a name replaces the registered pattern.
+    """
+    guarded = GuardedPattern(name, pattern, flags, timeout)
+    PATTERNS[name] = guarded
+    return guarded
+
+
+# ---- Cost Reporting ----
+def pattern_costs():
+    """
+    One row per guarded pattern with its call count, total and worst-case
+    time and timeouts, most expensive first.
+    """
+    rows = [
+        {
+            "Pattern": p.name,
+            "Calls": p.calls,
+            "Seconds": round(p.seconds, 4),
+            "Max Seconds": round(p.max_seconds, 4),
+            "Timeouts": p.timeouts,
+        }
+        for p in PATTERNS.values()
+    ]
+    frame = pd.DataFrame(rows, columns=["Pattern", "Calls", "Seconds", "Max Seconds", "Timeouts"])
+    return frame.sort_values("Seconds", ascending=False).reset_index(drop=True)
+
+
+def reset_costs():
+    with _lock:
+        for p in PATTERNS.values():
+            p.reset_stats()
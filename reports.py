@@ -0,0 +1,289 @@
+import argparse
+import io
+import os
+import time
+from xml.sax.saxutils import escape
+from concurrent.futures import ProcessPoolExecutor, ThreadPoolExecutor, as_completed
+
+from reportlab.lib import colors
+from reportlab.lib.pagesizes import A4
+from reportlab.lib.styles import getSampleStyleSheet
+from reportlab.lib.units import cm
+from reportlab.platypus import Image, PageBreak, Paragraph, SimpleDocTemplate, Spacer, Table, TableStyle
+
+from backend import agriculture_bar_chart, bar_chart, climate_2024_vs_total_chart, climate_multi_year_chart
+from page_cache import load_bytes, save_bytes, text_key
+
+REPORT_TITLE = "Annual Budget Oversight Report"
+CHART_WIDTH, CHART_HEIGHT = 900, 450
+REPORT_WORKERS = int(os.getenv("CMAT_REPORT_WORKERS", "0")) or os.cpu_count() or 1
+
+# Background worker for interactive report requests from the app
+_background = ThreadPoolExecutor(max_workers=2, thread_name_prefix="cmat-report")
+_renderer_ok = True
+
+
+# ---- Chart Images ----
+def chart_png(fig, width=CHART_WIDTH, height=CHART_HEIGHT):
+    """
+    Renders a Plotly figure to PNG once; later calls with the same figure
+    come from the on-disk cache. Returns None if kaleido cannot render.
+    """
+    global _renderer_ok
+    key = text_key(f"{width}x{height}:{fig.to_json()}")
+    png = load_bytes("charts", key, "png")
+    if png is not None or not _renderer_ok:
+        return png
+    try:
+        png = fig.to_image(format="png", width=width, height=height)
+    except Exception as e:
+        # Usually kaleido/Chrome missing; don't retry for every chart
+        print("Chart rendering unavailable, reports will omit charts:", e)
+        _renderer_ok = False
+        return None
+    save_bytes("charts", key, png, "png")
+    return png
+
+
+def section_charts(section):
+    """
+    Builds the backend charts for a report section and returns
+    [(caption, png bytes)], skipping any that cannot be rendered.
+    """
+    figures = []
+    climate_df = section.get("climate_df")
+    if climate_df is not None and not climate_df.empty:
+        total = section.get("total_budget")
+        figures.append(("Climate programmes by year", climate_multi_year_chart(climate_df.copy(), total_budget=total)))
+        figures.append(("Climate programmes vs total budget", climate_2024_vs_total_chart(climate_df, total_budget=total)))
+    agri_df = section.get("agriculture_df")
+    if agri_df is not None and not agri_df.empty:
+        figures.append(("Agriculture programmes (2024)", agriculture_bar_chart(agri_df, section.get("agriculture_totals"))))
+    indicators = section.get("indicators") or {}
+    if indicators:
+        figures.append(("Extracted budget indicators", bar_chart(indicators, "Budget Indicators")))
+
+    charts = []
+    for caption, fig in figures:
+        png = chart_png(fig)
+        if png is not None:
+            charts.append((caption, png))
+    return charts
+
+
+def prerender_charts(sections):
+    """
+    Renders every section's charts in this process (each unique chart once)
+    and stores the PNG bytes on the section, so report workers never render.
+    """
+    for section in sections:
+        if "charts" not in section:
+            section["charts"] = section_charts(section)
+    return sections
+
+
+# ---- PDF Layout ----
+STYLES = getSampleStyleSheet()
+TABLE_STYLE = TableStyle([
+    ("BACKGROUND", (0, 0), (-1, 0), colors.HexColor("#1f6f43")),
+    ("TEXTCOLOR", (0, 0), (-1, 0), colors.white),
+    ("FONTNAME", (0, 0), (-1, 0), "Helvetica-Bold"),
+    ("FONTSIZE", (0, 0), (-1, -1), 8),
+    ("ALIGN", (1, 1), (-1, -1), "RIGHT"),
+    ("GRID", (0, 0), (-1, -1), 0.25, colors.grey),
+    ("ROWBACKGROUNDS", (0, 1), (-1, -1), [colors.white, colors.HexColor("#f2f2f2")]),
+])
+
+
+def _fmt(value):
+    if isinstance(value, (int, float)):
+        return f"{value:,.0f}" if abs(value) >= 100 else f"{value:,.2f}"
+    return str(value)
+
+
+def _table(df):
+    data = [list(map(str, df.columns))] + [[_fmt(v) for v in row] for row in df.itertuples(index=False)]
+    table = Table(data, repeatRows=1, hAlign="LEFT")
+    table.setStyle(TABLE_STYLE)
+    return table
+
+
+def section_flowables(section):
+    story = [Paragraph(escape(section.get("title", "Budget Document")), STYLES["Heading1"])]
+    if section.get("subtitle"):
+        story.append(Paragraph(escape(section["subtitle"]), STYLES["Italic"]))
+    story.append(Spacer(1, 0.4 * cm))
+
+    total = section.get("total_budget")
+    if total:
+        story.append(Paragraph(f"<b>Total budget:</b> {total:,.0f} ZMW", STYLES["Normal"]))
+
+    indicators = section.get("indicators") or {}
+    if indicators:
+        story.append(Paragraph("Budget Indicators", STYLES["Heading2"]))
+        rows = [["Indicator", "Value"]] + [[str(k), _fmt(v)] for k, v in indicators.items()]
+        table = Table(rows, hAlign="LEFT")
+        table.setStyle(TABLE_STYLE)
+        story.append(table)
+
+    climate_df = section.get("climate_df")
+    if climate_df is not None and not climate_df.empty:
+        story.append(Paragraph("Climate-Tagged Programmes", STYLES["Heading2"]))
+        story.append(_table(climate_df))
+
+    agri_df = section.get("agriculture_df")
+    if agri_df is not None and not agri_df.empty:
+        story.append(Paragraph("Agriculture Programmes", STYLES["Heading2"]))
+        story.append(_table(agri_df))
+
+    for caption, png in section.get("charts", []):
+        story.append(Spacer(1, 0.4 * cm))
+        story.append(Image(io.BytesIO(png), width=16 * cm, height=8 * cm))
+        story.append(Paragraph(caption, STYLES["Italic"]))
+    return story
+
+
+def build_report(sections, title=REPORT_TITLE):
+    """
+    Lays out one PDF with a cover page and one chapter per section (e.g. one
+    per vote). Returns the PDF bytes. Charts must already be on the sections.
+    """
+    buffer = io.BytesIO()
+    doc = SimpleDocTemplate(buffer, pagesize=A4, title=title, leftMargin=2 * cm, rightMargin=2 * cm)
+
+    story = [
+        Paragraph(escape(title), STYLES["Title"]),
+        Paragraph("Climate Monitoring &amp; Accountability Tool (CMAT) — National Assembly of Zambia", STYLES["Normal"]),
+        Paragraph(time.strftime("Generated %d %B %Y"), STYLES["Normal"]),
+        Spacer(1, 0.8 * cm),
+        Paragraph("Contents", STYLES["Heading2"]),
+    ]
+    story += [
+        Paragraph(f"{i}. {escape(s.get('title', 'Budget Document'))}", STYLES["Normal"])
+        for i, s in enumerate(sections, 1)
+    ]
+
+    for section in sections:
+        story.append(PageBreak())
+        story += section_flowables(section)
+
+    doc.build(story)
+    return buffer.getvalue()
+
+
+def report_section(doc, title, indicators=None, subtitle=None):
+    """
+    Builds a report section from a process_document() result and, optionally,
+    the merged AI + keyword indicators.
+    """
+    return {
+        "title": title,
+        "subtitle": subtitle,
+        "total_budget": doc["indicators"].get("total_budget"),
+        "indicators": indicators or {},
+        "climate_df": doc["climate_df"],
+        "agriculture_df": doc["agriculture_df"],
+        "agriculture_totals": doc["agriculture_totals"],
+    }
+
+
+# ---- Background + Batch Rendering ----
+def _render(sections, title):
+    return build_report(prerender_charts(sections), title)
+
+
+def submit_report(sections, title=REPORT_TITLE):
+    """
+    Renders a report on the background worker; returns a Future of PDF bytes
+    so the Streamlit script can keep serving reruns meanwhile.
+    """
+    return _background.submit(_render, sections, title)
+
+
+def _write_report(path, sections, title):
+    # Top-level so it can be pickled into the process pool.
+    with open(path, "wb") as f:
+        f.write(build_report(sections, title))
+    return path
+
+
+def render_batch(jobs, out_dir, workers=REPORT_WORKERS):
+    """
+    Renders many reports in parallel. `jobs` maps an output file name (e.g.
+    the vote) to its list of sections. Charts are rendered once up front in
+    this process, then the PDF layout runs in a process pool.
+    Returns {file name: path}.
+    """
+    os.makedirs(out_dir, exist_ok=True)
+    for sections in jobs.values():
+        prerender_charts(sections)
+
+    paths = {}
+    with ProcessPoolExecutor(max_workers=min(workers, max(len(jobs), 1))) as pool:
+        futures = {
+            pool.submit(_write_report, os.path.join(out_dir, f"{name}.pdf"), sections, f"{REPORT_TITLE} — {name}"): name
+            for name, sections in jobs.items()
+        }
+        for future in as_completed(futures):
+            paths[futures[future]] = future.result()
+    return paths
+
+
+# ---- Command Line ----
+def vote_name(doc, fallback):
+    """
+    "Vote <code>" for the first vote in the document's budget tree, else
+    `fallback` (e.g. the file name).
+    """
+    for node in doc["budget_tree"].iter_nodes():
+        if node.level == "vote":
+            return f"Vote {node.code}"
+    return fallback
+
+
+def batch_jobs(paths, max_pages=None):
+    """
+    Processes each PDF and groups its report section by vote, as
+    render_batch expects. Indicators come from the local rule registry, so
+    no LLM call is made.
+    """
+    from backend import local_extract_budget_info
+    from incremental import process_document
+
+    jobs = {}
+    for path in paths:
+        name = os.path.basename(path)
+        doc = process_document(path, name=name, max_pages=max_pages)
+        vote = vote_name(doc, os.path.splitext(name)[0])
+        indicators = local_extract_budget_info(doc["text"], doc["pages"])
+        jobs.setdefault(vote, []).append(report_section(doc, name, indicators=indicators, subtitle=vote))
+    return jobs
+
+
+def main():
+    parser = argparse.ArgumentParser(description="Render one oversight report per vote.")
+    parser.add_argument("pdfs", nargs="+", help="budget PDFs or folders of PDFs")
+    parser.add_argument("--out", default="reports", help="output folder")
+    parser.add_argument("--workers", type=int, default=REPORT_WORKERS, help="report processes")
+    parser.add_argument("--max-pages", type=int, default=None, help="pages read per document")
+    args = parser.parse_args()
+
+    paths = []
+    for arg in args.pdfs:
+        if os.path.isdir(arg):
+            for root, _, files in os.walk(arg):
+                paths += [os.path.join(root, f) for f in sorted(files) if f.lower().endswith(".pdf")]
+        else:
+            paths.append(arg)
+    if not paths:
+        raise SystemExit("No PDFs found.")
+
+    start = time.perf_counter()
+    jobs = batch_jobs(paths, max_pages=args.max_pages)
+    for name, path in sorted(render_batch(jobs, args.out, workers=args.workers).items()):
+        print(f"  {name}: {path}")
+    print(f"{len(jobs)} report(s) from {len(paths)} document(s) in {time.perf_counter() - start:.1f}s")
+
+
+if __name__ == "__main__":
+    main()
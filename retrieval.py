@@ -0,0 +1,157 @@
+import os
+import re
+import zlib
+
+import numpy as np
+
+from page_cache import cache_path
+
+CHUNK_CHARS = int(os.getenv("CMAT_CHUNK_CHARS", "500"))
+CHUNK_OVERLAP = 80
+# Never fewer than one chunk per indicator query (see retrieve)
+TOP_K = int(os.getenv("CMAT_RETRIEVAL_TOP_K", "12"))
+VECTOR_DIM = 2048  # hashed vocabulary size; small enough to keep on CPU
+
+# One query per CMAT indicator the LLM is asked to extract
+INDICATOR_QUERIES = {
+    "Total Budget": "total budget estimates of expenditure grand total allocation",
+    "Public": "total public investment climate initiatives government expenditure",
+    "Adaptation": "climate change adaptation programme allocation resilience",
+    "Mitigation": "climate change mitigation emissions renewable allocation",
+    "Energy": "energy programme allocation electricity power renewable solar",
+    "Agriculture": "agriculture programme allocation irrigation farming crops livestock",
+    "Health": "health programme allocation hospitals medical",
+    "Transport": "transport programme allocation roads infrastructure",
+    "Water": "water programme allocation sanitation irrigation water development",
+}
+
+_TOKEN_RE = re.compile(r"[a-z]{2,}")
+_NUMBER_RE = re.compile(r"\d[\d,]{2,}")
+
+
+# ---- Chunking ----
+def chunk_pages(pages, size=CHUNK_CHARS, overlap=CHUNK_OVERLAP):
+    """
+    Splits page texts into overlapping chunks that never span pages.
+    Returns [(page number, text)] with 1-based page numbers.
+    """
+    chunks = []
+    step = max(size - overlap, 1)
+    for page_no, text in enumerate(pages, start=1):
+        text = re.sub(r"[ \t]+", " ", text).strip()
+        for start in range(0, max(len(text), 1), step):
+            piece = text[start:start + size]
+            if piece.strip():
+                chunks.append((page_no, piece))
+            if start + size >= len(text):
+                break
+    return chunks
+
+
+# ---- Hashed TF-IDF Vectors ----
+def _bucket(token):
+    return zlib.crc32(token.encode()) % VECTOR_DIM
+
+
+def term_counts(texts):
+    """
+    Sublinear term-frequency matrix (len(texts) × VECTOR_DIM) over hashed tokens.
+    """
+    matrix = np.zeros((len(texts), VECTOR_DIM), dtype=np.float32)
+    for row, text in enumerate(texts):
+        for token in _TOKEN_RE.findall(text.lower()):
+            matrix[row, _bucket(token)] += 1
+    np.log1p(matrix, out=matrix)
+    return matrix
+
+
+def _normalize(matrix):
+    norms = np.linalg.norm(matrix, axis=1, keepdims=True)
+    norms[norms == 0] = 1
+    return matrix / norms
+
+
+def build_index(chunks):
+    """
+    Returns (chunk vectors, idf) for the chunk texts. Vectors are L2-normalized
+    TF-IDF rows, so scoring is a single matrix-vector product.
+    """
+    tf = term_counts([text for _, text in chunks])
+    df = np.count_nonzero(tf, axis=0)
+    idf = (np.log((1 + len(chunks)) / (1 + df)) + 1).astype(np.float32)
+    return _normalize(tf * idf), idf
+
+
+def load_or_build_index(chunks, doc_hash=None):
+    """
+    Chunk vectors are cached per document hash (and chunking settings).
+    """
+    if not doc_hash:
+        return build_index(chunks)
+    path = cache_path("retrieval", f"{doc_hash}-{CHUNK_CHARS}-{CHUNK_OVERLAP}-{VECTOR_DIM}", "npz")
+    if os.path.exists(path):
+        cached = np.load(path)
+        if cached["vectors"].shape[0] == len(chunks):
+            return cached["vectors"], cached["idf"]
+    vectors, idf = build_index(chunks)
+    os.makedirs(os.path.dirname(path), exist_ok=True)
+    tmp = f"{path}.{os.getpid()}.tmp.npz"
+    np.savez(tmp, vectors=vectors, idf=idf)
+    os.replace(tmp, path)
+    return vectors, idf
+
+
+# ---- Retrieval ----
+def score_chunks(chunks, vectors, idf, queries=None):
+    """
+    Returns a (len(queries) × len(chunks)) score matrix. Chunks that carry
+    figures get a boost, since the LLM is asked for amounts.
+    """
+    queries = queries or INDICATOR_QUERIES
+    query_vectors = _normalize(term_counts(list(queries.values())) * idf)
+    scores = query_vectors @ vectors.T
+    has_numbers = np.fromiter((bool(_NUMBER_RE.search(text)) for _, text in chunks), dtype=bool, count=len(chunks))
+    return scores * np.where(has_numbers, 1.25, 1.0)
+
+
+def retrieve(pages, doc_hash=None, top_k=TOP_K, queries=None, order="document"):
+    """
+    Picks the chunks most relevant to the CMAT indicator queries: every
+    query's best chunk not already taken, then the highest remaining scores
+    up to `top_k`. `top_k` is raised to the number of queries so no
+    indicator is left without a chunk. Returns [(page number, text)] in
+    document order, or with order="relevance" in the order they were picked
+    (each query's best chunk first), for filling a budget.
+    """
+    queries = queries or INDICATOR_QUERIES
+    top_k = max(top_k, len(queries))
+    chunks = chunk_pages(pages)
+    if len(chunks) <= top_k and order == "document":
+        return chunks
+    vectors, idf = load_or_build_index(chunks, doc_hash)
+    scores = score_chunks(chunks, vectors, idf, queries)
+
+    picked = []
+    ranked = np.argsort(-scores, axis=1)
+    for q in range(ranked.shape[0]):
+        for idx in ranked[q]:
+            idx = int(idx)
+            if scores[q, idx] <= 0:
+                break
+            if idx not in picked:
+                picked.append(idx)
+                break
+    best = scores.max(axis=0)
+    for idx in np.argsort(-best):
+        if len(picked) >= top_k or best[idx] <= 0:
+            break
+        if int(idx) not in picked:
+            picked.append(int(idx))
+    return [chunks[i] for i in (sorted(picked) if order == "document" else picked)]
+
+
+def build_context(chunks):
+    """
+    Formats retrieved chunks for the prompt, labelled with their page.
+    """
+    return "\n\n".join(f"[Page {page}]\n{text}" for page, text in chunks)
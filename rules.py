@@ -0,0 +1,230 @@
+import re
+import threading
+import time
+from functools import lru_cache
+
+from regex_guard import IGNORECASE, guard
+
+# ---- Value Patterns ----
+# Possessive and anchored at the start of a number, so a failed percent try
+# on a long digit run costs one pass instead of one per digit.
+VALUE_PATTERNS = {
+    "amount": r"\d[\d,]*",
+    "number": r"\d[\d,]*(?:\.\d+)?",
+    "percent": r"(?<!\d)\d++(?:\.\d++)?+(?=\s*%)",
+}
+# Most characters allowed between a label and its figure. Unbounded gaps
+# make a pass quadratic on text extracted as one very long line. Keyword
+# rules used to allow any run of non-digits ([^0-9]*, across lines); a
+# figure more than GAP_CHARS non-digits after a keyword is no longer taken
+# for it, so a long label or prose run yields no value instead of the
+# next number further down the page.
+GAP_CHARS = 200
+DEFAULT_GAP = rf"[^\n]{{0,{GAP_CHARS}}}?"
+
+SECTORS = ["Energy", "Agriculture", "Health", "Transport", "Water"]
+
+# ---- Indicator Rules ----
+# Each rule maps a CMAT indicator to a label pattern, the gap allowed between
+# the label and its figure, and the kind of figure to capture. `reduce` picks
+# which hit wins when a label appears several times ("first" or "max").
+# Patterns must not contain capturing groups; use (?:...) instead.
+INDICATOR_RULES = [
+    {
+        "name": "total_public_investment",
+        "indicator": "Total Public Investment in Climate Initiatives",
+        "pattern": r"Total\s+Public\s+Investment",
+        "value": "amount",
+    },
+    {
+        "name": "adaptation_share",
+        "indicator": "Percentage of National Budget Allocated to Climate Adaptation",
+        "pattern": r"Climate\s+Adaptation\s*:",
+        "gap": r"\s*",
+        "value": "percent",
+    },
+    {
+        "name": "yoy_increase",
+        "indicator": "Year-on-Year Budget Increase for Climate Adaptation",
+        "pattern": r"Year.?on.?Year",
+        "value": "percent",
+    },
+    {
+        "name": "private_investment",
+        "indicator": "Private Sector Investment Mobilized",
+        "pattern": r"Private\s+Sector\s+Investment",
+        "value": "amount",
+    },
+    {
+        "name": "total_budget",
+        "indicator": "Total Budget",
+        "pattern": r"Total",
+        "value": "amount",
+        "reduce": "max",
+    },
+] + [
+    {
+        "name": f"sector_{sector.lower()}",
+        "indicator": sector,
+        "group": "Funding Allocation by Sector",
+        "pattern": sector,
+        "value": "percent",
+    }
+    for sector in SECTORS
+]
+
+
+def _to_float(raw):
+    try:
+        return float(raw.replace(",", ""))
+    except ValueError:
+        return None
+
+
+# ---- Compiled Rule Set ----
+class RuleSet:
+    """
+    Compiles a list of rules into one combined label matcher. A single scan
+    over the text finds every position where some label starts; only there
+    are the individual rules tried to capture their figures. Per-rule hit
+    counts and match time are kept in `stats`.
+
+    Labels can overlap ("Total" and "Total Public Investment"), so at each
+    hit one untimed match of all labels as optional lookaheads reports
+    which rules' labels start there; only those rules' full patterns run,
+    under regex_guard's time budget.
+    """
+
+    def __init__(self, rules, flags=IGNORECASE, name="rules"):
+        self.rules = list(rules)
+        self.full = {}
+        labels = []
+        for i, rule in enumerate(self.rules):
+            value = VALUE_PATTERNS[rule.get("value", "number")]
+            gap = rule.get("gap", DEFAULT_GAP)
+            self.full[rule["name"]] = guard(
+                f"{name}:{rule['name']}", rf"(?:{rule['pattern']}){gap}(?P<value>{value})", flags
+            )
+            labels.append(f"(?P<r{i}>{rule['pattern']})")
+        self.matcher = guard(f"{name}:labels", "|".join(labels), flags)
+        # Zero-width, so each optional group records whether its label starts here
+        self.labels_at = re.compile("".join(f"(?:(?={label}))?" for label in labels), flags).match
+        self.full_by_group = [(rule["name"], self.full[rule["name"]]) for rule in self.rules]
+        self._lock = threading.Lock()
+        self.reset_stats()
+
+    def reset_stats(self):
+        with self._lock:
+            self.stats = {rule["name"]: {"hits": 0, "seconds": 0.0} for rule in self.rules}
+            self.scan_seconds = 0.0
+            self.passes = 0
+
+    def scan(self, text):
+        """
+        Returns {rule name: [value, ...]} for every hit in the text, in order.
+        """
+        return {name: [value for value, _ in found] for name, found in self.scan_spans(text).items()}
+
+    def scan_spans(self, text):
+        """
+        Like scan, but each hit is (value, (start, end)) with the span of the
+        figure in the text, so it can be traced back to where it is printed.
+        """
+        hits = {}
+        timings = {}
+        start = time.perf_counter()
+        pos = 0
+        search = self.matcher.search
+        while True:
+            m = search(text, pos)
+            if not m:
+                break
+            at = m.start()
+            started = self.labels_at(text, at).groups()
+            for (name, full), label in zip(self.full_by_group, started):
+                if label is None:
+                    continue
+                t0 = time.perf_counter()
+                fm = full.match(text, at)
+                timings[name] = timings.get(name, 0.0) + time.perf_counter() - t0
+                if fm:
+                    value = _to_float(fm.group("value"))
+                    if value is not None:
+                        hits.setdefault(name, []).append((value, fm.span("value")))
+            pos = at + 1
+        elapsed = time.perf_counter() - start
+
+        with self._lock:
+            self.passes += 1
+            self.scan_seconds += elapsed
+            for name, seconds in timings.items():
+                self.stats[name]["seconds"] += seconds
+            for name, values in hits.items():
+                self.stats[name]["hits"] += len(values)
+        return hits
+
+    def scan_pages(self, pages):
+        """
+        Scans each page once. Returns {rule name: [(page number, value), ...]}
+        with 1-based page numbers.
+        """
+        hits = {}
+        for page_no, page in enumerate(pages, start=1):
+            for name, values in self.scan(page).items():
+                hits.setdefault(name, []).extend((page_no, v) for v in values)
+        return hits
+
+    def resolve(self, hits):
+        """
+        Reduces raw hits (from scan or scan_pages) to one value per rule.
+        """
+        results = {}
+        for rule in self.rules:
+            values = hits.get(rule["name"])
+            if not values:
+                continue
+            values = [v[1] if isinstance(v, tuple) else v for v in values]
+            results[rule["name"]] = max(values) if rule.get("reduce") == "max" else values[0]
+        return results
+
+    def extract(self, text_or_pages):
+        """
+        One pass per page, one value per rule.
+        """
+        if isinstance(text_or_pages, str):
+            return self.resolve(self.scan(text_or_pages))
+        return self.resolve(self.scan_pages(text_or_pages))
+
+    def profile(self, text, repeat=3):
+        """
+        Times every rule on its own over the full text (the old one-scan-per-
+        indicator way), to spot expensive patterns. Returns {name: seconds}.
+        """
+        report = {}
+        for name, full in self.full.items():
+            start = time.perf_counter()
+            for _ in range(repeat):
+                full.findall(text)
+            report[name] = (time.perf_counter() - start) / repeat
+        return report
+
+
+# Compiled once at import.
+REGISTRY = RuleSet(INDICATOR_RULES)
+
+
+def rules_by_name():
+    return {rule["name"]: rule for rule in INDICATOR_RULES}
+
+
+# ---- Keyword Rules ----
+@lru_cache(maxsize=32)
+def keyword_ruleset(keywords):
+    """
+    Builds (and caches) a rule set for free-form keywords, each matched as
+    `<keyword> <up to GAP_CHARS non-digits> <number>`.
+    """
+    return RuleSet([
+        {"name": key, "indicator": key, "pattern": re.escape(key), "gap": rf"[^0-9]{{0,{GAP_CHARS}}}", "value": "number"}
+        for key in keywords
+    ], name="keywords")
@@ -0,0 +1,186 @@
+import itertools
+import os
+import threading
+import time
+from dataclasses import dataclass, field
+
+import fitz  # PyMuPDF
+
+# ---- Scheduler Settings ----
+MAX_JOBS = int(os.getenv("CMAT_SCHED_MAX_JOBS", "0")) or os.cpu_count() or 2
+MAX_JOBS_PER_USER = int(os.getenv("CMAT_SCHED_PER_USER", "2"))
+MEMORY_BUDGET_MB = float(os.getenv("CMAT_SCHED_MEMORY_MB", "2048"))
+# Rough working set: the PDF is held a few times over (upload, bytes, fitz),
+# plus text, layout and regex state per processed page
+FILE_MEMORY_FACTOR = 3
+PAGE_MEMORY_MB = 4
+# Jobs at or under both limits are interactive; the rest go to the bulk lane
+INTERACTIVE_PAGES = int(os.getenv("CMAT_SCHED_INTERACTIVE_PAGES", "20"))
+INTERACTIVE_MB = 20
+# A bulk job waiting this long is served like an interactive one
+BULK_MAX_WAIT = 120.0
+# Waiting jobs not polled for this long belong to a session that went away
+ABANDONED_AFTER = 10.0
+
+LANES = ("interactive", "bulk")
+
+
+@dataclass(slots=True, eq=False)
+class Job:
+    user: str
+    pages: int
+    size_mb: float
+    lane: str
+    memory_mb: float
+    seq: int
+    batch: object = None  # jobs from one multi-document upload share a key
+    enqueued: float = field(default_factory=time.monotonic)
+    polled: float = field(default_factory=time.monotonic)
+
+
+def estimate_job(data, user, max_pages=None, seq=0, batch=None):
+    """
+    Sizes a job from the PDF's page count (capped at the pages that will be
+    processed) and file size, and picks its lane.
+    """
+    try:
+        with fitz.open(stream=data, filetype="pdf") as doc:
+            pages = doc.page_count
+    except Exception:
+        pages = 1
+    if max_pages:
+        pages = min(pages, max_pages)
+    return sized_job(user, pages, len(data) / 2**20, seq, batch)
+
+
+def sized_job(user, pages, size_mb, seq=0, batch=None):
+    """
+    A job of known page count and file size (MB), with its lane and memory
+    estimate.
+    """
+    lane = "interactive" if pages <= INTERACTIVE_PAGES and size_mb <= INTERACTIVE_MB else "bulk"
+    memory_mb = size_mb * FILE_MEMORY_FACTOR + pages * PAGE_MEMORY_MB
+    return Job(user or "anonymous", pages, size_mb, lane, memory_mb, seq, batch)
+
+
+# ---- Scheduler ----
+class JobScheduler:
+    """
+    Admission control for extraction jobs shared by every session in the
+    process: a global and a per-user concurrency limit, an estimated memory
+    budget, and two priority lanes. Interactive jobs go first; bulk jobs may
+    never take the last free slot, so a small upload always gets in quickly.
+
+    Jobs from one batch (a multi-document upload) count once against the
+    per-user limit, so a comparison runs its documents side by side. A job
+    larger than the memory budget runs alone: once it is the highest-ranked
+    job that cannot start, nothing ranked below it is admitted until the
+    running jobs drain.
+
+    Waiting times are read from `clock` (time.monotonic by default).
+    """
+
+    def __init__(self, max_jobs=MAX_JOBS, per_user=MAX_JOBS_PER_USER, memory_mb=MEMORY_BUDGET_MB,
+                 clock=time.monotonic):
+        self.max_jobs = max_jobs
+        self.per_user = per_user
+        self.memory_mb = memory_mb
+        self.clock = clock
+        self.waiting = []
+        self.running = set()
+        self._seq = itertools.count()
+        self._lock = threading.Lock()
+
+    def job(self, data, user=None, max_pages=None, batch=None):
+        return estimate_job(data, user, max_pages, seq=next(self._seq), batch=batch)
+
+    def submit(self, user=None, pages=1, size_mb=0.0, batch=None):
+        """
+        Queues a job of known size and returns it; try_admit decides when it
+        may start.
+        """
+        job = sized_job(user, pages, size_mb, seq=next(self._seq), batch=batch)
+        with self._lock:
+            self._enqueue(job, self.clock())
+        return job
+
+    def _enqueue(self, job, now):
+        job.enqueued = job.polled = now
+        self.waiting.append(job)
+
+    # ---- Admission ----
+    def _rank(self, job, now):
+        aged = job.lane == "bulk" and now - job.enqueued >= BULK_MAX_WAIT
+        return (0 if job.lane == "interactive" or aged else 1, job.seq)
+
+    def _fits(self, job):
+        if len(self.running) >= self.max_jobs:
+            return False
+        if job.lane == "bulk" and self.max_jobs > 1 and len(self.running) >= self.max_jobs - 1:
+            return False  # keep one slot for interactive work
+        # A batch holds one user slot however many of its documents run
+        units = {j.batch if j.batch is not None else j for j in self.running if j.user == job.user}
+        if (job.batch is None or job.batch not in units) and len(units) >= self.per_user:
+            return False
+        in_use = sum(j.memory_mb for j in self.running)
+        # A job larger than the whole budget still runs, but only on its own
+        return in_use + job.memory_mb <= self.memory_mb or not self.running
+
+    def _oversize(self, job):
+        return job.memory_mb > self.memory_mb
+
+    def try_admit(self, job):
+        """
+        Queues the job on first call; returns True once it may start. The
+        highest-ranked waiting job that fits is admitted first, so a job held
+        back by its user's limit does not block anyone else.
+        """
+        with self._lock:
+            if job in self.running:
+                return True
+            now = self.clock()
+            if job not in self.waiting:
+                self._enqueue(job, now)
+            job.polled = now
+            self.waiting = [j for j in self.waiting if now - j.polled < ABANDONED_AFTER]
+            for candidate in sorted(self.waiting, key=lambda j: self._rank(j, now)):
+                if self._fits(candidate):
+                    if candidate is job:
+                        self.waiting.remove(job)
+                        self.running.add(job)
+                        return True
+                    break  # a higher-ranked job takes the next slot
+                if self._oversize(candidate):
+                    break  # let the running jobs drain so it can start
+            return False
+
+    def release(self, job):
+        """
+        Frees the job's slot, or drops it from the queue if it never started.
+        """
+        with self._lock:
+            self.running.discard(job)
+            if job in self.waiting:
+                self.waiting.remove(job)
+
+    # ---- Feedback ----
+    def position(self, job):
+        """
+        (1-based place in the queue, jobs waiting), or (0, n) once admitted.
+        """
+        with self._lock:
+            now = self.clock()
+            order = sorted(self.waiting, key=lambda j: self._rank(j, now))
+            return (order.index(job) + 1 if job in order else 0), len(order)
+
+    def stats(self):
+        with self._lock:
+            return {
+                "running": len(self.running),
+                "waiting": len(self.waiting),
+                "memory_mb": sum(j.memory_mb for j in self.running),
+                "lanes": {lane: sum(1 for j in self.waiting if j.lane == lane) for lane in LANES},
+            }
+
+
+SCHEDULER = JobScheduler()
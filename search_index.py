@@ -0,0 +1,116 @@
+import html
+import os
+import re
+import sqlite3
+import time
+
+from page_cache import CACHE_DIR
+
+INDEX_PATH = os.getenv("CMAT_SEARCH_DB", os.path.join(CACHE_DIR, "search.db"))
+
+# Snippet markers that cannot occur in extracted text; swapped for <mark> after escaping
+_HL_START, _HL_END = "\x02", "\x03"
+
+SCHEMA = """
+CREATE TABLE IF NOT EXISTS documents (
+    doc_hash TEXT PRIMARY KEY,
+    name TEXT,
+    pages INTEGER,
+    indexed_at REAL
+);
+CREATE VIRTUAL TABLE IF NOT EXISTS pages_fts USING fts5(
+    body,
+    doc_hash UNINDEXED,
+    name UNINDEXED,
+    page UNINDEXED,
+    tokenize = 'porter unicode61'
+);
+"""
+
+
+# ---- Connection ----
+def connect(path=INDEX_PATH):
+    os.makedirs(os.path.dirname(path) or ".", exist_ok=True)
+    conn = sqlite3.connect(path, timeout=30)
+    conn.execute("PRAGMA journal_mode=WAL")
+    conn.executescript(SCHEMA)
+    return conn
+
+
+# ---- Indexing ----
+def index_document(doc_hash, name, pages, path=INDEX_PATH):
+    """
+    Adds every page of a processed document to the index. Documents already
+    indexed (same file hash) are skipped, so this is cheap to call on every
+    rerun. Returns True if the document was newly indexed.
+    """
+    with connect(path) as conn:
+        if conn.execute("SELECT 1 FROM documents WHERE doc_hash = ?", (doc_hash,)).fetchone():
+            return False
+        conn.executemany(
+            "INSERT INTO pages_fts (body, doc_hash, name, page) VALUES (?, ?, ?, ?)",
+            [(text, doc_hash, name, page_no) for page_no, text in enumerate(pages, start=1) if text.strip()],
+        )
+        conn.execute(
+            "INSERT INTO documents (doc_hash, name, pages, indexed_at) VALUES (?, ?, ?, ?)",
+            (doc_hash, name, len(pages), time.time()),
+        )
+    return True
+
+
+def remove_document(doc_hash, path=INDEX_PATH):
+    with connect(path) as conn:
+        conn.execute("DELETE FROM pages_fts WHERE doc_hash = ?", (doc_hash,))
+        conn.execute("DELETE FROM documents WHERE doc_hash = ?", (doc_hash,))
+
+
+def indexed_documents(path=INDEX_PATH):
+    with connect(path) as conn:
+        return conn.execute("SELECT name, pages, doc_hash FROM documents ORDER BY indexed_at").fetchall()
+
+
+# ---- Querying ----
+def to_fts_query(query):
+    """
+    Turns free text into an FTS5 query: "quoted phrases" are kept, other
+    words are ANDed, and FTS operators in user input are neutralized.
+    """
+    parts = []
+    for phrase, word in re.findall(r'"([^"]+)"|(\w+)', query):
+        terms = re.findall(r"\w+", phrase or word)
+        if terms:
+            parts.append('"' + " ".join(terms) + '"')
+    return " ".join(parts)
+
+
+def highlight(snippet):
+    """
+    HTML-escapes a snippet and wraps matched terms in <mark>.
+    """
+    return html.escape(snippet).replace(_HL_START, "<mark>").replace(_HL_END, "</mark>")
+
+
+def search(query, limit=20, path=INDEX_PATH):
+    """
+    Returns page-level hits ranked by BM25, best first, as dicts with the
+    document name, page number, score and a highlighted snippet.
+    """
+    fts_query = to_fts_query(query)
+    if not fts_query:
+        return []
+    with connect(path) as conn:
+        rows = conn.execute(
+            f"""
+            SELECT name, page, doc_hash, bm25(pages_fts) AS score,
+                   snippet(pages_fts, 0, '{_HL_START}', '{_HL_END}', ' … ', 16)
+            FROM pages_fts
+            WHERE pages_fts MATCH ?
+            ORDER BY score
+            LIMIT ?
+            """,
+            (fts_query, limit),
+        ).fetchall()
+    return [
+        {"document": name, "page": page, "doc_hash": doc_hash, "score": -score, "snippet": highlight(snip)}
+        for name, page, doc_hash, score, snip in rows
+    ]
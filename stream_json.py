@@ -0,0 +1,110 @@
+import json
+
+_WHITESPACE = " \t\r\n"
+_VALUE_END = ",}" + _WHITESPACE
+
+
+class IncrementalObjectParser:
+    """
+    Parses a streamed flat JSON object ({"key": scalar, ...}) as text
+    arrives. feed() returns the (key, value) pairs completed by the new text,
+    so each field can be used as soon as its value is closed; fields seen
+    before a truncated or malformed tail are kept in `fields`. A scalar
+    counts as complete only once a delimiter follows it.
+    """
+
+    def __init__(self):
+        self.buffer = ""
+        self.pos = 0
+        self.state = "start"  # start -> key -> colon -> value -> next ... -> done (or truncated)
+        self.key = None
+        self.fields = {}
+
+    def _string_end(self, start):
+        """
+        Index of the closing quote of the string opening at `start`, or -1.
+        """
+        i = start + 1
+        while i < len(self.buffer):
+            if self.buffer[i] == "\\":
+                i += 2
+                continue
+            if self.buffer[i] == '"':
+                return i
+            i += 1
+        return -1
+
+    def _skip_whitespace(self):
+        while self.pos < len(self.buffer) and self.buffer[self.pos] in _WHITESPACE:
+            self.pos += 1
+
+    def feed(self, text):
+        self.buffer += text
+        completed = []
+        while True:
+            self._skip_whitespace()
+            if self.pos >= len(self.buffer) or self.state in ("done", "truncated"):
+                break
+            char = self.buffer[self.pos]
+
+            if self.state == "start":
+                if char != "{":
+                    raise ValueError(f"Expected '{{' at {self.pos}, got {char!r}")
+                self.pos += 1
+                self.state = "key"
+            elif self.state == "key":
+                if char == "}":
+                    self.pos += 1
+                    self.state = "done"
+                    continue
+                if char != '"':
+                    raise ValueError(f"Expected a key at {self.pos}, got {char!r}")
+                end = self._string_end(self.pos)
+                if end < 0:
+                    break  # key still streaming
+                self.key = json.loads(self.buffer[self.pos:end + 1])
+                self.pos = end + 1
+                self.state = "colon"
+            elif self.state == "colon":
+                if char != ":":
+                    raise ValueError(f"Expected ':' at {self.pos}, got {char!r}")
+                self.pos += 1
+                self.state = "value"
+            elif self.state == "value":
+                if char == '"':
+                    end = self._string_end(self.pos)
+                else:
+                    end = self.pos
+                    while end < len(self.buffer) and self.buffer[end] not in _VALUE_END:
+                        end += 1
+                    # A number is only complete once a delimiter follows it
+                    end = end - 1 if end < len(self.buffer) else -1
+                if end < 0:
+                    break
+                value = json.loads(self.buffer[self.pos:end + 1])
+                self.fields[self.key] = value
+                completed.append((self.key, value))
+                self.pos = end + 1
+                self.state = "next"
+            elif self.state == "next":
+                if char not in ",}":
+                    raise ValueError(f"Expected ',' or '}}' at {self.pos}, got {char!r}")
+                self.pos += 1
+                self.state = "key" if char == "," else "done"
+        return completed
+
+    def close(self):
+        """
+        Ends the stream. A value still open at the end (e.g. output cut off
+        inside a number) is dropped, since it may be missing digits; only
+        values closed by a delimiter are kept. Returns the pairs this
+        completes, which is always none.
+        """
+        if self.state == "value":
+            self.key = None
+            self.state = "truncated"
+        return []
+
+    @property
+    def complete(self):
+        return self.state == "done"
@@ -0,0 +1,21 @@
+from compaction import count_tokens, fit_chunks
+from retrieval import build_context
+
+
+def test_fit_chunks_keeps_best_first_then_sorts_by_page():
+    chunks = [(9, "water " * 40), (1, "total " * 200), (4, "health " * 40)]
+    budget = count_tokens(build_context([chunks[0], chunks[2]]))
+
+    kept = fit_chunks(chunks, build_context, budget)
+
+    # The long page-1 chunk does not fit, but the shorter one after it does
+    assert [page for page, _ in kept] == [4, 9]
+
+
+def test_fit_chunks_cuts_the_best_chunk_when_nothing_fits():
+    chunks = [(3, "\n".join(f"line {i}" for i in range(200)))]
+
+    kept = fit_chunks(chunks, build_context, 50)
+
+    assert [page for page, _ in kept] == [3]
+    assert count_tokens(build_context(kept)) <= 50
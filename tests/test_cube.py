@@ -0,0 +1,28 @@
+import pytest
+
+pytest.importorskip("plotly")
+
+from budget_tree import build_budget_tree  # noqa: E402
+from cube import vote_lookup  # noqa: E402
+
+TREE = """HEAD 12 Ministry of Agriculture
+VOTE 89 Agriculture
+4101 Seeds 1,000 2,000 3,000
+VOTE 91 Water
+41 Irrigation 1,000 2,000 3,000
+"""
+
+
+def test_vote_lookup_follows_the_tree():
+    vote = vote_lookup(build_budget_tree(TREE))
+
+    assert vote("41", "41 - Chiansi Water Development Project") == "Vote 91"
+    assert vote("", "Seeds") == "Vote 89"
+    assert vote("", "Fisheries") == ""
+
+
+def test_single_vote_covers_every_line():
+    vote = vote_lookup(build_budget_tree(TREE.split("VOTE 91")[0]))
+
+    assert vote("", "Fisheries") == "Vote 89"
+    assert vote_lookup(None)("07", "Irrigation") == ""
@@ -0,0 +1,56 @@
+import pytest
+
+pytest.importorskip("fitz")
+
+from incremental import document_key  # noqa: E402
+
+
+@pytest.mark.parametrize("name, key", [
+    ("Yellow Book 2024.pdf", "yellow-book-2024"),
+    ("Yellow Book 2024 Supplementary.pdf", "yellow-book-2024"),
+    ("budget_2024_revised.pdf", "budget-2024"),
+    ("yellow_book_2024_v2.pdf", "yellow-book-2024"),
+    ("budget-2024-FINAL.PDF", "budget-2024"),
+    ("budget.2024.draft.pdf", "budget-2024"),
+    ("budget_2024_revisions.pdf", "budget-2024-revisions"),
+    (None, "document"),
+])
+def test_document_key_ignores_revision_words(name, key):
+    assert document_key(name) == key
+
+
+def test_repeated_values_are_boxed_where_their_rule_matched():
+    import fitz
+
+    from incremental import analyze_page
+
+    doc = fitz.open()
+    page = doc.new_page()
+    for y, line in [(100, "Health: 20%"), (300, "Year-on-Year Budget Increase: 20%")]:
+        page.insert_text((72, y), line)
+    result = analyze_page(page.get_text("text"), page.get_text("words"))
+
+    health, = result["boxes"]["rules"]["sector_health"]
+    yoy, = result["boxes"]["rules"]["yoy_increase"]
+    assert health[1] < 100 < health[3]
+    assert yoy[1] < 300 < yoy[3]
+
+
+def test_diff_covers_agriculture_and_tree_programmes():
+    from budget_tree import build_budget_tree
+    from incremental import allocation_rows, diff_allocations
+    from models import LineItem
+
+    tree_text = "HEAD 12 Agriculture\n4101 Seeds 1,000 2,000 3,000\n"
+    before = allocation_rows([], [LineItem("Agricultural Support", 2024, 10.0)], build_budget_tree(tree_text))
+    after = allocation_rows(
+        [],
+        [LineItem("Agricultural Support", 2024, 10.0), LineItem("Agricultural Support", 2024, 7.0, line=1)],
+        build_budget_tree(tree_text.replace("3,000", "3,500")),
+    )
+    diff = diff_allocations(before, after)
+
+    assert diff[["Section", "Programme", "Year", "Change"]].values.tolist() == [
+        ["Budget tree", "12/4101 Seeds", "2024", 500.0],
+        ["Agriculture", "Agricultural Support (2)", "2024", 7.0],
+    ]
@@ -0,0 +1,23 @@
+from rules import GAP_CHARS, keyword_ruleset
+
+
+def extract(text, keywords=("total budget", "public")):
+    return keyword_ruleset(tuple(keywords)).extract(text)
+
+
+def test_keyword_figure_across_lines():
+    assert extract("Total Budget\n(in Kwacha):\n 1,250,000") == {"total budget": 1250000.0}
+
+
+def test_keyword_gap_at_limit():
+    assert extract("Public" + "x" * GAP_CHARS + "42") == {"public": 42.0}
+
+
+def test_keyword_gap_over_limit_finds_nothing():
+    # [^0-9]* used to reach any later figure; the gap is now bounded
+    assert extract("Public" + " label" * (GAP_CHARS // 6 + 1) + " 42") == {}
+
+
+def test_later_keyword_near_figure_wins():
+    text = "Public" + "." * (GAP_CHARS + 1) + "\nPublic investment: 30,000,000"
+    assert extract(text) == {"public": 30000000.0}
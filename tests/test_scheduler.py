@@ -0,0 +1,115 @@
+import pytest
+
+pytest.importorskip("fitz")
+
+from scheduler import ABANDONED_AFTER, BULK_MAX_WAIT, INTERACTIVE_PAGES, JobScheduler  # noqa: E402
+
+BULK_PAGES = INTERACTIVE_PAGES + 1
+
+
+class Clock:
+    def __init__(self):
+        self.now = 1000.0
+
+    def __call__(self):
+        return self.now
+
+
+@pytest.fixture
+def clock():
+    return Clock()
+
+
+def scheduler(clock, max_jobs=4, per_user=2, memory_mb=1000):
+    return JobScheduler(max_jobs=max_jobs, per_user=per_user, memory_mb=memory_mb, clock=clock)
+
+
+def test_interactive_lane_goes_first(clock):
+    sched = scheduler(clock)
+    bulk = sched.submit("a", pages=BULK_PAGES)
+    small = sched.submit("b")
+
+    assert (bulk.lane, small.lane) == ("bulk", "interactive")
+    assert sched.position(small) == (1, 2)
+    assert not sched.try_admit(bulk)
+    assert sched.try_admit(small)
+    assert sched.try_admit(bulk)
+
+
+def test_bulk_never_takes_the_last_slot(clock):
+    sched = scheduler(clock, max_jobs=2)
+    first = sched.submit("a", pages=BULK_PAGES)
+    second = sched.submit("b", pages=BULK_PAGES)
+    small = sched.submit("c")
+
+    assert sched.try_admit(small)
+    assert not sched.try_admit(first)
+    sched.release(small)
+    assert sched.try_admit(first)
+    assert not sched.try_admit(second)
+    assert sched.try_admit(sched.submit("d"))
+
+
+def test_per_user_limit_does_not_block_other_users(clock):
+    sched = scheduler(clock, per_user=1)
+    first, second = sched.submit("a"), sched.submit("a")
+    other = sched.submit("b")
+
+    assert sched.try_admit(first)
+    assert not sched.try_admit(second)
+    assert sched.try_admit(other)
+    sched.release(first)
+    assert sched.try_admit(second)
+
+
+def test_batch_counts_once_against_the_user_limit(clock):
+    sched = scheduler(clock, per_user=1)
+    batch = object()
+    jobs = [sched.submit("a", batch=batch) for _ in range(3)]
+
+    assert all(sched.try_admit(job) for job in jobs)
+    assert not sched.try_admit(sched.submit("a"))
+
+
+def test_oversize_job_runs_alone_after_the_queue_drains(clock):
+    sched = scheduler(clock, memory_mb=100)
+    running = sched.submit("a")
+    assert sched.try_admit(running)
+    big = sched.submit("b", pages=INTERACTIVE_PAGES, size_mb=20)  # 140 MB estimated
+    small = sched.submit("c")
+
+    assert big.memory_mb > sched.memory_mb
+    assert not sched.try_admit(big)
+    assert not sched.try_admit(small)  # held behind the oversize job
+    sched.release(running)
+    assert sched.try_admit(big)
+    assert not sched.try_admit(small)
+    sched.release(big)
+    assert sched.try_admit(small)
+
+
+def test_bulk_job_is_served_after_waiting_long_enough(clock):
+    sched = scheduler(clock)
+    bulk = sched.submit("a", pages=BULK_PAGES)
+    small = sched.submit("b")
+    assert sched.position(bulk) == (2, 2)
+
+    clock.now += BULK_MAX_WAIT
+    late = sched.submit("c")
+
+    # Aged bulk work ranks with interactive jobs, by arrival
+    assert sched.position(bulk) == (1, 3)
+    assert sched.position(late) == (3, 3)
+    assert sched.try_admit(bulk)
+    assert sched.try_admit(small)
+
+
+def test_abandoned_jobs_leave_the_queue(clock):
+    sched = scheduler(clock, max_jobs=1)
+    gone = sched.submit("a")
+    clock.now += ABANDONED_AFTER
+    waiting = sched.submit("b")
+
+    assert sched.try_admit(waiting)
+    assert sched.stats()["waiting"] == 0
+    assert sched.position(gone) == (0, 0)
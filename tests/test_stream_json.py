@@ -0,0 +1,31 @@
+from stream_json import IncrementalObjectParser
+
+
+def test_fields_arrive_as_values_close():
+    parser = IncrementalObjectParser()
+    assert parser.feed('{"Energy": 25, "Wa') == [("Energy", 25)]
+    assert parser.feed('ter": 10}') == [("Water", 10)]
+    assert parser.complete
+
+
+def test_number_needs_a_delimiter():
+    parser = IncrementalObjectParser()
+    assert parser.feed('{"Total Budget": 120') == []
+    assert parser.feed('000000,') == [("Total Budget", 120000000)]
+
+
+def test_truncated_inside_number_is_dropped():
+    parser = IncrementalObjectParser()
+    completed = parser.feed('{"Energy": 25, "Total Budget": 12000')
+    assert completed == [("Energy", 25)]
+    assert parser.close() == []
+    assert parser.fields == {"Energy": 25}
+    assert not parser.complete
+    assert parser.feed("0000}") == []
+
+
+def test_truncated_inside_string_is_dropped():
+    parser = IncrementalObjectParser()
+    parser.feed('{"Energy": 25, "Note": "partial')
+    assert parser.close() == []
+    assert parser.fields == {"Energy": 25}
@@ -0,0 +1,108 @@
+import json
+import os
+from functools import lru_cache
+
+import numpy as np
+import pandas as pd
+
+THRESHOLDS_FILE = os.getenv(
+    "CMAT_THRESHOLDS_FILE", os.path.join(os.path.dirname(os.path.abspath(__file__)), "data", "thresholds.json")
+)
+DEFAULT_COUNTRY = "Default"
+ANY_YEAR = -1  # stored year for "*" entries
+
+
+# ---- Loading ----
+@lru_cache(maxsize=1)
+def load_targets(path=THRESHOLDS_FILE):
+    """
+    Loads the targets file into a frame indexed by (country, year, indicator).
+    """
+    with open(path, encoding="utf-8") as f:
+        entries = json.load(f)["targets"]
+    frame = pd.DataFrame(entries)
+    frame["year"] = frame["year"].map(lambda y: ANY_YEAR if y == "*" else int(y)).astype("int32")
+    return frame.set_index(["country", "year", "indicator"]).sort_index()
+
+
+def available_countries():
+    return sorted(load_targets().index.get_level_values("country").unique())
+
+
+@lru_cache(maxsize=256)
+def targets_for(country, year=None):
+    """
+    Resolves the target for every indicator for one (country, year): the
+    country's own year, then its "*" entry, then the Default country's.
+    Returns {indicator: (target, source)}.
+    """
+    targets = load_targets()
+    resolved = {}
+    year = ANY_YEAR if year is None else int(year)
+    for c in (DEFAULT_COUNTRY, country):
+        for y in (ANY_YEAR, year):
+            if (c, y) in targets.index.droplevel("indicator"):
+                for indicator, row in targets.loc[(c, y)].iterrows():
+                    resolved[indicator] = (float(row["target"]), row["source"])
+    return resolved
+
+
+# ---- Compliance ----
+@lru_cache(maxsize=1024)
+def _evaluate(country, year, labels, percentages):
+    targets = targets_for(country, year)
+    percent = np.round(np.asarray(percentages, dtype=float), 2)
+    target = np.array([targets.get(label, (np.nan, None))[0] for label in labels], dtype=float)
+    has_target = ~np.isnan(target)
+    status = np.where(~has_target, "no target", np.where(percent >= target, "met", "below"))
+    return pd.DataFrame({
+        "Indicator": list(labels),
+        "Percent": percent,
+        "Target": target,
+        "Gap": percent - target,
+        "Status": status,
+        "Source": [targets.get(label, (None, None))[1] for label in labels],
+    })
+
+
+def evaluate_compliance(labels, percentages, country=DEFAULT_COUNTRY, year=None):
+    """
+    Compares every indicator's share of the budget with its target in one
+    vectorized step. Results are cached per (country, year, inputs).
+    """
+    return _evaluate(country, year, tuple(labels), tuple(float(p) for p in percentages)).copy()
+
+
+def benchmark(shares):
+    """
+    Vectorized compliance for many budgets at once. `shares` has columns
+    country, year, indicator, percent; returns it with target, gap and status.
+    """
+    targets = load_targets().reset_index()
+    shares = shares.copy()
+    shares["year"] = shares["year"].astype("int32")
+    shares["_row"] = np.arange(len(shares))
+
+    # Candidate targets in increasing priority; the last match per row wins
+    candidates = []
+    for priority, (use_country, use_year) in enumerate([(False, False), (False, True), (True, False), (True, True)]):
+        keys = shares[["_row", "indicator"]].copy()
+        keys["country"] = shares["country"] if use_country else DEFAULT_COUNTRY
+        keys["year"] = shares["year"] if use_year else ANY_YEAR
+        matched = keys.merge(targets, on=["country", "year", "indicator"], how="inner")
+        matched["_priority"] = priority
+        candidates.append(matched[["_row", "target", "source", "_priority"]])
+    best = (
+        pd.concat(candidates)
+        .sort_values(["_row", "_priority"])
+        .drop_duplicates("_row", keep="last")
+        .set_index("_row")
+    )
+
+    shares["target"] = best["target"].reindex(shares["_row"]).to_numpy()
+    shares["source"] = best["source"].reindex(shares["_row"]).to_numpy()
+    shares["gap"] = shares["percent"] - shares["target"]
+    shares["status"] = np.where(
+        shares["target"].isna(), "no target", np.where(shares["percent"] >= shares["target"], "met", "below")
+    )
+    return shares.drop(columns="_row")